@@ -0,0 +1,88 @@
+"""Checks the import time of the service modules against a budget.
+
+Usage: python -m benchmarks.bench_import [--runs 5] [--budget timeraas.app=400,timeraas=100]
+                                         [--output results.json] [--compare baseline.json]
+
+Every module is imported in fresh interpreters with ``-X importtime`` and the
+median cumulative import time is compared against its budget in
+milliseconds. Importing a module must also not pull in any of the heavy
+dependencies that are only needed once a subsystem is used (numpy for the
+analytics and vectorized scans, requests for the webhook and Fritz!Box
+clients). Exits with status 1 if a budget is exceeded or a heavy dependency
+is imported, so it can gate CI.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import compare, write_results
+
+DEFAULT_BUDGETS = "timeraas.app=400,timeraas.asgi=500,timeraas=100"
+LAZY_DEPENDENCIES = ("numpy", "requests")
+LAZY_EXCEPTIONS = {"timeraas.asgi": ("requests",)}  # The asgi notifier falls back to the requests session
+
+
+def parse_budgets(spec: str) -> dict:
+    """Parses ``module=milliseconds,...`` into a mapping of module names to budgets."""
+    budgets = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        module, _, budget = entry.partition("=")
+        budgets[module.strip()] = float(budget)
+    return budgets
+
+
+def import_once(module: str) -> tuple:
+    """Imports ``module`` in a fresh interpreter and returns (cumulative ms, names of all imported modules)."""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True, check=True)
+    cumulative, imported = 0.0, set()
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not total.isdigit():
+            continue  # The header line
+        imported.add(name)
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, imported
+
+
+def measure(module: str, runs: int) -> dict:
+    timings, imported = [], set()
+    for _ in range(runs):
+        cumulative, imported = import_once(module)
+        timings.append(cumulative)
+    allowed = LAZY_EXCEPTIONS.get(module, ())
+    eager = sorted(name for name in LAZY_DEPENDENCIES if name in imported and name not in allowed)
+    return {"median_ms": round(statistics.median(timings), 2), "min_ms": round(min(timings), 2),
+            "modules": len(imported), "eager_dependencies": eager}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module.")
+    parser.add_argument("--budget", default=DEFAULT_BUDGETS, help="Budgets as module=milliseconds,...")
+    parser.add_argument("--output", default="-", help="Result file, '-' for stdout.")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    args = parser.parse_args()
+
+    failures, results = [], {}
+    for module, budget in parse_budgets(args.budget).items():
+        result = results[module] = measure(module, args.runs)
+        result["budget_ms"] = budget
+        if result["median_ms"] > budget:
+            failures.append(f"{module}: {result['median_ms']} ms exceeds the budget of {budget} ms")
+        if result["eager_dependencies"]:
+            failures.append(f"{module}: imports {', '.join(result['eager_dependencies'])} at import time")
+    write_results(args.output, "bench_import", vars(args), results)
+    if args.compare:
+        compare(args.compare, results)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
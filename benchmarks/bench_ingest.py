@@ -0,0 +1,156 @@
+"""Compares events per second of the HTTP endpoint with the binary UDP listener.
+
+Usage: python -m benchmarks.bench_ingest [--windows 1000] [--events 20000] [--workers 4] [--records 64]
+                                         [--scenario http udp] [--output results.json]
+                                         [--compare baseline.json]
+
+The ``http`` scenario posts every event as JSON to ``POST /home/<room>/<window>``
+of the app served by a local threaded Werkzeug server, over one keep-alive
+connection per worker. The ``udp`` scenario sends the same events as binary
+records, ``--records`` per datagram, to the datagram listener of the app.
+Every window alternates between OPEN and CLOSED with increasing sequence
+numbers, so no event is dropped as a duplicate. UDP has no flow control:
+events lost to a full socket buffer are reported as ``lost``.
+"""
+import argparse
+import http.client
+import json
+import logging
+import socket
+import threading
+import time
+
+from benchmarks.common import ResourceSampler, compare, summarize, write_results
+
+WAIT_TIMEOUT = 30.0
+
+
+def status(index: int, windows: int) -> str:
+    return "OPEN" if (index // windows) % 2 == 0 else "CLOSED"
+
+
+def bench_http(args) -> dict:
+    """Posts every event through a real HTTP round trip."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    from timeraas.app import create_app
+    from timeraas.config import Config
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    app = create_app(Config())
+    services = app.extensions["timeraas"]
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, name="bench-http", daemon=True)
+    thread.start()
+    latencies = [[] for _ in range(args.workers)]
+
+    def worker(number):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        for index in range(number, args.events, args.workers):
+            body = json.dumps({"status": status(index, args.windows), "seq": index // args.windows})
+            began = time.perf_counter()
+            connection.request("POST", f"/home/room{index % args.windows}/window", body,
+                               {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            latencies[number].append(time.perf_counter() - began)
+            if response.status != 200:
+                raise RuntimeError(f"Unexpected response {response.status}")
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(args.workers)]
+    with ResourceSampler() as sampler:
+        start = time.perf_counter()
+        for worker_thread in threads:
+            worker_thread.start()
+        for worker_thread in threads:
+            worker_thread.join()
+        elapsed = time.perf_counter() - start
+    result = summarize([latency for chunk in latencies for latency in chunk], elapsed)
+    result.update(peak_threads=sampler.peak_threads, windows=len(services.registry))
+    server.shutdown()
+    services.shutdown()
+    return result
+
+
+def bench_udp(args) -> dict:
+    """Sends every event as a binary record and waits until the listener applied them."""
+    from timeraas.app import create_app
+    from timeraas.config import Config
+    from timeraas.datagram import encode
+    from timeraas.window import WindowStatus
+
+    window_ids = ",".join(f"{number}=room{number}/window" for number in range(args.windows))
+    app = create_app(Config(udp_host="127.0.0.1", udp_port=0, udp_windows=window_ids))
+    services = app.extensions["timeraas"]
+    listener = services.datagram
+    datagrams = []
+    for first in range(0, args.events, args.records):
+        indexes = range(first, min(first + args.records, args.events))
+        datagrams.append(encode((index % args.windows, WindowStatus[status(index, args.windows)],
+                                 index // args.windows, time.time()) for index in indexes))
+
+    def processed() -> int:
+        stats = listener.stats()
+        return stats["applied"] + stats["dropped"] + stats["invalid"]
+
+    with ResourceSampler() as sampler, socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        start = time.perf_counter()
+        for datagram in datagrams:
+            sender.sendto(datagram, listener.address)
+        sent = time.perf_counter() - start
+        deadline, last, last_change = start + WAIT_TIMEOUT, -1, time.perf_counter()
+        while processed() < args.events and time.perf_counter() < deadline:
+            count = processed()
+            if count != last:
+                last, last_change = count, time.perf_counter()
+            elif time.perf_counter() - last_change > 1.0:
+                break  # Nothing arrived for a second, the rest was lost
+            time.sleep(0.001)
+        elapsed = (time.perf_counter() if processed() >= args.events else last_change) - start
+    count = processed()
+    result = {
+        "events": count,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_eps": round(count / elapsed, 1) if elapsed else 0.0,
+        "send_s": round(sent, 4),
+        "datagrams": len(datagrams),
+        "lost": args.events - count,
+        "peak_threads": sampler.peak_threads,
+        "windows": len(services.registry),
+    }
+    services.shutdown()
+    return result
+
+
+SCENARIOS = {"http": bench_http, "udp": bench_udp}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", type=int, default=1000, help="Number of simulated windows.")
+    parser.add_argument("--events", type=int, default=20000, help="Number of events per scenario.")
+    parser.add_argument("--workers", type=int, default=4, help="HTTP client threads.")
+    parser.add_argument("--records", type=int, default=64, help="Records per datagram.")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["http", "udp"])
+    parser.add_argument("--output", default="-", help="Result file, '-' for stdout.")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    args = parser.parse_args()
+
+    logging.getLogger("timeraas").setLevel(logging.WARNING)  # Per-request log records would dominate
+    results = {name: SCENARIOS[name](args) for name in args.scenario}
+    if "http" in results and "udp" in results and results["http"]["throughput_eps"]:
+        results["speedup"] = {"udp_over_http": round(results["udp"]["throughput_eps"]
+                                                     / results["http"]["throughput_eps"], 1)}
+    write_results(args.output, "bench_ingest", vars(args), results)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compares request latency with synchronous file logging against the queue-based logging pipeline.
+
+Usage: python -m benchmarks.bench_logging [--requests 2000] [--records 0,10,100]
+
+``--records`` is the number of extra log records emitted per request, so the
+benchmark shows how latency changes as log volume grows.
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from timeraas.app import create_app
+from timeraas.config import Config
+from timeraas.logs import TEXT_FORMAT, configure_logging
+
+LOG_DIRECTORY = tempfile.mkdtemp(prefix="timeraas-bench-")
+APP = create_app(Config(log_file=os.path.join(LOG_DIRECTORY, "timeraas.log")))
+
+EXTRA_RECORDS = {"count": 0}
+bench_logger = logging.getLogger("timeraas.bench")
+
+
+@APP.before_request
+def emit_extra_records():
+    for i in range(EXTRA_RECORDS["count"]):
+        bench_logger.info("Synthetic log record %s for request %s", i, "bench")
+
+
+def use_synchronous_handlers(path: str):
+    """Restores the previous setup: handlers attached directly to the logger, writing on the request thread."""
+    root = logging.getLogger("timeraas")
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        if getattr(handler, "timeraas_pipeline", False):
+            handler.listener.stop()
+    file_handler = logging.FileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root.addHandler(file_handler)
+    return file_handler
+
+
+def use_queue_pipeline(path: str):
+    """Installs the queue-based pipeline used by the service."""
+    root = logging.getLogger("timeraas")
+    for handler in list(root.handlers):
+        if not getattr(handler, "timeraas_pipeline", False):
+            root.removeHandler(handler)
+            handler.close()
+    return configure_logging(path=path, console=False)
+
+
+def measure(client, requests: int) -> list:
+    latencies = []
+    for i in range(requests):
+        status = "OPEN" if i % 2 == 0 else "CLOSED"
+        start = time.perf_counter()
+        response = client.post(f"/home/bench{i % 50}/window", json={"status": status})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"Unexpected response {response.status_code}")
+    return latencies
+
+
+def summarize(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered) * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    return f"p50={p50:.3f} ms p99={p99:.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--records", default="0,10,100", help="Comma separated extra log records per request.")
+    args = parser.parse_args()
+
+    services = APP.extensions["timeraas"]
+    services.send_discord_message = lambda message, location=None: None
+    client = APP.test_client()
+    for records in (int(value) for value in args.records.split(",")):
+        EXTRA_RECORDS["count"] = records
+        for mode in ("sync", "queue"):
+            path = os.path.join(LOG_DIRECTORY, f"{mode}-{records}.log")
+            handle = use_synchronous_handlers(path) if mode == "sync" else use_queue_pipeline(path)
+            measure(client, min(200, args.requests))  # Warm up
+            latencies = measure(client, args.requests)
+            print(f"records/request={records:<4} {mode:<6} {summarize(latencies)}")
+            if mode == "queue":
+                handle.stop()
+    services.shutdown()
+
+
+if __name__ == "__main__":
+    main()
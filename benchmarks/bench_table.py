@@ -0,0 +1,66 @@
+"""Measures the memory and lookup cost of the window table.
+
+Usage: python -m benchmarks.bench_table [--windows 1000000] [--per-room 1000] [--output -]
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import write_results
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+
+class _IdleScheduler:
+    def schedule(self, delay, callback, *args):
+        return None
+
+    def cancel(self, handle):
+        return False
+
+
+def run(windows: int, per_room: int) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    registry = WindowRegistry(scheduler=_IdleScheduler())
+    start = time.perf_counter()
+    for index in range(windows):
+        registry.get_or_create(f"room{index // per_room}", f"window{index % per_room}")
+    create_elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    lookups = min(windows, 100000)
+    start = time.perf_counter()
+    for index in range(lookups):
+        registry.table.find(f"room{index // per_room}", f"window{index % per_room}")
+    find_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    open_windows = registry.table.count(WindowStatus.OPEN)
+    armed = registry.table.armed()
+    scan_elapsed = time.perf_counter() - start
+    return {
+        "windows": windows,
+        "bytes_total": used,
+        "bytes_per_window": round(used / windows, 1),
+        "create_us": round(create_elapsed / windows * 1e6, 3),
+        "find_us": round(find_elapsed / lookups * 1e6, 3),
+        "scan_ms": round(scan_elapsed * 1000, 3),
+        "open_windows": open_windows,
+        "armed_timers": armed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", type=int, default=1000000)
+    parser.add_argument("--per-room", type=int, default=1000)
+    parser.add_argument("--output", default="-")
+    arguments = parser.parse_args()
+    results = {"table": run(arguments.windows, arguments.per_room)}
+    write_results(arguments.output, "bench_table", vars(arguments), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Load test driving N simulated windows at M events per second.
+
+Usage: python -m benchmarks.bench_windows [--windows 1000] [--rate 2000] [--events 20000]
+                                          [--workers 4] [--duration 1] [--settle 1.5]
+                                          [--scenario flask manager]
+                                          [--output results.json] [--compare baseline.json]
+
+Every window alternates between OPEN and CLOSED. The ``flask`` scenario posts
+the events through the Flask test client to ``update_window_status``, the
+``manager`` scenario calls ``WindowManager.start_timer``/``cancel_timer``
+directly. Timers of windows left open longer than ``--duration`` expire and
+their alerts go to a local stub webhook through the regular notifier, so no
+network access is needed. ``--rate 0`` sends as fast as possible.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.common import DiscordSink, ResourceSampler, compare, pace, summarize, write_results
+
+SINK_RATE = 10000  # The stub webhook has no rate limit, so do not throttle alerts like for Discord
+
+
+def run_workers(workers: int, events: int, windows: int, work) -> tuple:
+    """Runs ``work(worker, index)`` for every event split over threads and returns (latencies, elapsed).
+
+    Event ``index`` belongs to window ``index % windows``, and all events of a
+    window run on one thread in order, so every run sends the same alerts.
+    """
+    latencies = [[] for _ in range(workers)]
+
+    def worker(number):
+        for index in range(events):
+            if index % windows % workers == number:
+                latencies[number].append(work(number, index))
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [latency for chunk in latencies for latency in chunk], time.perf_counter() - start
+
+
+def bench_flask(args, sink: DiscordSink) -> dict:
+    """Posts every event through the Flask test client."""
+    from timeraas.app import create_app
+    from timeraas.config import Config
+    from timeraas.logs import configure_logging
+
+    # Keep the console quiet, the file handler still runs on the listener thread
+    listener = configure_logging(level=logging.WARNING, console=False,
+                                 path=os.path.join(tempfile.mkdtemp(prefix="timeraas-bench-"), "timeraas.log"))
+    app = create_app(Config(webhook_url=sink.url, timer_duration=args.duration, notifier_rate=SINK_RATE))
+    services = app.extensions["timeraas"]
+    clients = [app.test_client() for _ in range(args.workers)]
+    start = time.perf_counter()
+
+    def work(worker, index):
+        pace(start, index, args.rate)
+        status = "OPEN" if (index // args.windows) % 2 == 0 else "CLOSED"
+        began = time.perf_counter()
+        response = clients[worker].post(f"/home/room{index % args.windows}/window", json={"status": status})
+        latency = time.perf_counter() - began
+        if response.status_code != 200:
+            raise RuntimeError(f"Unexpected response {response.status_code}: {response.get_data(as_text=True)}")
+        return latency
+
+    with ResourceSampler() as sampler:
+        latencies, elapsed = run_workers(args.workers, args.events, args.windows, work)
+        time.sleep(args.settle)
+        services.notifier.join()
+    result = summarize(latencies, elapsed)
+    result.update(peak_threads=sampler.peak_threads, rss_bytes=sampler.rss_bytes(),
+                  peak_rss_bytes=sampler.peak_rss_bytes(), alerts_sent=services.notifier.stats()["sent"])
+    services.shutdown()
+    listener.stop()
+    return result
+
+
+def bench_manager(args, sink: DiscordSink) -> dict:
+    """Arms and cancels timers directly on WindowManagers, bypassing HTTP."""
+    from timeraas.notifier import Notifier
+    from timeraas.registry import WindowRegistry
+    from timeraas.scheduler import TimerScheduler
+
+    scheduler = TimerScheduler()
+    registry = WindowRegistry(scheduler=scheduler)
+    notifier = Notifier(sink.url, rate=SINK_RATE, burst=int(SINK_RATE))
+    managers = [registry.get_or_create(f"room{number}", "window") for number in range(args.windows)]
+    start = time.perf_counter()
+
+    def work(worker, index):
+        pace(start, index, args.rate)
+        manager = managers[index % args.windows]
+        began = time.perf_counter()
+        if (index // args.windows) % 2 == 0:
+            manager.start_timer(args.duration, lambda: notifier.send("Fenster offen"))
+        else:
+            manager.cancel_timer()
+        return time.perf_counter() - began
+
+    with ResourceSampler() as sampler:
+        latencies, elapsed = run_workers(args.workers, args.events, args.windows, work)
+        time.sleep(args.settle)
+        notifier.join()
+    result = summarize(latencies, elapsed)
+    result.update(peak_threads=sampler.peak_threads, rss_bytes=sampler.rss_bytes(),
+                  peak_rss_bytes=sampler.peak_rss_bytes(), alerts_sent=notifier.stats()["sent"])
+    scheduler.shutdown()
+    notifier.close()
+    return result
+
+
+SCENARIOS = {"manager": bench_manager, "flask": bench_flask}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", type=int, default=1000, help="Number of simulated windows.")
+    parser.add_argument("--rate", type=float, default=2000, help="Events per second in total, 0 for unthrottled.")
+    parser.add_argument("--events", type=int, default=20000, help="Number of events per scenario.")
+    parser.add_argument("--workers", type=int, default=4, help="Threads sending events concurrently.")
+    parser.add_argument("--duration", type=int, default=1, help="Timer duration in seconds.")
+    parser.add_argument("--settle", type=float, default=1.5,
+                        help="Seconds to wait after the run so timers of windows left open fire.")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=["manager", "flask"])
+    parser.add_argument("--output", default="-", help="Result file, '-' for stdout.")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    args = parser.parse_args()
+
+    results = {}
+    with DiscordSink() as sink:
+        for name in args.scenario:
+            results[name] = SCENARIOS[name](args, sink)
+        results["sink"] = {"messages": sink.messages}
+    write_results(args.output, "bench_windows", vars(args), results)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Shared helpers for the benchmarks: a local Discord sink, resource sampling and result files."""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class DiscordSink:
+    """Local stand-in for a Discord webhook that accepts and counts every post."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.messages = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), name="discord-sink",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler(self):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with sink._lock:
+                    sink.messages += 1
+                self.send_response(204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
+
+
+class ResourceSampler:
+    """Samples the peak thread count in the background and reads the resident set size."""
+
+    def __init__(self, interval: float = 0.01):
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self.peak_threads = 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            # The sampler itself is not part of the measured process load
+            self.peak_threads = max(self.peak_threads, threading.active_count() - 1)
+            self._stop.wait(self._interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    @staticmethod
+    def peak_rss_bytes() -> int:
+        """Peak resident set size of this process."""
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    @staticmethod
+    def rss_bytes():
+        """Current resident set size, or None where /proc is not available."""
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return None
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """Throughput and latency percentiles in events per second and milliseconds."""
+    ordered = sorted(latencies)
+    return {
+        "events": len(ordered),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_eps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4) if ordered else 0.0,
+    }
+
+
+def pace(start: float, index: int, rate: float):
+    """Sleeps until event ``index`` is due at ``rate`` events per second; a rate of 0 means unthrottled."""
+    if rate > 0:
+        delay = start + index / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def environment() -> dict:
+    """Describes the commit and interpreter the results were produced with."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.time(),
+    }
+
+
+def write_results(path: str, benchmark: str, parameters: dict, results: dict):
+    """Writes one JSON result document; ``-`` writes to stdout."""
+    document = {"benchmark": benchmark, "environment": environment(), "parameters": parameters,
+                "results": results}
+    text = json.dumps(document, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as result_file:
+            result_file.write(text + "\n")
+
+
+def compare(baseline_path: str, results: dict):
+    """Prints the relative change of every numeric result against a baseline result file."""
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    for scenario, values in results.items():
+        for key, value in values.items():
+            previous = baseline.get(scenario, {}).get(key)
+            if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+                change = (value - previous) / previous * 100
+                print(f"{scenario:<10} {key:<16} {previous:>12} -> {value:<12} ({change:+.1f}%)")
@@ -0,0 +1,103 @@
+import time
+import unittest
+from unittest.mock import Mock
+
+import numpy as np
+
+from timeraas.analytics import DAY, OpenTimeAnalytics, open_intervals, split_by_day
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+OPEN, CLOSED, TILTED = WindowStatus.OPEN.value, WindowStatus.CLOSED.value, WindowStatus.TILTED.value
+
+
+class TestVectorHelpers(unittest.TestCase):
+
+    def test_open_intervals(self):
+        """Test that open and tilted periods become intervals and a trailing open period is optional."""
+        starts, ends = open_intervals([0, 10, 30, 40, 50], [OPEN, CLOSED, TILTED, CLOSED, OPEN])
+        self.assertEqual(starts.tolist(), [0, 30])
+        self.assertEqual(ends.tolist(), [10, 40])
+        starts, ends = open_intervals([0, 10], [CLOSED, OPEN], now=25)
+        self.assertEqual((starts.tolist(), ends.tolist()), ([10], [25]))
+
+    def test_split_by_day(self):
+        """Test that intervals crossing midnight are split into per-day parts."""
+        days, seconds = split_by_day(np.array([DAY - 100, 5 * DAY + 10]), np.array([2 * DAY + 50, 5 * DAY + 20]))
+        self.assertEqual(days.tolist(), [0, 1, 2, 5])
+        self.assertEqual(seconds.tolist(), [100, DAY, 50, 10])
+
+
+class TestOpenTimeAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an analytics engine."""
+        self.analytics = OpenTimeAnalytics()
+
+    def test_bulk_transitions(self):
+        """Test totals, longest periods, floors and days from bulk-loaded history."""
+        self.analytics.add_transitions("toilet", "window", 0, [0, 100, 200, 500], [OPEN, CLOSED, OPEN, CLOSED])
+        self.analytics.add_transitions("attic", "skylight", 2, [DAY + 10, DAY + 20], [OPEN, CLOSED])
+        report = self.analytics.report(now=2 * DAY)
+        toilet = report["windows"][0]
+        self.assertEqual((toilet["open_seconds"], toilet["longest_open_seconds"]), (400, 300))
+        self.assertEqual([(f["floor"], f["open_seconds"]) for f in report["floors"]], [(0, 400), (2, 10)])
+        self.assertEqual([(d["date"], d["open_seconds"], d["longest_open_seconds"]) for d in report["days"]],
+                         [("1970-01-01", 400, 300), ("1970-01-02", 10, 10)])
+
+    def test_open_window_counts_until_now(self):
+        """Test that a window that is still open is counted up to the report time without being cached."""
+        self.analytics.add_transitions("toilet", "window", 0, [100], [OPEN])
+        self.assertEqual(self.analytics.report(now=150)["windows"][0]["open_seconds"], 50)
+        self.assertEqual(self.analytics.report(now=200)["windows"][0]["open_seconds"], 100)
+
+    def test_incremental_updates_from_listener(self):
+        """Test that window events feed the cached aggregates incrementally."""
+        registry = WindowRegistry(floors={"bedroom": 1}, scheduler=Mock())
+        registry.add_listener(self.analytics.listener)
+        manager = registry.get_or_create("bedroom", "left")
+        manager.apply(WindowStatus.OPEN, 600)
+        manager._on_timer_expire(None)
+        manager.apply(WindowStatus.CLOSED, 600)
+        report = self.analytics.report()
+        window = report["windows"][0]
+        self.assertEqual((window["room"], window["floor"], window["expired"]), ("bedroom", 1, 1))
+        self.assertGreaterEqual(window["open_seconds"], 0)
+        self.assertEqual(report["floors"][0]["expired"], 1)
+        self.assertEqual(report["days"][0]["expired"], 1)
+
+        manager.apply(WindowStatus.OPEN, 600)
+        manager.apply(WindowStatus.CLOSED, 600)
+        self.assertGreaterEqual(self.analytics.report()["windows"][0]["open_seconds"], window["open_seconds"])
+
+    def test_buffer_is_bounded_without_reports(self):
+        """Test that buffered transitions are folded once they reach the threshold even if nobody asks for reports."""
+        analytics = OpenTimeAnalytics(flush_threshold=8)
+        registry = WindowRegistry(scheduler=Mock())
+        registry.add_listener(analytics.listener)
+        manager = registry.get_or_create("bedroom", "left")
+        for _ in range(100):
+            manager.apply(WindowStatus.OPEN, 600)
+            manager._on_timer_expire(None)
+            manager.apply(WindowStatus.CLOSED, 600)
+        self.assertLess(len(analytics._pending_codes) + len(analytics._pending_expired_codes), 8)
+        self.assertEqual(analytics.report()["windows"][0]["expired"], 100)
+        with self.assertRaises(ValueError):
+            OpenTimeAnalytics(flush_threshold=0)
+
+    def test_year_of_history_is_fast(self):
+        """Test that a year of history for a building is summarized quickly."""
+        rng = np.random.default_rng(1)
+        for window in range(100):
+            times = np.cumsum(rng.uniform(60, 3600, 2000)) + 1.7e9
+            statuses = np.where(np.arange(2000) % 2 == 0, OPEN, CLOSED)
+            self.analytics.add_transitions(f"room{window % 20}", f"w{window}", window % 4, times, statuses)
+        start = time.perf_counter()
+        report = self.analytics.report()
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(len(report["windows"]), 100)
+        self.assertEqual(len(report["floors"]), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,28 +1,41 @@
-import requests
+import json
+import os
+import socket
+import tempfile
+import time
 import unittest
 
 from unittest.mock import patch, Mock
-from timeraas.app import app, toilet_window_manager, DISCORD_WEBHOOK_URL, timer_expired, send_discord_message
+from timeraas.app import Services, create_app
+from timeraas.clock import VirtualClock
+from timeraas.config import Config
+from timeraas.datagram import encode
+from timeraas.scheduler import VirtualScheduler
+from timeraas.window import WindowStatus
 
 
 class TestApp(unittest.TestCase):
 
     def setUp(self):
-        """Set up a Flask test client and ensure each test starts with a closed window."""
-        self.client = app.test_client()
-        toilet_window_manager.status = toilet_window_manager.window.status = 'CLOSED'
+        """Set up a fresh app and Flask test client with a closed window and a mocked notifier."""
+        self.app = create_app(Config(webhook_url='http://mock.url'))
+        self.services = self.app.extensions['timeraas']
+        self.addCleanup(self.services.shutdown)
+        self.client = self.app.test_client()
+        self.manager = self.services.registry.get_or_create('toilet', 'window')
+        send_patcher = patch.object(self.services.notifier, 'send')
+        self.mock_send = send_patcher.start()
+        self.addCleanup(send_patcher.stop)
 
-    @patch('timeraas.app.requests.post')
-    def test_update_window_status_open(self, mock_post):
+    def test_update_window_status_open(self):
         """Test opening the window and starting the timer."""
         response = self.client.post('/home/toilet/window', json={'status': 'OPEN'})
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['status'], 'OPEN')
-        self.assertTrue(toilet_window_manager._timer is not None)  # Timer should be set
-        toilet_window_manager.cancel_timer()  # Timer should not be running anymore
+        self.assertTrue(self.manager._timer is not None)  # Timer should be set
+        self.manager.cancel_timer()  # Timer should not be running anymore
 
-    @patch('timeraas.app.requests.post')
-    def test_update_window_status_close(self, mock_post):
+    def test_update_window_status_close(self):
         """Test closing the window and cancelling the timer."""
         # First, open the window to start the timer
         self.client.post('/home/toilet/window', json={'status': 'OPEN'})
@@ -31,51 +44,151 @@ class TestApp(unittest.TestCase):
         response = self.client.post('/home/toilet/window', json={'status': 'CLOSED'})
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['status'], 'CLOSED')
-        self.assertTrue(toilet_window_manager._timer is None)  # Timer should be cancelled
+        self.assertTrue(self.manager._timer is None)  # Timer should be cancelled
+
+    def test_update_other_window(self):
+        """Test that any room and window is routed to its own lazily created manager."""
+        self.assertIsNone(self.services.registry.get('kitchen', 'left'))
+        response = self.client.post('/home/kitchen/left', json={'status': 'OPEN'})
+        self.assertEqual(response.status_code, 200)
+        kitchen_manager = self.services.registry.get('kitchen', 'left')
+        self.assertIsNotNone(kitchen_manager)
+        self.assertEqual(kitchen_manager.status.name, 'OPEN')
+        self.assertEqual(self.manager.status.name, 'CLOSED')
+        self.client.post('/home/kitchen/left', json={'status': 'CLOSED'})
+        self.assertIsNone(kitchen_manager._timer)
+
+    def test_ingest_events_batch(self):
+        """Test that a batch is applied in timestamp order per window with per-event results."""
+        events = [
+            {'room': 'bath', 'window': 'left', 'status': 'CLOSED', 'timestamp': 2},
+            {'room': 'bath', 'window': 'left', 'status': 'OPEN', 'timestamp': 1},
+            {'room': 'bath', 'window': 'right', 'status': 'OPEN', 'timestamp': 5},
+            {'room': 'bath', 'window': 'right', 'status': 'TILTED', 'timestamp': 6},
+            {'room': 'bath', 'window': 'right', 'status': 'OPEN', 'timestamp': 'yesterday'},
+            'not an event',
+        ]
+        response = self.client.post('/home/events', json=events)
+        self.assertEqual(response.status_code, 200)
+        results = response.json['results']
+        self.assertEqual(results[0], {'status': 'CLOSED'})
+        self.assertEqual(results[1], {'status': 'OPEN'})
+        self.assertEqual(results[2], {'status': 'OPEN'})
+        self.assertEqual(results[3], {'status': 'TILTED'})
+        self.assertIn('error', results[4])
+        self.assertIn('error', results[5])
+        self.assertEqual(self.services.registry.get('bath', 'left').status.name, 'CLOSED')
+        self.assertIsNone(self.services.registry.get('bath', 'left')._timer)
+        right = self.services.registry.get('bath', 'right')
+        self.assertEqual(right.status.name, 'TILTED')
+        self.assertIsNotNone(right._timer)  # Tilted windows run their own schedule
+        right.cancel_timer()
+
+    def test_ingest_events_requires_array(self):
+        """Test that the batch endpoint rejects a body that is not a JSON array."""
+        response = self.client.post('/home/events', json={'status': 'OPEN'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ingest_event_stream(self):
+        """Test that NDJSON events are applied and answered with one result line each."""
+        body = '\n'.join([
+            json.dumps({'room': 'hall', 'window': 'door', 'status': 'OPEN', 'timestamp': 1}),
+            '{broken',
+            '',
+            json.dumps({'room': 'hall', 'window': 'door', 'status': 'CLOSED', 'timestamp': 2}),
+        ])
+        response = self.client.post('/home/events/stream', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(results, [{'status': 'OPEN'}, {'error': 'Event must be an object.'}, {'status': 'CLOSED'}])
+        self.assertEqual(self.services.registry.get('hall', 'door').status.name, 'CLOSED')
+
+    def test_window_history(self):
+        """Test that the history endpoint returns the recorded transitions since a timestamp."""
+        self.client.post('/home/attic/skylight', json={'status': 'OPEN'})
+        self.client.post('/home/attic/skylight', json={'status': 'CLOSED'})
+        response = self.client.get('/home/attic/skylight/history')
+        self.assertEqual(response.status_code, 200)
+        transitions = response.json['transitions']
+        self.assertEqual([t['status'] for t in transitions], ['OPEN', 'CLOSED'])
+
+        since = transitions[1]['timestamp']
+        response = self.client.get(f'/home/attic/skylight/history?since={since}')
+        self.assertEqual([t['status'] for t in response.json['transitions']], ['CLOSED'])
+        self.assertEqual(self.client.get('/home/attic/unknown/history').status_code, 404)
+        for query in ('since=abc', 'limit=1.5'):
+            response = self.client.get(f'/home/attic/skylight/history?{query}')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json, {'error': 'Invalid since or limit parameter.'})
+
+    def test_open_time_report(self):
+        """Test that the report endpoint includes windows that received events."""
+        self.client.post('/home/cellar/hatch', json={'status': 'OPEN'})
+        self.client.post('/home/cellar/hatch', json={'status': 'CLOSED'})
+        response = self.client.get('/reports/open-time')
+        self.assertEqual(response.status_code, 200)
+        rooms = [(window['room'], window['window']) for window in response.json['windows']]
+        self.assertIn(('cellar', 'hatch'), rooms)
+        self.assertIn('floors', response.json)
+        self.assertIn('days', response.json)
 
     def test_invalid_status(self):
         """Test sending an invalid status to the window endpoint."""
         response = self.client.post('/home/toilet/window', json={'status': 'INVALID'})
         self.assertEqual(response.status_code, 400)
-        self.assertEqual(response.json['error'], 'Invalid status value. Must be "OPEN" or "CLOSED"')
-
-    @patch('timeraas.app.requests.post')
-    def test_send_discord_message_success(self, mock_post):
-        """Test successful sending of a message to Discord."""
-        mock_post.return_value.status_code = 204
+        self.assertEqual(response.json['error'], 'Invalid status value. Must be "OPEN", "TILTED" or "CLOSED"')
 
+    def test_send_discord_message_queues(self):
+        """Test that sending a message to Discord only enqueues it."""
         # Ensure DISCORD_WEBHOOK_URL is set for this test
-        with patch('timeraas.app.DISCORD_WEBHOOK_URL', 'http://mock.url'):
-            send_discord_message("Test message")
+        self.services.send_discord_message("Test message")
+        self.mock_send.assert_called_once_with("Test message", None)
 
-        # Assert that post was called with the correct arguments
-        mock_post.assert_called_once_with('http://mock.url', json={"content": "Test message"})
-
-    @patch('timeraas.app.requests.post')
     @patch('timeraas.app.logger')
-    def test_send_discord_message_failure(self, mock_logger, mock_post):
-        """Test failure when sending a message to Discord."""
-        mock_post.side_effect = requests.RequestException("Network error")
-
-        # Ensure DISCORD_WEBHOOK_URL is set for this test
-        with patch('timeraas.app.DISCORD_WEBHOOK_URL', 'http://mock.url'):
-            send_discord_message("Test message")
+    def test_send_discord_message_not_configured(self, mock_logger):
+        """Test that nothing is queued when no webhook URL is configured."""
+        self.services.config = self.services.config._replace(webhook_url=None)
+        self.services.send_discord_message("Test message")
 
-        # Assert that the error log was called with the expected message
+        self.mock_send.assert_not_called()
         mock_logger.error.assert_called_once()
-        self.assertIn("Failed to send message to Discord", mock_logger.error.call_args[0][0])
 
-    @patch('timeraas.app.send_discord_message')
-    def test_timer_expired(self, mock_send_message):
+    def test_close_after_expiry_queues_message(self):
+        """Test that closing an expired window queues the all-clear message."""
+        self.client.post('/home/toilet/window', json={'status': 'OPEN'})
+        self.manager._on_timer_expire(None)
+        self.client.post('/home/toilet/window', json={'status': 'CLOSED'})
+        self.mock_send.assert_called_once_with("Bin wieder zu, danke! 😊", "toilet/window")
+
+    def test_stats(self):
+        """Test that the stats endpoint reports notifier queue depth and latency."""
+        response = self.client.get('/stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queue_depth', response.json['notifier'])
+        self.assertIn('latency_avg', response.json['notifier'])
+
+    def test_metrics(self):
+        """Test that the metrics endpoint exposes request latency and window gauges in Prometheus format."""
+        self.client.post('/home/toilet/window', json={'status': 'OPEN'})
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        body = response.get_data(as_text=True)
+        self.assertIn('timeraas_request_duration_seconds_count{endpoint="update_window_status"}', body)
+        self.assertRegex(body, r'timeraas_open_windows [1-9]')
+        self.assertRegex(body, r'timeraas_armed_timers [1-9]')
+        self.manager.cancel_timer()
+
+    def test_timer_expired(self):
         """Test that timer expiration triggers a message to Discord."""
-        timer_expired()  # Simulate timer expiration
-        mock_send_message.assert_called_once()  # Message should be sent to Discord
+        self.services.timer_expired()  # Simulate timer expiration
+        self.mock_send.assert_called_once()  # Message should be sent to Discord
 
     def test_timer_expired_debug_mode(self):
         """Test that in DEBUG_MODE, no message is sent on timer expiration."""
-        with patch('timeraas.app.DEBUG_MODE', True), patch('timeraas.app.send_discord_message') as mock_send_message:
-            timer_expired()
-            mock_send_message.assert_not_called()  # No message should be sent
+        self.services.config = self.services.config._replace(debug=True)
+        self.services.timer_expired()
+        self.mock_send.assert_not_called()  # No message should be sent
 
     def test_update_window_status_internal_error(self):
         """Test that an internal error is handled correctly and returns a 500 response."""
@@ -84,6 +197,161 @@ class TestApp(unittest.TestCase):
             self.assertEqual(response.status_code, 500)
             self.assertIn("An internal error occurred", response.json['error'])
 
+    def test_window_status_with_etag(self):
+        """Test the status endpoint and that a matching If-None-Match gets a 304."""
+        response = self.client.get('/home/toilet/window')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['status'], 'CLOSED')
+        etag = response.headers['ETag']
+        response = self.client.get('/home/toilet/window', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(self.client.get('/home/cellar/nothing').status_code, 404)
+        response = self.client.get('/home')
+        self.assertIn({'room': 'toilet', 'window': 'window', 'status': 'CLOSED', 'deadline': None,
+                       'expired': False, 'stage': 0}, response.json['windows'])
+        self.assertEqual(response.headers['ETag'], self.services.broadcaster.etag())
+
+    def test_event_stream_resumes(self):
+        """Test that the SSE endpoint replays events after Last-Event-ID."""
+        last_event_id = self.services.broadcaster.event_id(self.services.broadcaster.last_id)
+        self.client.post('/home/toilet/window', json={'status': 'OPEN'})
+        response = self.client.get('/events', headers={'Last-Event-ID': last_event_id}, buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+        self.assertIn(b'"status": "OPEN"', next(chunks))
+        response.close()
+        self.manager.cancel_timer()
+
+    def test_retried_post_is_dropped(self):
+        """Test that a retried POST with the same event id does not re-arm the timer."""
+        self.client.post('/home/toilet/window', json={'status': 'OPEN', 'id': 'retry-1'})
+        timer = self.manager._timer
+        response = self.client.post('/home/toilet/window', json={'status': 'OPEN', 'id': 'retry-1'})
+        self.assertEqual(response.json, {'status': 'OPEN', 'dropped': 'duplicate'})
+        self.assertIs(self.manager._timer, timer)
+        response = self.client.post('/home/toilet/window', json={'status': 'CLOSED', 'seq': -1})
+        self.assertEqual(response.status_code, 400)
+        self.manager.cancel_timer()
+
+    def test_subsystems_are_created_lazily(self):
+        """Test that a new app creates no subsystem before it is used."""
+        app = create_app(Config())
+        services = app.extensions['timeraas']
+        self.assertFalse(any(name in vars(services) for name in ('registry', 'notifier', 'scheduler', 'poller')))
+        self.assertIsNone(services.log_listener)  # The config leaves logging alone
+        app.test_client().post('/home/toilet/window', json={'status': 'CLOSED'})
+        self.assertIn('registry', vars(services))
+        self.assertNotIn('notifier', vars(services))
+        services.shutdown()
+
+    def test_apps_are_isolated(self):
+        """Test that two apps in one process keep their own windows."""
+        other = create_app(Config())
+        self.addCleanup(other.extensions['timeraas'].shutdown)
+        other.test_client().post('/home/garage/door', json={'status': 'CLOSED'})
+        self.assertIsNone(self.services.registry.get('garage', 'door'))
+        self.assertIsNotNone(other.extensions['timeraas'].registry.get('garage', 'door'))
+
+    def test_shutdown_cancels_all_timers(self):
+        """Test that shutdown cancels every armed timer and can be called twice."""
+        for room in ('toilet', 'kitchen', 'bath'):
+            self.client.post(f'/home/{room}/window', json={'status': 'OPEN'})
+        self.assertEqual(self.services.registry.table.armed(), 3)
+        self.services.shutdown()
+        self.assertEqual(self.services.registry.table.armed(), 0)
+        self.assertEqual(self.services.scheduler.pending, 0)
+        self.assertIsNone(self.manager._timer)
+        self.assertEqual(self.manager.status.name, 'OPEN')  # Only the timers are gone, not the state
+        self.services.shutdown()
+
+    def test_sqlite_state_backend(self):
+        """Test that an app with the sqlite backend shares its windows through the database."""
+        path = os.path.join(tempfile.mkdtemp(), 'timeraas.db')
+        app = create_app(Config(state_backend='sqlite', state_path=path))
+        services = app.extensions['timeraas']
+        app.test_client().post('/home/toilet/window', json={'status': 'OPEN'})
+        self.assertTrue(app.test_client().get('/stats').json['backend']['owner'])
+        self.assertEqual(services.backend.state()[('toilet', 'window')]['status'], 'OPEN')
+        services.shutdown()
+        with self.assertRaises(ValueError):
+            create_app(Config(state_backend='redis'))
+
+    def test_virtual_clock_override(self):
+        """Test that an app on a virtual clock reports an open window once the clock passes the deadline."""
+        clock = VirtualClock(1000.0)
+        notifier = Mock()
+        services = Services(Config(webhook_url='http://mock.url'), clock=clock, notifier=notifier)
+        self.addCleanup(services.shutdown)
+        self.assertIsInstance(services.scheduler, VirtualScheduler)
+        self.assertEqual(services.update_status('toilet', 'window', WindowStatus.OPEN), {'status': 'OPEN'})
+        self.assertEqual(services.registry.get('toilet', 'window').deadline, 1600.0)
+        services.scheduler.advance(599)
+        notifier.send.assert_not_called()
+        services.scheduler.advance(1)
+        notifier.send.assert_called_once()
+        self.assertEqual(services.analytics.report()['windows'][0]['open_seconds'], 600)  # Measured in virtual time
+        with self.assertRaises(ValueError):
+            Services(Config(), timer=Mock())
+
+    def test_admin_endpoints_are_guarded(self):
+        """Test that the admin endpoints are hidden without a token and refuse a wrong one."""
+        self.assertEqual(self.client.get('/admin/slow-calls').status_code, 404)
+        app = create_app(Config(admin_token='secret'))
+        self.addCleanup(app.extensions['timeraas'].shutdown)
+        client = app.test_client()
+        self.assertEqual(client.get('/admin/slow-calls').status_code, 403)
+        self.assertEqual(client.post('/admin/profile?seconds=0.05',
+                                     headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+
+    def test_profile_and_slow_calls(self):
+        """Test that a profile returns collapsed stacks and status updates are recorded as slow calls."""
+        app = create_app(Config(admin_token='secret'))
+        self.addCleanup(app.extensions['timeraas'].shutdown)
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer secret'}
+        client.post('/home/toilet/window', json={'status': 'OPEN'})
+        calls = client.get('/admin/slow-calls', headers=headers).json['calls']
+        self.assertEqual(calls[0]['name'], 'update_window_status toilet/window')
+        self.assertTrue(calls[0]['stack'])
+
+        response = client.post('/admin/profile?seconds=0.05&interval=0.005', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response.headers['X-Profile-Samples']), 0)
+        self.assertRegex(response.get_data(as_text=True).splitlines()[0], r'^\S.* \d+$')
+        self.assertEqual(client.post('/admin/profile?seconds=600', headers=headers).status_code, 400)
+
+    def test_datagram_ingest(self):
+        """Test that binary status records sent over UDP are applied like HTTP updates."""
+        app = create_app(Config(udp_host='127.0.0.1', udp_port=0, udp_windows='1=toilet/window'))
+        services = app.extensions['timeraas']
+        self.addCleanup(services.shutdown)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            sender.sendto(encode([(1, WindowStatus.OPEN, 1, 1000.0)]), services.datagram.address)
+            sender.sendto(encode([(1, WindowStatus.OPEN, 1, 1000.0)]), services.datagram.address)  # Retried
+        deadline = time.monotonic() + 2
+        while sum(services.datagram.stats()[key] for key in ('applied', 'dropped')) < 2 \
+                and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(services.registry.get('toilet', 'window').status, WindowStatus.OPEN)
+        self.assertEqual(app.test_client().get('/stats').json['datagram']['dropped'], 1)
+
+    def test_cluster_endpoints_reject_malformed_bodies(self):
+        """Test that the cluster endpoints answer 400 instead of failing on a body without the expected field."""
+        self.assertEqual(self.client.get('/cluster/ping').status_code, 404)
+        app = create_app(Config(cluster_node='http://127.0.0.1:1'))
+        self.addCleanup(app.extensions['timeraas'].shutdown)
+        client = app.test_client()
+        for path in ('/cluster/join', '/cluster/leave', '/cluster/handover', '/cluster/replicate'):
+            self.assertEqual(client.post(path).status_code, 400)
+            self.assertEqual(client.post(path, json={'nodes': []}).status_code, 400)
+            self.assertIn('error', client.post(path, json=[]).json)
+        self.assertEqual(client.post('/cluster/replicate', json={'windows': []}).json, {'stored': 0})
+        for record in ('toilet', {'room': 'toilet', 'window': 'window'}, {'room': 1, 'window': 'w', 'timestamp': 1}):
+            for path in ('/cluster/handover', '/cluster/replicate'):
+                self.assertEqual(client.post(path, json={'windows': [record]}).status_code, 400)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import Mock
+
+from timeraas.asgi import AsyncioScheduler, AsyncNotifier, TimeraasASGI
+
+
+async def call(app, method, path, body=b"", chunks=None, headers=None):
+    """Runs one HTTP request through the ASGI app and returns (status, decoded body)."""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in (chunks or [])]
+    messages.append({"type": "http.request", "body": body, "more_body": False})
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": method, "path": path, "headers": headers or []}, receive, send)
+    content = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return sent[0]["status"], content.decode()
+
+
+class FakeClient:
+    """Async HTTP client stand-in that records posts and replays canned status codes."""
+
+    def __init__(self, status_codes=None):
+        self.posts = []
+        self.status_codes = list(status_codes or [])
+
+    async def post(self, url, json=None):
+        self.posts.append((url, json))
+        response = Mock()
+        response.status_code = self.status_codes.pop(0) if self.status_codes else 204
+        response.headers = {"Retry-After": "0"}
+        return response
+
+
+class TestAsyncioScheduler(unittest.TestCase):
+
+    def test_schedule_and_fire(self):
+        """Test that a callback fires through loop.call_later."""
+        async def scenario():
+            scheduler = AsyncioScheduler()
+            callback = Mock()
+            scheduler.schedule(0.01, callback, "a")
+            self.assertEqual(scheduler.pending, 1)
+            await asyncio.sleep(0.05)
+            callback.assert_called_once_with("a")
+            self.assertEqual(scheduler.pending, 0)
+        asyncio.run(scenario())
+
+    def test_cancel(self):
+        """Test that a cancelled timer never fires."""
+        async def scenario():
+            scheduler = AsyncioScheduler()
+            callback = Mock()
+            timer = scheduler.schedule(0.01, callback)
+            self.assertTrue(scheduler.cancel(timer))
+            self.assertFalse(scheduler.cancel(timer))
+            await asyncio.sleep(0.05)
+            callback.assert_not_called()
+        asyncio.run(scenario())
+
+
+class TestAsyncNotifier(unittest.TestCase):
+
+    def test_send_and_retry(self):
+        """Test that messages are delivered by worker tasks and 429 responses are retried."""
+        async def scenario():
+            client = FakeClient([429, 204])
+            notifier = AsyncNotifier('http://mock.url', workers=1, client=client, rate=1000, burst=1000, backoff=0)
+            self.assertTrue(notifier.send("Test message"))
+            await notifier.join()
+            await notifier.close()
+            self.assertEqual(client.posts, [('http://mock.url', {"content": "Test message"})] * 2)
+            self.assertEqual(notifier.stats()['sent'], 1)
+        asyncio.run(scenario())
+
+    def test_digest(self):
+        """Test that alerts within the digest window are merged into one post."""
+        async def scenario():
+            client = FakeClient()
+            notifier = AsyncNotifier('http://mock.url', workers=1, client=client, digest_window=0.05,
+                                     rate=1000, burst=1000)
+            notifier.send("Ich bin noch auf!", "toilet/window")
+            notifier.send("Mir wird kalt!", "kitchen/left")
+            await notifier.join()
+            await notifier.close()
+            self.assertEqual(len(client.posts), 1)
+            self.assertIn("kitchen/left, toilet/window", client.posts[0][1]["content"])
+        asyncio.run(scenario())
+
+    def test_digest_is_not_split_between_workers(self):
+        """Test that with several worker tasks a burst of alerts still becomes one digest."""
+        async def scenario():
+            client = FakeClient()
+            notifier = AsyncNotifier('http://mock.url', workers=4, client=client, digest_window=0.1,
+                                     rate=1000, burst=1000)
+            for i in range(6):
+                notifier.send(f"message {i}", f"room{i}/window")
+                await asyncio.sleep(0.01)  # Idle workers would pick up the later alerts of the burst
+            await notifier.join()
+            await notifier.close()
+            self.assertEqual(len(client.posts), 1)
+        asyncio.run(scenario())
+
+    def test_send_after_close_is_dropped(self):
+        """Test that a closed notifier drops and counts messages instead of queueing them for stopped workers."""
+        async def scenario():
+            client = FakeClient()
+            notifier = AsyncNotifier('http://mock.url', workers=1, client=client, rate=1000, burst=1000)
+            notifier.send("before")
+            await notifier.join()
+            await notifier.close()
+            self.assertFalse(notifier.send("after"))
+            self.assertEqual(notifier.stats()['dropped'], 1)
+            self.assertEqual(len(client.posts), 1)
+        asyncio.run(scenario())
+
+
+class TestTimeraasASGI(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an ASGI app with a fake webhook client."""
+        self.client = FakeClient()
+        self.app = TimeraasASGI(webhook_url='http://mock.url', duration=600,
+                                notifier=AsyncNotifier('http://mock.url', client=self.client, rate=1000, burst=1000))
+
+    def test_open_and_close(self):
+        """Test that opening arms a loop timer and closing cancels it."""
+        async def scenario():
+            status, body = await call(self.app, "POST", "/home/toilet/window", json.dumps({"status": "OPEN"}).encode())
+            self.assertEqual((status, json.loads(body)), (200, {"status": "OPEN"}))
+            self.assertEqual(self.app.scheduler.pending, 1)
+            status, body = await call(self.app, "POST", "/home/toilet/window",
+                                      json.dumps({"status": "CLOSED"}).encode())
+            self.assertEqual((status, json.loads(body)), (200, {"status": "CLOSED"}))
+            self.assertEqual(self.app.scheduler.pending, 0)
+        asyncio.run(scenario())
+
+    def test_invalid_status(self):
+        """Test that invalid statuses and bodies are rejected like in the Flask app."""
+        async def scenario():
+            status, body = await call(self.app, "POST", "/home/toilet/window", b'{"status": "AJAR"}')
+            self.assertEqual(status, 400)
+            self.assertEqual(json.loads(body)['error'], 'Invalid status value. Must be "OPEN", "TILTED" or "CLOSED"')
+            status, _ = await call(self.app, "POST", "/home/toilet/window", b'not json')
+            self.assertEqual(status, 400)
+            status, _ = await call(self.app, "GET", "/nowhere")
+            self.assertEqual(status, 404)
+        asyncio.run(scenario())
+
+    def test_expiry_sends_message(self):
+        """Test that an expired loop timer queues a Discord message."""
+        async def scenario():
+            self.app.duration = 1
+            await call(self.app, "POST", "/home/toilet/window", b'{"status": "OPEN"}')
+            await asyncio.sleep(1.1)
+            await self.app.notifier.join()
+            self.assertEqual(len(self.client.posts), 1)
+            await call(self.app, "POST", "/home/toilet/window", b'{"status": "CLOSED"}')
+            await self.app.notifier.join()
+            self.assertEqual(self.client.posts[-1][1]["content"], "Bin wieder zu, danke! 😊")
+            await self.app.notifier.close()
+        asyncio.run(scenario())
+
+    def test_batch_and_stream(self):
+        """Test the batch and NDJSON endpoints."""
+        async def scenario():
+            events = [{"room": "bath", "window": "left", "status": "CLOSED", "timestamp": 2},
+                      {"room": "bath", "window": "left", "status": "OPEN", "timestamp": 1}]
+            status, body = await call(self.app, "POST", "/home/events", json.dumps(events).encode())
+            self.assertEqual(json.loads(body), {"results": [{"status": "CLOSED"}, {"status": "OPEN"}]})
+
+            chunks = [b'{"room": "hall", "window": "door", "status": "OPEN"}\n{"room": "ha',
+                      b'll", "window": "door", "status": "CLOSED"}\n']
+            status, body = await call(self.app, "POST", "/home/events/stream", chunks=chunks)
+            self.assertEqual(status, 200)
+            self.assertEqual([json.loads(line) for line in body.splitlines()],
+                             [{"status": "OPEN"}, {"status": "CLOSED"}])
+        asyncio.run(scenario())
+
+    def test_stats(self):
+        """Test the stats endpoint."""
+        async def scenario():
+            status, body = await call(self.app, "GET", "/stats")
+            self.assertEqual(status, 200)
+            self.assertIn("queue_depth", json.loads(body)["notifier"])
+        asyncio.run(scenario())
+
+    def test_metrics(self):
+        """Test the Prometheus metrics endpoint."""
+        async def scenario():
+            await call(self.app, "POST", "/home/toilet/window", json.dumps({"status": "OPEN"}).encode())
+            status, body = await call(self.app, "GET", "/metrics")
+            self.assertEqual(status, 200)
+            self.assertIn("# TYPE timeraas_request_duration_seconds histogram", body)
+            self.assertIn("timeraas_open_windows 1", body)
+            self.app.scheduler.shutdown()
+        asyncio.run(scenario())
+
+    def test_window_status_with_etag(self):
+        """Test the status endpoints and that a matching If-None-Match gets a 304."""
+        async def scenario():
+            status, _ = await call(self.app, "GET", "/home/toilet/window")
+            self.assertEqual(status, 404)
+            await call(self.app, "POST", "/home/toilet/window", json.dumps({"status": "TILTED"}).encode())
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+            scope = {"type": "http", "method": "GET", "path": "/home/toilet/window", "headers": []}
+            await self.app(scope, None, send)
+            headers = dict(sent[0]["headers"])
+            self.assertEqual(json.loads(sent[1]["body"])["status"], "TILTED")
+            status, body = await call(self.app, "GET", "/home/toilet/window",
+                                      headers=[(b"if-none-match", headers[b"etag"])])
+            self.assertEqual((status, body), (304, ""))
+            status, body = await call(self.app, "GET", "/home")
+            self.assertEqual(json.loads(body)["windows"][0]["window"], "window")
+            self.app.scheduler.shutdown()
+        asyncio.run(scenario())
+
+    def test_event_stream(self):
+        """Test that the SSE endpoint pushes transitions and ends when the client disconnects."""
+        async def scenario():
+            sent = []
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+                if b"event: status" in message.get("body", b""):
+                    disconnect.set()
+
+            stream = asyncio.ensure_future(self.app({"type": "http", "method": "GET", "path": "/events",
+                                                     "headers": []}, receive, send))
+            await asyncio.sleep(0.01)
+            await call(self.app, "POST", "/home/toilet/window", json.dumps({"status": "OPEN"}).encode())
+            await asyncio.wait_for(stream, 2)
+            self.assertEqual(dict(sent[0]["headers"])[b"content-type"], b"text/event-stream")
+            body = b"".join(message.get("body", b"") for message in sent[1:])
+            self.assertIn(b'"status": "OPEN"', body)
+            self.assertEqual(self.app.broadcaster.subscribers, 0)
+            self.app.scheduler.shutdown()
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
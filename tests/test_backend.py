@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from timeraas.backend import UNARMED, SqliteBackend
+from timeraas.clock import VirtualClock
+from timeraas.escalation import Escalation, EscalationSchedule, Stage
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+
+class ManualScheduler:
+    """Scheduler stand-in whose timers only fire when the test says so."""
+
+    def __init__(self):
+        self.timers = []
+
+    @property
+    def pending(self):
+        return len(self.timers)
+
+    def schedule(self, delay, callback, *args):
+        handle = (delay, callback, args)
+        self.timers.append(handle)
+        return handle
+
+    def cancel(self, handle):
+        if handle in self.timers:
+            self.timers.remove(handle)
+            return True
+        return False
+
+    def fire(self):
+        timers, self.timers = self.timers, []
+        for _, callback, args in timers:
+            callback(*args)
+
+    def shutdown(self):
+        self.timers = []
+
+
+class Worker:
+    """One simulated worker process with its own registry on the shared database."""
+
+    def __init__(self, path, schedule, clock=None):
+        self.scheduler = ManualScheduler()
+        self.backend = SqliteBackend(path, self.scheduler, poll_interval=60)
+        self.registry = WindowRegistry(scheduler=self.backend.scheduler, clock=clock)
+        self.alerts = Mock()
+        self.schedule = schedule
+        self.backend.attach(self.registry, self.callback, Escalation(schedule))
+
+    def callback(self, location):
+        return self.backend.guard(location, lambda *stage: self.alerts(location))
+
+    def apply(self, room, window, status):
+        manager = self.registry.get_or_create(room, window)
+        return manager.apply(status, self.schedule, self.callback(f"{room}/{window}"))
+
+
+def open_in_child(path):
+    worker = Worker(path, EscalationSchedule.single(60))
+    worker.apply("child", "window", WindowStatus.OPEN)
+    worker.backend.close()
+
+
+class TestSqliteBackend(unittest.TestCase):
+
+    def setUp(self):
+        """Set up two workers sharing one database; the first one owns the timers."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "timeraas.db")
+        self.schedule = EscalationSchedule([Stage(60), Stage(120)])
+        self.owner = Worker(self.path, self.schedule)
+        self.worker = Worker(self.path, self.schedule)
+        self.addCleanup(self.worker.backend.close)
+        self.addCleanup(self.owner.backend.close)
+
+    def test_single_owner(self):
+        """Test that only one process arms real timers."""
+        self.assertTrue(self.owner.backend.owner)
+        self.assertFalse(self.worker.backend.owner)
+        manager = self.worker.registry.get_or_create("bath", "left")
+        self.worker.apply("bath", "left", WindowStatus.OPEN)
+        self.assertIs(manager._timer, UNARMED)
+        self.assertIsNotNone(manager.deadline)
+        self.assertEqual(self.worker.scheduler.timers, [])
+
+    def test_open_and_close_in_different_workers(self):
+        """Test that a close handled by another worker cancels the timer armed for the open."""
+        self.worker.apply("bath", "left", WindowStatus.OPEN)
+        self.owner.backend.poll()
+        self.assertEqual(self.owner.registry.get("bath", "left").status, WindowStatus.OPEN)
+        self.assertEqual(len(self.owner.scheduler.timers), 1)
+
+        transition = self.owner.apply("bath", "left", WindowStatus.CLOSED)
+        self.assertTrue(transition.timer_cancelled)
+        self.assertEqual(self.owner.scheduler.timers, [])
+        # The worker has not polled yet but sees the close before applying its next change
+        transition = self.worker.apply("bath", "left", WindowStatus.OPEN)
+        self.assertEqual(transition.previous, WindowStatus.CLOSED)
+        self.assertTrue(transition.timer_started)
+
+    def test_one_alert_per_expiry(self):
+        """Test that an expiry is reported once and the next stage is shared with every worker."""
+        self.worker.apply("bath", "left", WindowStatus.OPEN)
+        self.owner.backend.poll()
+        self.owner.scheduler.fire()
+        self.owner.alerts.assert_called_once_with("bath/left")
+        self.worker.alerts.assert_not_called()
+        self.assertEqual(self.owner.backend.state()[("bath", "left")]["stage"], 1)
+        transition = self.worker.apply("bath", "left", WindowStatus.CLOSED)
+        self.assertTrue(transition.was_expired)  # The worker sends the all-clear message
+
+    def test_alert_skipped_when_closed_elsewhere(self):
+        """Test that a timer firing after another worker closed the window sends no alert."""
+        self.worker.apply("bath", "left", WindowStatus.OPEN)
+        self.owner.backend.poll()
+        self.worker.apply("bath", "left", WindowStatus.CLOSED)
+        self.owner.scheduler.fire()  # Fires before the owner polled the close
+        self.owner.alerts.assert_not_called()
+        self.assertEqual(self.owner.backend.stats()["conflicts"], 1)
+        self.owner.backend.poll()
+        self.assertEqual(self.owner.registry.get("bath", "left").status, WindowStatus.CLOSED)
+        self.assertEqual(self.owner.scheduler.timers, [])
+
+    def test_takeover_rearms_timers(self):
+        """Test that another worker arms the recorded deadlines once the owner exits."""
+        self.worker.apply("bath", "left", WindowStatus.OPEN)
+        self.owner.backend.close()
+        self.worker.backend.poll()
+        self.assertTrue(self.worker.backend.owner)
+        self.assertEqual(len(self.worker.scheduler.timers), 1)
+        self.worker.scheduler.fire()
+        self.worker.alerts.assert_called_once_with("bath/left")
+
+    def test_takeover_uses_the_registry_clock(self):
+        """Test that the remaining time of a taken over timer is measured on the registry's clock."""
+        clock = VirtualClock(1000.0)
+        path = os.path.join(self.directory, "virtual.db")
+        owner, worker = Worker(path, self.schedule, clock), Worker(path, self.schedule, clock)
+        self.addCleanup(worker.backend.close)
+        worker.apply("bath", "left", WindowStatus.OPEN)
+        owner.backend.close()
+        clock.advance(20)
+        worker.backend.poll()
+        self.assertEqual([timer[0] for timer in worker.scheduler.timers], [40.0])
+        self.assertEqual(worker.registry.get("bath", "left").deadline, 1060.0)
+
+    def test_invalid_settings(self):
+        """Test that invalid intervals are rejected."""
+        with self.assertRaises(ValueError):
+            SqliteBackend(self.path, poll_interval=0)
+        with self.assertRaises(ValueError):
+            SqliteBackend(self.path, timeout=-1)
+
+    def test_other_process(self):
+        """Test that a change made by a forked process is armed by the owner."""
+        child = multiprocessing.get_context("fork").Process(target=open_in_child, args=(self.path,))
+        child.start()
+        child.join(10)
+        self.assertEqual(child.exitcode, 0)
+        self.owner.backend.poll()
+        self.assertEqual(self.owner.registry.get("child", "window").status, WindowStatus.OPEN)
+        self.assertEqual(len(self.owner.scheduler.timers), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
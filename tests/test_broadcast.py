@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import Mock
+
+from timeraas.broadcast import Broadcaster, etag_matches, state_etag, window_state
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+
+def event_ids(chunks) -> list:
+    """Returns the event numbers of the SSE chunks, without their epoch."""
+    text = b"".join(chunks).decode()
+    return [int(line.split(".")[1]) for line in text.splitlines() if line.startswith("id: ")]
+
+
+class TestBroadcaster(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a broadcaster with a small ring buffer."""
+        self.broadcaster = Broadcaster(capacity=4, keepalive=0.05)
+
+    def tearDown(self):
+        self.broadcaster.close()
+
+    def test_publish_and_read(self):
+        """Test that events get consecutive ids and are read after a given id."""
+        for number in range(3):
+            self.assertEqual(self.broadcaster.publish("status", {"n": number}), number + 1)
+        events, last_id = self.broadcaster.since(1)
+        self.assertEqual(event_ids(events), [2, 3])
+        self.assertEqual(last_id, 3)
+        self.assertIn(b'event: status\ndata: {"n": 2}\n\n', events[1])
+
+    def test_events_are_encoded_once(self):
+        """Test that every subscriber gets the same encoded bytes of an event."""
+        self.broadcaster.publish("status", {"n": 1})
+        first, _ = self.broadcaster.since(0)
+        second, _ = self.broadcaster.since(0)
+        self.assertIs(first[0], second[0])
+
+    def test_overwritten_events_send_reset(self):
+        """Test that a reader lapped by the ring buffer is told to refetch."""
+        for number in range(6):
+            self.broadcaster.publish("status", {"n": number})
+        events, _ = self.broadcaster.since(0)
+        self.assertIn(b"event: reset", events[0])
+        self.assertEqual(event_ids(events[1:]), [3, 4, 5, 6])
+
+    def test_resume_from_last_event_id(self):
+        """Test that a stream resumes after Last-Event-ID and resets on an id of another process."""
+        for number in range(3):
+            self.broadcaster.publish("status", {"n": number})
+        stream = self.broadcaster.stream(self.broadcaster.event_id(1))
+        self.assertEqual(next(stream), b"retry: 3000\n\n")
+        self.assertEqual(event_ids([next(stream)]), [2, 3])
+        stream.close()
+        stream = self.broadcaster.stream("deadbeef.2")
+        next(stream)
+        self.assertIn(b"event: reset", next(stream))
+        stream.close()
+        self.assertEqual(self.broadcaster.subscribers, 0)
+
+    def test_thread_stream_is_woken_by_publish(self):
+        """Test that a blocked thread subscriber receives new events and keepalives while idle."""
+        stream = self.broadcaster.stream()
+        next(stream)
+        self.assertEqual(next(stream), b": keepalive\n\n")
+        threading.Timer(0.01, self.broadcaster.publish, ("expired", {"n": 1})).start()
+        chunk = next(stream)
+        while chunk.startswith(b":"):
+            chunk = next(stream)
+        self.assertIn(b"event: expired", chunk)
+        stream.close()
+
+    def test_async_stream_is_woken_by_publish(self):
+        """Test that an asyncio subscriber is woken by an event published on its loop."""
+        async def scenario():
+            stream = self.broadcaster.stream_async()
+            await stream.__anext__()
+            asyncio.get_running_loop().call_later(0.01, self.broadcaster.publish, "status", {"n": 1})
+            chunk = await stream.__anext__()
+            while chunk.startswith(b":"):
+                chunk = await stream.__anext__()
+            await stream.aclose()
+            return chunk
+        self.assertIn(b"event: status", asyncio.run(scenario()))
+
+    def test_listener_publishes_window_events(self):
+        """Test that window events are published with their room and window."""
+        registry = WindowRegistry(scheduler=Mock())
+        registry.add_listener(self.broadcaster.listener)
+        registry.get_or_create("bath", "left").apply(WindowStatus.OPEN, 600)
+        events, _ = self.broadcaster.since(0)
+        self.assertIn(b'"room": "bath", "window": "left", "status": "OPEN", "previous": "CLOSED"', events[0])
+
+    def test_invalid_arguments(self):
+        """Test that invalid capacities and keepalives are rejected."""
+        with self.assertRaises(ValueError):
+            Broadcaster(capacity=0)
+        with self.assertRaises(ValueError):
+            Broadcaster(keepalive=0)
+
+
+class TestWindowState(unittest.TestCase):
+
+    def test_etag_follows_state(self):
+        """Test that the ETag only changes when the window state changes."""
+        manager = WindowRegistry(scheduler=Mock()).get_or_create("bath", "left")
+        closed = state_etag(manager)
+        self.assertEqual(state_etag(manager), closed)
+        manager.apply(WindowStatus.OPEN, 600)
+        self.assertNotEqual(state_etag(manager), closed)
+        self.assertEqual(window_state("bath", "left", manager)["status"], "OPEN")
+
+    def test_etag_matches(self):
+        """Test If-None-Match parsing with lists, weak tags and wildcards."""
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+        self.assertTrue(etag_matches('*', '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+
+if __name__ == '__main__':
+    unittest.main()
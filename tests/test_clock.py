@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import Mock
+
+from timeraas.clock import SYSTEM_CLOCK, VirtualClock
+from timeraas.escalation import EscalationSchedule, Stage
+from timeraas.registry import WindowRegistry
+from timeraas.scheduler import VirtualScheduler
+from timeraas.window import WindowStatus
+
+
+class TestVirtualClock(unittest.TestCase):
+
+    def test_advance_and_set(self):
+        """Test that the virtual clock only moves when told and never backwards."""
+        clock = VirtualClock(100.0)
+        self.assertEqual(clock.time(), 100.0)
+        clock.advance(5)
+        self.assertEqual(clock.monotonic(), 105.0)
+        clock.set(110)
+        self.assertEqual(clock.time(), 110.0)
+        with self.assertRaises(ValueError):
+            clock.advance(-1)
+        with self.assertRaises(ValueError):
+            clock.set(109)
+
+    def test_system_clock(self):
+        """Test that the system clock follows the time module."""
+        self.assertGreater(SYSTEM_CLOCK.time(), 1e9)
+        self.assertLessEqual(SYSTEM_CLOCK.monotonic(), SYSTEM_CLOCK.monotonic())
+
+
+class TestVirtualScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(0.0)
+        self.scheduler = VirtualScheduler(self.clock)
+
+    def test_fires_in_deadline_order(self):
+        """Test that due timers fire in deadline order with the clock set to each deadline."""
+        fired = []
+        self.scheduler.schedule(20, lambda: fired.append(("late", self.clock.time())))
+        self.scheduler.schedule(10, lambda: fired.append(("early", self.clock.time())))
+        self.assertEqual(self.scheduler.next_due(), 10)
+        self.assertEqual(self.scheduler.run_until(15), 1)
+        self.assertEqual(fired, [("early", 10)])
+        self.assertEqual(self.clock.time(), 15)
+        self.scheduler.advance(5)
+        self.assertEqual(fired, [("early", 10), ("late", 20)])
+        self.assertEqual(self.scheduler.pending, 0)
+        self.assertEqual(self.scheduler.fired, 2)
+
+    def test_cancel(self):
+        """Test that a cancelled timer never fires."""
+        callback = Mock()
+        handle = self.scheduler.schedule(10, callback)
+        self.assertTrue(self.scheduler.cancel(handle))
+        self.assertFalse(self.scheduler.cancel(handle))
+        self.scheduler.advance(60)
+        callback.assert_not_called()
+        self.assertIsNone(self.scheduler.next_due())
+
+    def test_timers_armed_by_callbacks(self):
+        """Test that a timer armed by a firing callback fires within the same run."""
+        callback = Mock()
+        self.scheduler.schedule(10, lambda: self.scheduler.schedule(10, callback))
+        self.scheduler.run_until(30)
+        callback.assert_called_once_with()
+
+    def test_escalation_without_waiting(self):
+        """Test that every escalation stage of a window fires on virtual time."""
+        registry = WindowRegistry(scheduler=self.scheduler, clock=self.clock)
+        manager = registry.get_or_create("bath", "left")
+        callback = Mock()
+        manager.apply(WindowStatus.OPEN, EscalationSchedule([Stage(600), Stage(1200)]), callback)
+        self.assertEqual(manager.deadline, 600)
+        self.scheduler.advance(600)
+        self.assertEqual(callback.call_count, 1)
+        self.assertEqual(manager.deadline, 1200)
+        self.scheduler.advance(599)
+        self.assertEqual(callback.call_count, 1)
+        self.scheduler.advance(1)
+        self.assertEqual(callback.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
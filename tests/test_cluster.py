@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import unittest
+
+import requests
+
+from timeraas.cluster import Cluster, HashRing, parse_nodes
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+WINDOWS = [(f"room{number}", "window") for number in range(24)]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def serve_node(port, peers):
+    """Runs one cluster node until SIGTERM, then leaves the cluster gracefully."""
+    from werkzeug.serving import make_server
+
+    from timeraas.app import create_app
+    from timeraas.config import Config
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    app = create_app(Config(cluster_node=f"http://127.0.0.1:{port}", cluster_peers=",".join(peers),
+                            cluster_heartbeat=0.1, timer_duration=3600))
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stop.wait()
+    app.extensions["timeraas"].shutdown()
+    server.shutdown()
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+class TestHashRing(unittest.TestCase):
+
+    def test_owners_are_distinct_and_stable(self):
+        """Test that a key has distinct owners and the same owner on every ring with the same nodes."""
+        ring = HashRing(["a", "b", "c"])
+        owners = ring.owners("bath/left", 3)
+        self.assertEqual(sorted(owners), ["a", "b", "c"])
+        self.assertEqual(HashRing(["c", "b", "a"]).owner("bath/left"), owners[0])
+        self.assertEqual(len(HashRing(["a"]).owners("bath/left", 2)), 1)
+
+    def test_adding_a_node_moves_few_keys(self):
+        """Test that a new node only takes keys over, about its share of them."""
+        keys = [f"room{number}/window" for number in range(2000)]
+        before, after = HashRing(["a", "b", "c"]), HashRing(["a", "b", "c", "d"])
+        moved = [key for key in keys if before.owner(key) != after.owner(key)]
+        self.assertTrue(all(after.owner(key) == "d" for key in moved))
+        self.assertLess(len(moved), len(keys) * 0.4)
+        self.assertGreater(len(moved), len(keys) * 0.1)
+
+    def test_invalid(self):
+        """Test that an empty ring and invalid replica counts are rejected."""
+        with self.assertRaises(ValueError):
+            HashRing([])
+        with self.assertRaises(ValueError):
+            HashRing(["a"], replicas=0)
+        self.assertEqual(parse_nodes("http://a:1/, http://b:2"), ["http://a:1", "http://b:2"])
+
+
+class TestClusterNode(unittest.TestCase):
+    """Runs a single node in this process, without peers."""
+
+    def setUp(self):
+        self.registry = WindowRegistry()
+        self.cluster = Cluster("http://127.0.0.1:1", [], self.registry, lambda *args: None)
+        self.addCleanup(self.registry.cancel_timers)
+
+    def test_rebalance_during_updates(self):
+        """Test that rebalancing while windows change status does not deadlock with the window listener."""
+        managers = [self.registry.get_or_create(room, window) for room, window in WINDOWS]
+        stop = threading.Event()
+
+        def update():
+            for number in range(2000):
+                for manager in managers:
+                    manager.apply(WindowStatus.OPEN if number % 2 else WindowStatus.CLOSED, 3600)
+            stop.set()
+
+        def rebalance():
+            while not stop.is_set():
+                with self.cluster._membership:
+                    self.cluster._rebalance()
+
+        threads = [threading.Thread(target=target, daemon=True) for target in (update, rebalance)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(self.cluster.stats()["owned"], len(WINDOWS))
+
+    def test_forwarding_after_leave_fails_instead_of_retrying(self):
+        """Test that a left node answers with an error when the owner is unreachable and the ring cannot change."""
+        self.cluster.join(f"http://127.0.0.1:{free_port()}")  # Nothing listens there
+        self.cluster.leave()
+        results = []
+
+        def forward():
+            room, window = WINDOWS[0]
+            results.append(self.cluster.forward(room, window, "GET", self.cluster.window_path(room, window)))
+            results.append(self.cluster.apply_events([{"room": room, "window": window, "status": "OPEN"}],
+                                                     lambda events: self.fail("Applied locally")))
+
+        thread = threading.Thread(target=forward, daemon=True)
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results[0][1], 503)
+        self.assertIn("unreachable", results[1][0]["error"])
+
+
+class TestCluster(unittest.TestCase):
+    """Runs three nodes as separate local processes."""
+
+    def setUp(self):
+        self.ports = [free_port() for _ in range(3)]
+        self.urls = [f"http://127.0.0.1:{port}" for port in self.ports]
+        self.processes = {}
+        self.addCleanup(self.stop_all)
+
+    def start(self, number):
+        process = multiprocessing.get_context("fork").Process(target=serve_node,
+                                                              args=(self.ports[number], self.urls))
+        process.start()
+        self.processes[number] = process
+
+    def stop_all(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.kill()
+            process.join(5)
+
+    def stats(self, number):
+        return requests.get(f"{self.urls[number]}/stats", timeout=2).json()["cluster"]
+
+    def wait_for_members(self, members):
+        expected = sorted(self.urls[number] for number in members)
+        self.assertTrue(wait_for(lambda: all(self.stats(number)["nodes"] == expected for number in members)))
+
+    def state(self, number, room, window):
+        return requests.get(f"{self.urls[number]}/home/{room}/{window}", timeout=2).json()
+
+    def assert_owned(self, members):
+        """Checks that every window is owned, with its timer armed, by the node the ring assigns it to."""
+        ring = HashRing([self.urls[number] for number in members])
+        expected = {number: sum(1 for room, window in WINDOWS if ring.owner(f"{room}/{window}") == self.urls[number])
+                    for number in members}
+
+        def owned():
+            stats = {number: self.stats(number) for number in members}
+            return all(stats[number]["owned"] == stats[number]["armed"] == expected[number] for number in members)
+
+        self.assertTrue(wait_for(owned))
+
+    def assert_deadlines(self, number, deadlines):
+        """Checks that the windows kept their deadlines, up to the time spent restoring them."""
+        for key, deadline in deadlines.items():
+            self.assertAlmostEqual(self.state(number, *key)["deadline"], deadline, delta=1.0)
+
+    def test_forwarding_and_handover(self):
+        """Test that updates reach the owner and timers move with the windows on join, leave and crash."""
+        self.start(0)
+        self.start(1)
+        self.wait_for_members([0, 1])
+        for room, window in WINDOWS:
+            response = requests.post(f"{self.urls[0]}/home/{room}/{window}", json={"status": "OPEN"}, timeout=2)
+            self.assertEqual(response.json(), {"status": "OPEN"})
+        self.assert_owned([0, 1])
+        deadlines = {key: self.state(1, *key)["deadline"] for key in WINDOWS}
+        self.assertTrue(all(deadlines.values()))
+
+        self.start(2)  # Join
+        self.wait_for_members([0, 1, 2])
+        self.assert_owned([0, 1, 2])
+        self.assert_deadlines(2, deadlines)
+
+        self.processes[1].terminate()  # Graceful leave hands the windows over
+        self.processes[1].join(10)
+        self.wait_for_members([0, 2])
+        self.assert_owned([0, 2])
+
+        # Replication is asynchronous, so wait until the survivor backs up every window of the other node
+        self.assertTrue(wait_for(lambda: self.stats(0)["replicas"] == self.stats(2)["owned"]))
+        os.kill(self.processes[2].pid, signal.SIGKILL)  # Crash: the replicas are promoted
+        self.processes[2].join(10)
+        self.wait_for_members([0])
+        self.assert_owned([0])
+        self.assert_deadlines(0, deadlines)
+
+        response = requests.post(f"{self.urls[0]}/home/events", timeout=2,
+                                 json=[{"room": room, "window": window, "status": "CLOSED"} for room, window in WINDOWS])
+        self.assertEqual({result["status"] for result in response.json()["results"]}, {"CLOSED"})
+        self.assertEqual(self.stats(0)["armed"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from timeraas.config import Config
+
+
+class TestConfig(unittest.TestCase):
+
+    def test_defaults_leave_logging_alone(self):
+        """Test that a plain Config does not configure logging and derives the tilted duration."""
+        config = Config(timer_duration=100)
+        self.assertIsNone(config.log_file)
+        self.assertEqual(config.tilted_timer_duration, 300)
+        self.assertEqual(config._replace(tilted_duration=0).tilted_timer_duration, 0)
+
+    def test_from_env(self):
+        """Test that settings are read from the given environment with the documented defaults."""
+        config = Config.from_env({"DISCORD_WEBHOOK_URL": "http://mock.url", "DEBUG_MODE": "1",
+                                  "TIMER_DURATION": "60", "DEBOUNCE_WINDOW": "0.5", "JOURNAL_PATH": ""})
+        self.assertEqual(config.webhook_url, "http://mock.url")
+        self.assertTrue(config.debug)
+        self.assertEqual(config.timer_duration, 60)
+        self.assertEqual(config.tilted_duration, 180)
+        self.assertEqual(config.debounce_window, 0.5)
+        self.assertIsNone(config.journal_path)
+        self.assertEqual(config.log_file, "timeraas.log")
+        self.assertEqual(Config.from_env({}).notifier_workers, 2)
+        self.assertIsNone(Config.from_env({"ADMIN_TOKEN": ""}).admin_token)
+        self.assertIsNone(Config.from_env({}).udp_port)
+        self.assertEqual(Config.from_env({"UDP_PORT": "5001"}).udp_port, 5001)
+        self.assertEqual(Config.from_env({"SLOW_CALL_CAPACITY": "5"}).slow_call_capacity, 5)
+        self.assertIsNone(Config.from_env({"CLUSTER_NODE": ""}).cluster_node)
+        self.assertEqual(Config.from_env({"CLUSTER_HEARTBEAT": "0.5"}).cluster_heartbeat, 0.5)
+
+    def test_from_env_rejects_malformed_numbers(self):
+        """Test that a malformed number fails loudly instead of falling back to a default."""
+        with self.assertRaises(ValueError):
+            Config.from_env({"TIMER_DURATION": "ten minutes"})
+
+
+if __name__ == "__main__":
+    unittest.main()
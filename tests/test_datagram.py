@@ -0,0 +1,84 @@
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from timeraas.datagram import HEADER, RECORD, DatagramListener, decode, encode, parse_window_ids
+from timeraas.window import WindowStatus
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestFormat(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Test that encoded records are decoded unchanged from a memoryview."""
+        datagram = encode([(1, WindowStatus.OPEN, 7, 1000.5), (2, 3, 8, 1001.0)])
+        self.assertEqual(len(datagram), HEADER.size + 2 * RECORD.size)
+        self.assertEqual(list(decode(memoryview(datagram))), [(1, 1, 7, 1000.5), (2, 3, 8, 1001.0)])
+
+    def test_malformed(self):
+        """Test that a wrong magic, version or length is rejected."""
+        datagram = encode([(1, WindowStatus.OPEN, 7, 1000.5)])
+        for invalid in (b"XX\x01\x00", b"TW\x02\x00", datagram[:-1], b"TW"):
+            with self.assertRaises(ValueError):
+                decode(memoryview(invalid))
+        self.assertEqual(list(decode(memoryview(encode([])))), [])
+
+    def test_parse_window_ids(self):
+        """Test that window ids are mapped to rooms and windows, defaulting the window name."""
+        self.assertEqual(parse_window_ids("1=toilet/window, 2=bath"), {1: ("toilet", "window"), 2: ("bath", "window")})
+        with self.assertRaises(ValueError):
+            parse_window_ids("toilet/window")
+
+
+class TestDatagramListener(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.received = threading.Event()
+
+        def apply_events(events):
+            self.batches.append(events)
+            self.received.set()
+            return [{"status": "OPEN"} if event["status"] else {"error": "invalid"} for event in events]
+
+        self.listener = DatagramListener("127.0.0.1", 0, {1: ("toilet", "window")}, apply_events)
+        self.listener.start()
+        self.addCleanup(self.listener.stop)
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(self.sender.close)
+
+    def test_records_become_events(self):
+        """Test that records of known windows are applied as events and the rest are counted."""
+        self.sender.sendto(encode([(1, WindowStatus.OPEN, 5, 1000.0), (9, WindowStatus.OPEN, 1, 1000.0),
+                                   (1, 9, 6, 1001.0)]), self.listener.address)
+        self.sender.sendto(b"garbage", self.listener.address)
+        self.assertTrue(wait_for(lambda: self.listener.stats()["malformed"] == 1))
+        events = [event for batch in self.batches for event in batch]
+        self.assertEqual(events[0], {"room": "toilet", "window": "window", "status": WindowStatus.OPEN, "seq": 5,
+                                     "timestamp": 1000.0})
+        stats = self.listener.stats()
+        self.assertEqual((stats["datagrams"], stats["records"], stats["unknown_windows"]), (2, 3, 1))
+        self.assertEqual((stats["applied"], stats["invalid"]), (1, 1))
+
+    def test_queued_datagrams_are_batched(self):
+        """Test that datagrams queued behind each other are applied in one batch."""
+        apply_events = Mock(side_effect=lambda events: [{"status": "OPEN"}] * len(events))
+        listener = DatagramListener("127.0.0.1", 0, {1: ("toilet", "window")}, apply_events)
+        self.addCleanup(listener.stop)
+        for sequence in range(10):
+            self.sender.sendto(encode([(1, WindowStatus.OPEN, sequence, 1000.0)]), listener.address)
+        listener.start()  # Everything is queued before the first receive
+        self.assertTrue(wait_for(lambda: listener.stats()["applied"] == 10))
+        apply_events.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import Mock
+
+from timeraas.clock import VirtualClock
+from timeraas.debounce import Debouncer
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+
+class ManualScheduler:
+    """Scheduler stand-in whose timers only fire when the test says so."""
+
+    def __init__(self):
+        self.timers = []
+
+    def schedule(self, delay, callback, *args):
+        handle = Mock()
+        self.timers.append((delay, callback, args))
+        return handle
+
+    def cancel(self, handle):
+        return True
+
+    def fire_debounce(self):
+        timers = [timer for timer in self.timers if timer[1].__name__ == "_settle"]
+        self.timers = [timer for timer in self.timers if timer[1].__name__ != "_settle"]
+        for _, callback, args in timers:
+            callback(*args)
+
+
+class TestDebouncer(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a registry and a debouncer with a 2 second hysteresis window on a manual clock."""
+        self.scheduler = ManualScheduler()
+        self.registry = WindowRegistry(scheduler=self.scheduler)
+        self.manager = self.registry.get_or_create("bath", "left")
+        self.clock = VirtualClock(1000.0)
+        self.debouncer = Debouncer(2.0, self.scheduler, clock=self.clock)
+
+    def apply(self, *statuses, on_settle=None):
+        return self.debouncer.apply_many(self.manager, list(statuses), 600, on_settle=on_settle)
+
+    def test_first_change_is_applied_at_once(self):
+        """Test that a change of a quiet window is not delayed."""
+        transition = self.apply(WindowStatus.OPEN)[0]
+        self.assertTrue(transition.timer_started)
+        self.assertFalse(transition.suppressed)
+        self.assertEqual(self.manager.status, WindowStatus.OPEN)
+        self.assertEqual(self.debouncer.settling, 1)
+
+    def test_burst_collapses_to_one_transition(self):
+        """Test that a bounce back to the applied status is suppressed entirely."""
+        transitions = self.apply(WindowStatus.OPEN, WindowStatus.CLOSED, WindowStatus.OPEN, WindowStatus.CLOSED,
+                                 WindowStatus.OPEN)
+        self.assertEqual([transition.suppressed for transition in transitions], [False, True, True, True, True])
+        self.assertEqual(transitions[1].status, WindowStatus.OPEN)
+        self.clock.advance(2)
+        self.scheduler.fire_debounce()
+        self.assertEqual(self.manager.status, WindowStatus.OPEN)
+        self.assertEqual(self.debouncer.suppressed(self.manager), 4)
+        self.assertEqual(self.debouncer.suppressed(), 4)
+        self.assertEqual(self.debouncer.settling, 0)
+        # Only the first OPEN armed a timer and nothing was cancelled
+        self.assertEqual(len([timer for timer in self.scheduler.timers if timer[1].__name__ != "_settle"]), 1)
+
+    def test_final_status_is_applied_when_settled(self):
+        """Test that the last status of a burst is applied once the window is quiet."""
+        on_settle = Mock()
+        self.apply(WindowStatus.OPEN, WindowStatus.CLOSED, WindowStatus.OPEN, WindowStatus.CLOSED,
+                   on_settle=on_settle)
+        self.assertEqual(self.manager.status, WindowStatus.OPEN)
+        self.clock.advance(2)
+        self.scheduler.fire_debounce()
+        self.assertEqual(self.manager.status, WindowStatus.CLOSED)
+        transition = on_settle.call_args[0][0]
+        self.assertTrue(transition.timer_cancelled)
+        self.assertEqual(self.debouncer.suppressed(self.manager), 2)
+        # The settled change opens a new hysteresis window
+        self.assertEqual(self.debouncer.settling, 1)
+
+    def test_events_extend_the_window(self):
+        """Test that an event inside the window postpones settling until it has been quiet for the hold."""
+        self.apply(WindowStatus.OPEN)
+        self.clock.advance(1.5)
+        self.apply(WindowStatus.CLOSED)
+        self.clock.advance(0.5)
+        self.scheduler.fire_debounce()
+        self.assertEqual(self.manager.status, WindowStatus.OPEN)
+        self.assertEqual(self.scheduler.timers[-1][0], 1.5)
+        self.clock.advance(1.5)
+        self.scheduler.fire_debounce()
+        self.assertEqual(self.manager.status, WindowStatus.CLOSED)
+
+    def test_unchanged_status_does_not_open_a_window(self):
+        """Test that repeated reports of the current status pass through without a hysteresis window."""
+        self.apply(WindowStatus.CLOSED, WindowStatus.CLOSED)
+        self.assertEqual(self.debouncer.settling, 0)
+
+    def test_zero_hold_passes_through(self):
+        """Test that a hold of 0 applies every event immediately."""
+        debouncer = Debouncer(0, self.scheduler)
+        transitions = debouncer.apply_many(self.manager, [WindowStatus.OPEN, WindowStatus.CLOSED], 600)
+        self.assertTrue(transitions[0].timer_started)
+        self.assertTrue(transitions[1].timer_cancelled)
+        self.assertEqual(debouncer.settling, 0)
+
+    def test_invalid_arguments(self):
+        """Test that invalid holds and durations are rejected."""
+        with self.assertRaises(ValueError):
+            Debouncer(-1)
+        with self.assertRaises(ValueError):
+            self.debouncer.apply(self.manager, WindowStatus.OPEN, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import Mock
+
+from timeraas import ingest
+from timeraas.dedupe import DUPLICATE, OUT_OF_ORDER, EventDeduplicator, event_key
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+
+class TestEventDeduplicator(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a deduplicator with room for three entries per cache."""
+        self.deduplicator = EventDeduplicator(capacity=3, restart_gap=100)
+
+    def test_events_without_keys_are_accepted(self):
+        """Test that events without id and sequence number are never dropped."""
+        self.assertIsNone(self.deduplicator.check("bath", "left"))
+        self.assertIsNone(self.deduplicator.check("bath", "left"))
+        self.assertEqual(len(self.deduplicator), 0)
+
+    def test_duplicate_ids(self):
+        """Test that a retried event id is dropped, but only for the same window."""
+        self.assertIsNone(self.deduplicator.check("bath", "left", "a1"))
+        self.assertEqual(self.deduplicator.check("bath", "left", "a1"), DUPLICATE)
+        self.assertIsNone(self.deduplicator.check("bath", "right", "a1"))
+
+    def test_sequence_numbers(self):
+        """Test that repeated and older sequence numbers are dropped."""
+        self.assertIsNone(self.deduplicator.check("bath", "left", sequence=5))
+        self.assertEqual(self.deduplicator.check("bath", "left", sequence=5), DUPLICATE)
+        self.assertEqual(self.deduplicator.check("bath", "left", sequence=4), OUT_OF_ORDER)
+        self.assertIsNone(self.deduplicator.check("bath", "left", sequence=6))
+
+    def test_restarted_sensor(self):
+        """Test that a sequence number far below the highest one is taken as a sensor restart."""
+        self.deduplicator.check("bath", "left", sequence=500)
+        self.assertIsNone(self.deduplicator.check("bath", "left", sequence=1))
+        self.assertEqual(self.deduplicator.check("bath", "left", sequence=1), DUPLICATE)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test that the caches never grow beyond their capacity."""
+        for number in range(5):
+            self.deduplicator.check("bath", "left", f"id{number}")
+        self.assertEqual(self.deduplicator.stats()["ids"], 3)
+        self.assertEqual(self.deduplicator.stats()["evicted"], 2)
+        self.assertIsNone(self.deduplicator.check("bath", "left", "id0"))  # Forgotten
+        self.assertEqual(self.deduplicator.check("bath", "left", "id4"), DUPLICATE)
+
+    def test_stats(self):
+        """Test the counters of dropped events."""
+        self.deduplicator.check("bath", "left", "a", 1)
+        self.deduplicator.check("bath", "left", "a", 1)
+        self.deduplicator.check("bath", "left", "b", 0)
+        stats = self.deduplicator.stats()
+        self.assertEqual((stats["duplicates"], stats["out_of_order"]), (1, 1))
+
+    def test_event_key(self):
+        """Test validation of event ids and sequence numbers."""
+        self.assertEqual(event_key({"id": "x", "seq": 3}), ("x", 3))
+        self.assertEqual(event_key({}), (None, None))
+        for payload in ({"id": 1.5}, {"id": True}, {"seq": -1}, {"seq": "3"}):
+            with self.assertRaises(ValueError):
+                event_key(payload)
+
+
+class TestIdempotentIngest(unittest.TestCase):
+
+    def test_retried_events_are_no_ops(self):
+        """Test that a retried batch does not touch the window again."""
+        registry = WindowRegistry(scheduler=Mock())
+        deduplicator = EventDeduplicator()
+        report = Mock()
+        events = [{"room": "bath", "window": "left", "status": "OPEN", "timestamp": 1, "seq": 1}]
+        ingest.apply_events(registry, events, 600, lambda location: None, report, deduplicator=deduplicator)
+        timer = registry.get("bath", "left")._timer
+        events.append({"room": "bath", "window": "left", "status": "CLOSED", "timestamp": 0, "seq": 0})
+        events.append({"room": "bath", "window": "left", "status": "CLOSED", "seq": "x"})
+        results = ingest.apply_events(registry, events, 600, lambda location: None, report,
+                                      deduplicator=deduplicator)
+        self.assertEqual(results[0], {"status": "OPEN", "dropped": DUPLICATE})
+        self.assertEqual(results[1], {"status": "OPEN", "dropped": OUT_OF_ORDER})
+        self.assertIn("error", results[2])
+        self.assertIs(registry.get("bath", "left")._timer, timer)
+        self.assertEqual(registry.get("bath", "left").status, WindowStatus.OPEN)
+        self.assertEqual(report.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
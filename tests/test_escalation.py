@@ -0,0 +1,67 @@
+import unittest
+
+from timeraas.escalation import EscalationSchedule, Stage, parse_escalation
+from timeraas.messages import ESCALATION_MESSAGES, EXPIRED_MESSAGES, TILTED_MESSAGES
+from timeraas.window import WindowStatus
+
+
+class TestEscalationSchedule(unittest.TestCase):
+
+    def test_stages_per_status(self):
+        """Test that open and tilted windows get their own stages and closed windows none."""
+        schedule = EscalationSchedule((Stage(600), Stage(1200)), (Stage(1800),))
+        self.assertEqual([stage.after for stage in schedule.stages(WindowStatus.OPEN)], [600, 1200])
+        self.assertEqual([stage.after for stage in schedule.stages(WindowStatus.TILTED)], [1800])
+        self.assertEqual(schedule.stages(WindowStatus.CLOSED), ())
+
+    def test_stages_must_increase(self):
+        """Test that stages have to be positive and strictly increasing."""
+        with self.assertRaises(ValueError):
+            EscalationSchedule((Stage(600), Stage(600)))
+        with self.assertRaises(ValueError):
+            EscalationSchedule((Stage(0),))
+        with self.assertRaises(ValueError):
+            EscalationSchedule((Stage(60, ()),))
+
+    def test_stage_mention(self):
+        """Test that a stage mention is prepended to its message."""
+        self.assertEqual(Stage(60, mention="<@&42>").format("Zu!"), "<@&42> Zu!")
+        self.assertEqual(Stage(60).format("Zu!"), "Zu!")
+
+
+class TestParseEscalation(unittest.TestCase):
+
+    def test_defaults(self):
+        """Test that an empty specification gives one reminder for open and tilted windows."""
+        escalation = parse_escalation("", 600, 1800)
+        schedule = escalation.schedule("anywhere")
+        self.assertEqual(schedule.open, (Stage(600, tuple(EXPIRED_MESSAGES)),))
+        self.assertEqual(schedule.tilted, (Stage(1800, tuple(TILTED_MESSAGES)),))
+        self.assertEqual(parse_escalation("", 600).schedule("anywhere").tilted, ())
+
+    def test_rooms_and_stages(self):
+        """Test parsing of default, tilted and per-room schedules with mentions."""
+        escalation = parse_escalation("*=600,1200,2700@<@&42>; */tilted=3600; bath=300,900; bath/tilted=1200", 600)
+        default = escalation.schedule("kitchen")
+        self.assertEqual([stage.after for stage in default.open], [600, 1200, 2700])
+        self.assertEqual(default.open[1].messages, tuple(ESCALATION_MESSAGES))
+        self.assertEqual(default.open[2].mention, "<@&42>")
+        self.assertEqual([stage.after for stage in default.tilted], [3600])
+        bath = escalation.schedule("bath")
+        self.assertEqual([stage.after for stage in bath.open], [300, 900])
+        self.assertEqual([stage.after for stage in bath.tilted], [1200])
+
+    def test_room_inherits_the_other_status(self):
+        """Test that overriding one status of a room keeps the default for the other."""
+        escalation = parse_escalation("bath/tilted=1200", 600)
+        self.assertEqual([stage.after for stage in escalation.schedule("bath").open], [600])
+
+    def test_invalid_entries(self):
+        """Test that malformed entries are rejected."""
+        for spec in ("600,1200", "bath=ten", "bath/ajar=60", "bath=600,300"):
+            with self.assertRaises(ValueError):
+                parse_escalation(spec, 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
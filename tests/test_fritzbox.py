@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import Mock
+
+from timeraas.fake_fritzbox import FakeFritzBox
+from timeraas.fritzbox import FritzBoxClient, FritzBoxError, FritzBoxPoller, challenge_response, parse_device_map
+from timeraas.registry import WindowRegistry
+from timeraas.window import WindowStatus
+
+
+class TestChallengeResponse(unittest.TestCase):
+
+    def test_md5_challenge(self):
+        """Test the legacy MD5 response uses the UTF-16LE encoded challenge and password."""
+        self.assertEqual(challenge_response("1234567z", "äbc"), "1234567z-9e224a41eeefa284df7bb0f26c2913e2")
+
+    def test_pbkdf2_challenge(self):
+        """Test the PBKDF2 response format of AVM's example challenge."""
+        challenge = "2$10000$5A1711$2000$5A1722"
+        self.assertEqual(challenge_response(challenge, "1example!"),
+                         "5A1722$1798a1672bca7c6463d6b245f82b53703b0f50813401b03e4045a5861e689adb")
+
+
+class TestFritzBoxClient(unittest.TestCase):
+
+    def setUp(self):
+        """Start a fake Fritz!Box with two sensors."""
+        self.box = FakeFritzBox().start()
+        self.box.add_device("08761 0000001", "bath/left", 1)
+        self.box.add_device("08761 0000002", "hall", 0)
+        self.client = FritzBoxClient(self.box.url, "timeraas", "secret")
+
+    def tearDown(self):
+        self.client.close()
+        self.box.stop()
+
+    def test_login_and_bulk_fetch(self):
+        """Test that all device states come from one bulk call after logging in once."""
+        self.assertEqual(self.client.device_states(),
+                         {"087610000001": ("bath/left", 1), "087610000002": ("hall", 0)})
+        self.client.device_states()
+        commands = [command for _, command in self.box.requests if command]
+        self.assertEqual(commands, ["getdevicelistinfos", "getdevicelistinfos"])
+        self.assertEqual(sum(1 for path, command in self.box.requests if path == "/login_sid.lua"), 2)
+
+    def test_relogin_on_expired_session(self):
+        """Test that an expired session id triggers exactly one new login."""
+        self.client.device_states()
+        sid = self.client.sid
+        self.box.expire_sessions()
+        self.client.device_states()
+        self.assertNotEqual(self.client.sid, sid)
+
+    def test_wrong_password(self):
+        """Test that a rejected login raises FritzBoxError."""
+        client = FritzBoxClient(self.box.url, "timeraas", "wrong")
+        with self.assertRaises(FritzBoxError):
+            client.device_states()
+        client.close()
+
+
+class TestFritzBoxPoller(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a poller against a fake Fritz!Box and a registry."""
+        self.box = FakeFritzBox().start()
+        self.box.add_device("1", "bath/left", 0)
+        self.box.add_device("2", "Flur", 0)
+        self.registry = WindowRegistry(scheduler=Mock())
+        self.applied = []
+
+        def apply_events(events):
+            self.applied.append(events)
+            for event in events:
+                self.registry.get_or_create(event["room"], event["window"]).apply(WindowStatus[event["status"]], 600)
+
+        self.client = FritzBoxClient(self.box.url, "timeraas", "secret")
+        self.poller = FritzBoxPoller(self.client, self.registry, apply_events, devices={"2": ("hall", "door")},
+                                     min_interval=1, max_interval=4, backoff=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.box.stop()
+
+    def test_only_changes_are_applied(self):
+        """Test that unchanged sensors are not fed into the registry."""
+        self.assertEqual(self.poller.poll(), [])
+        self.box.set_state("1", 1)
+        events = self.poller.poll()
+        self.assertEqual([(e["room"], e["window"], e["status"]) for e in events], [("bath", "left", "OPEN")])
+        self.assertEqual(self.poller.poll(), [])
+        self.box.set_state("2", 1)
+        self.assertEqual([(e["room"], e["window"]) for e in self.poller.poll()], [("hall", "door")])
+        self.assertEqual(len(self.applied), 2)
+
+    def test_adaptive_interval(self):
+        """Test that the interval backs off while idle and resets after a change."""
+        self.poller.poll()
+        self.assertEqual(self.poller.interval, 2)
+        self.poller.poll()
+        self.poller.poll()
+        self.assertEqual(self.poller.interval, 4)
+        self.box.set_state("1", 1)
+        self.poller.poll()
+        self.assertEqual(self.poller.interval, 1)
+
+    def test_only_owned_windows_are_polled(self):
+        """Test that in cluster mode windows of other nodes are left to their owner instead of being reported again."""
+        poller = FritzBoxPoller(self.client, self.registry, lambda events: self.applied.append(events),
+                                devices={"2": ("hall", "door")}, owns=lambda room, window: room == "bath")
+        self.box.set_state("1", 1)
+        self.box.set_state("2", 1)
+        self.assertEqual([(e["room"], e["window"]) for e in poller.poll()], [("bath", "left")])
+
+    def test_invalid_intervals(self):
+        """Test that invalid poll intervals are rejected."""
+        with self.assertRaises(ValueError):
+            FritzBoxPoller(self.client, self.registry, Mock(), min_interval=5, max_interval=1)
+
+
+class TestParseDeviceMap(unittest.TestCase):
+
+    def test_parse_device_map(self):
+        """Test parsing of the FRITZBOX_DEVICES configuration string."""
+        self.assertEqual(parse_device_map("08761 0000001=bath/left, 2=hall"),
+                         {"087610000001": ("bath", "left"), "2": ("hall", "window")})
+        with self.assertRaises(ValueError):
+            parse_device_map("=bath/left")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from timeraas.history import TransitionHistory
+from timeraas.window import WindowStatus
+
+
+class TestTransitionHistory(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a small history so the ring buffer wraps quickly."""
+        self.history = TransitionHistory(capacity=4)
+
+    def test_invalid_capacity(self):
+        """Test that a non-positive capacity is rejected."""
+        with self.assertRaises(ValueError):
+            TransitionHistory(capacity=0)
+
+    def test_append_and_iterate(self):
+        """Test that transitions are returned oldest first."""
+        self.history.append(1.0, WindowStatus.OPEN)
+        self.history.append(2.0, WindowStatus.CLOSED)
+        self.assertEqual(list(self.history), [(1.0, WindowStatus.OPEN), (2.0, WindowStatus.CLOSED)])
+        self.assertEqual(self.history[-1], (2.0, WindowStatus.CLOSED))
+
+    def test_wraps_at_capacity(self):
+        """Test that the oldest transitions are overwritten once the buffer is full."""
+        for i in range(10):
+            self.history.append(float(i), WindowStatus.OPEN if i % 2 else WindowStatus.CLOSED)
+        self.assertEqual(len(self.history), 4)
+        self.assertEqual([timestamp for timestamp, _ in self.history], [6.0, 7.0, 8.0, 9.0])
+
+    def test_since_uses_binary_search_over_wrapped_buffer(self):
+        """Test range queries on a wrapped buffer."""
+        for i in range(6):
+            self.history.append(float(i), WindowStatus.OPEN)
+        self.assertEqual(self.history.bisect(3.5), 2)
+        self.assertEqual([t for t, _ in self.history.since(4.0)], [4.0, 5.0])
+        self.assertEqual([t for t, _ in self.history.since(0.0)], [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(self.history.since(10.0), [])
+        self.assertEqual([t for t, _ in self.history.since(None, limit=2)], [2.0, 3.0])
+
+    def test_timestamps_never_decrease(self):
+        """Test that a clock stepping backwards keeps the buffer sorted."""
+        self.history.append(5.0, WindowStatus.OPEN)
+        self.history.append(4.0, WindowStatus.CLOSED)
+        self.assertEqual(self.history[1], (5.0, WindowStatus.CLOSED))
+
+    def test_index_out_of_range(self):
+        """Test that indexing outside the buffer raises IndexError."""
+        with self.assertRaises(IndexError):
+            self.history[0]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+from timeraas.journal import Journal, recover
+from timeraas.registry import WindowRegistry
+from timeraas.scheduler import TimerScheduler
+from timeraas.window import WindowStatus
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a journal in a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "timeraas.journal")
+        self.journal = Journal(self.path, flush_interval=0.01)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def read_lines(self):
+        with open(self.path, encoding="utf-8") as journal_file:
+            return [json.loads(line) for line in journal_file]
+
+    def test_invalid_arguments(self):
+        """Test that invalid flush and compact intervals are rejected."""
+        with self.assertRaises(ValueError):
+            Journal(self.path, flush_interval=0)
+        with self.assertRaises(ValueError):
+            Journal(self.path, compact_every=0)
+
+    def test_group_commit(self):
+        """Test that buffered records are written by the background thread in one batch."""
+        self.journal.record("toilet", "window", WindowStatus.OPEN, deadline=123.0)
+        self.journal.record("kitchen", "left", WindowStatus.CLOSED)
+        deadline = time.monotonic() + 2
+        while len(self.read_lines()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.read_lines()[0],
+                         {"room": "toilet", "window": "window", "status": "OPEN", "deadline": 123.0, "expired": False,
+                          "stage": 0})
+
+    def test_reload_latest_state(self):
+        """Test that reopening the journal yields the latest record per window."""
+        self.journal.record("toilet", "window", WindowStatus.OPEN, deadline=123.0)
+        self.journal.record("toilet", "window", WindowStatus.CLOSED)
+        self.journal.close()
+        reopened = Journal(self.path)
+        self.assertEqual(reopened.state()[("toilet", "window")]["status"], "CLOSED")
+        reopened.close()
+
+    def test_torn_record_is_skipped(self):
+        """Test that a partially written last line does not break recovery."""
+        self.journal.record("toilet", "window", WindowStatus.OPEN)
+        self.journal.close()
+        with open(self.path, "a", encoding="utf-8") as journal_file:
+            journal_file.write('{"room": "toil')
+        reopened = Journal(self.path)
+        self.assertEqual(reopened.state()[("toilet", "window")]["status"], "OPEN")
+        reopened.close()
+
+    def test_compaction_bounds_journal(self):
+        """Test that the journal is truncated into a snapshot after compact_every records."""
+        self.journal.close()
+        journal = Journal(self.path, compact_every=10)
+        for i in range(25):
+            journal.record("toilet", "window", WindowStatus.OPEN if i % 2 else WindowStatus.CLOSED)
+            journal.flush()
+        self.assertLess(len(self.read_lines()), 10)
+        self.assertTrue(os.path.exists(journal.snapshot_path))
+        journal.close()
+        reopened = Journal(self.path)
+        self.assertEqual(reopened.state()[("toilet", "window")]["status"], "CLOSED")
+        reopened.close()
+
+    def test_closed_journal_rejects_records(self):
+        """Test that recording after close raises an error."""
+        self.journal.close()
+        with self.assertRaises(RuntimeError):
+            self.journal.record("toilet", "window", WindowStatus.OPEN)
+
+
+class TestRecover(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a journal and a registry with its own scheduler."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "timeraas.journal")
+        self.scheduler = TimerScheduler(tick=0.01)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip_rearms_timers(self):
+        """Test that journaled manager events are restored with their remaining time."""
+        journal = Journal(self.path)
+        registry = WindowRegistry(scheduler=self.scheduler)
+        registry.add_listener(journal.listener)
+        registry.get_or_create("toilet", "window").apply(WindowStatus.OPEN, 600)
+        registry.get_or_create("kitchen", "left").apply(WindowStatus.OPEN, 600)
+        registry.get_or_create("kitchen", "left").apply(WindowStatus.CLOSED, 600)
+        journal.close()
+
+        restarted = WindowRegistry(scheduler=self.scheduler)
+        reopened = Journal(self.path)
+        self.assertEqual(recover(restarted, reopened, lambda location: Mock()), 2)
+        toilet = restarted.get("toilet", "window")
+        self.assertEqual(toilet.status, WindowStatus.OPEN)
+        self.assertIsNotNone(toilet._timer)
+        self.assertAlmostEqual(toilet.deadline, time.time() + 600, delta=5)
+        self.assertEqual(restarted.get("kitchen", "left").status, WindowStatus.CLOSED)
+        self.assertIsNone(restarted.get("kitchen", "left")._timer)
+        reopened.close()
+
+    def test_overdue_timer_fires_immediately(self):
+        """Test that a deadline that passed during downtime fires right after recovery."""
+        journal = Journal(self.path)
+        journal.record("toilet", "window", WindowStatus.OPEN, deadline=time.time() - 60)
+        callback = Mock()
+        registry = WindowRegistry(scheduler=self.scheduler)
+        recover(registry, journal, lambda location: callback)
+        deadline = time.monotonic() + 2
+        while not callback.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        callback.assert_called_once()
+        self.assertTrue(registry.get("toilet", "window").timer_expired)
+        journal.close()
+
+    def test_expired_state_is_kept(self):
+        """Test that an already reported window stays expired and is not alerted again."""
+        journal = Journal(self.path)
+        journal.record("toilet", "window", WindowStatus.OPEN, expired=True)
+        registry = WindowRegistry(scheduler=self.scheduler)
+        recover(registry, journal, lambda location: Mock())
+        manager = registry.get("toilet", "window")
+        self.assertTrue(manager.timer_expired)
+        self.assertIsNone(manager._timer)
+        journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from timeraas.logs import DeferredQueueHandler, JsonFormatter, SizeAndTimeRotatingFileHandler, configure_logging
+
+
+class TestLoggingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a scratch directory and a dedicated logger name."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "timeraas.log")
+        self.logger = logging.getLogger("timeraas.tests.logs")
+        self.logger.propagate = False
+
+    def tearDown(self):
+        for handler in self.pipeline_handlers():
+            self.logger.removeHandler(handler)
+        shutil.rmtree(self.directory)
+
+    def pipeline_handlers(self) -> list:
+        return [handler for handler in self.logger.handlers if getattr(handler, "timeraas_pipeline", False)]
+
+    def read_lines(self) -> list:
+        with open(self.path, encoding="utf-8") as log_file:
+            return log_file.read().splitlines()
+
+    def test_records_are_written_by_the_listener(self):
+        """Test that the logger only gets a queue handler and the listener writes the file."""
+        listener = configure_logging(self.logger.name, path=self.path, console=False)
+        handlers = self.pipeline_handlers()
+        self.assertEqual(len(handlers), 1)
+        self.assertIsInstance(handlers[0], DeferredQueueHandler)
+        self.logger.info("Window %s is now %s", "toilet/window", "OPEN")
+        listener.stop()
+        lines = self.read_lines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith("INFO - Window toilet/window is now OPEN"))
+
+    def test_reconfiguring_replaces_the_pipeline(self):
+        """Test that calling configure_logging again does not add duplicate handlers."""
+        configure_logging(self.logger.name, path=self.path, console=False)
+        listener = configure_logging(self.logger.name, path=self.path, console=False)
+        self.assertEqual(len(self.pipeline_handlers()), 1)
+        self.logger.info("once")
+        listener.stop()
+        self.assertEqual(len(self.read_lines()), 1)
+
+    def test_json_format(self):
+        """Test that JSON mode writes one object per line."""
+        listener = configure_logging(self.logger.name, path=self.path, json_format=True, console=False)
+        self.logger.warning("Fenster %s offen", "bad")
+        listener.stop()
+        entry = json.loads(self.read_lines()[0])
+        self.assertEqual(entry["level"], "WARNING")
+        self.assertEqual(entry["logger"], self.logger.name)
+        self.assertEqual(entry["message"], "Fenster bad offen")
+
+    def test_formatting_is_deferred_to_the_listener(self):
+        """Test that the queue handler does not format records on the calling thread."""
+        record = logging.LogRecord("timeraas", logging.INFO, __file__, 1, "value %s", ("x",), None)
+        prepared = DeferredQueueHandler(None).prepare(record)
+        self.assertIs(prepared, record)
+        self.assertEqual(prepared.msg, "value %s")
+        self.assertEqual(prepared.args, ("x",))
+
+    def test_json_formatter_includes_exceptions(self):
+        """Test that exception details are kept in JSON output."""
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            record = logging.LogRecord("timeraas", logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertIn("RuntimeError: boom", entry["exception"])
+
+
+class TestSizeAndTimeRotatingFileHandler(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a scratch directory for rotated files."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "timeraas.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def emit(self, handler, message: str, created: float = None):
+        record = logging.LogRecord("timeraas", logging.INFO, __file__, 1, message, (), None)
+        if created is not None:
+            record.created = created
+        handler.emit(record)
+
+    def test_rotates_by_size(self):
+        """Test that the file is rotated once it exceeds maxBytes."""
+        handler = SizeAndTimeRotatingFileHandler(self.path, maxBytes=50, backupCount=2)
+        for i in range(10):
+            self.emit(handler, f"message number {i}")
+        handler.close()
+        self.assertTrue(os.path.exists(f"{self.path}.1"))
+        self.assertFalse(os.path.exists(f"{self.path}.3"))
+
+    def test_rotates_by_time(self):
+        """Test that the file is rotated once the interval has passed."""
+        handler = SizeAndTimeRotatingFileHandler(self.path, backupCount=2, interval=60)
+        self.emit(handler, "first")
+        self.assertFalse(os.path.exists(f"{self.path}.1"))
+        self.emit(handler, "second", created=handler.rollover_at + 1)
+        handler.close()
+        with open(f"{self.path}.1", encoding="utf-8") as rotated:
+            self.assertEqual(rotated.read().strip(), "first")
+        with open(self.path, encoding="utf-8") as current:
+            self.assertEqual(current.read().strip(), "second")
+
+    def test_zero_interval_disables_time_rotation(self):
+        """Test that a zero interval only rotates by size."""
+        handler = SizeAndTimeRotatingFileHandler(self.path, interval=0)
+        self.assertIsNone(handler.rollover_at)
+        handler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,12 @@
 import threading
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import ANY, patch, Mock
 
+from timeraas.escalation import EscalationSchedule, Stage
 from timeraas.manager import WindowManager
 from timeraas.room import Room
+from timeraas.clock import VirtualClock
+from timeraas.scheduler import TimerScheduler, VirtualScheduler
 from timeraas.window import Window, WindowStatus
 
 
@@ -13,25 +16,31 @@ class TestWindowManager(unittest.TestCase):
         """Set up a Room, Window, and WindowManager instance for testing."""
         self.room = Room(name="Living Room", floor=1)
         self.window = Window(self.room)
-        self.manager = WindowManager(self.window)
+        self.scheduler = TimerScheduler()
+        self.manager = WindowManager(self.window, self.scheduler)
 
-    @patch('threading.Timer')
-    def test_start_timer(self, mock_timer):
-        """Test starting a timer sets up a timer correctly."""
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_start_timer(self):
+        """Test starting a timer registers a deadline with the scheduler."""
+        scheduler = Mock()
+        manager = WindowManager(self.window, scheduler)
         callback = Mock()
-        self.manager.start_timer(600, callback)
-        mock_timer.assert_called_once_with(600, self.manager._on_timer_expire, [callback])
-        self.assertIsNotNone(self.manager._timer)
+        manager.start_timer(600, callback)
+        scheduler.schedule.assert_called_once_with(600, manager._on_timer_expire, callback, None, 0, ANY)
+        self.assertIsNotNone(manager._timer)
 
     def test_cancel_timer(self):
         """Test cancelling an active timer."""
-        with patch.object(threading.Timer, 'cancel', return_value=None) as mock_cancel:
+        with patch.object(self.scheduler, 'cancel', wraps=self.scheduler.cancel) as mock_cancel:
             callback = Mock()
             self.manager.start_timer(600, callback)
             self.manager.cancel_timer()
             mock_cancel.assert_called_once()
             self.assertIsNone(self.manager._timer)
             self.assertFalse(self.manager._timer_expired)
+            self.assertEqual(self.scheduler.pending, 0)
 
     def test_status_property(self):
         """Test that status property updates window status correctly."""
@@ -46,8 +55,7 @@ class TestWindowManager(unittest.TestCase):
         self.manager._timer_expired = True
         self.assertTrue(self.manager.timer_expired)
 
-    @patch('threading.Timer')
-    def test_on_timer_expire(self, mock_timer):
+    def test_on_timer_expire(self):
         """Test that the timer expiration function sets timer_expired to True."""
         callback = Mock()
         # Simulate expiration by manually calling _on_timer_expire
@@ -64,18 +72,93 @@ class TestWindowManager(unittest.TestCase):
         callback.assert_called_once()
         self.assertTrue(self.manager.timer_expired)
 
-    @patch('threading.Timer')
-    def test_timer_already_running(self, mock_timer):
+    def test_timer_already_running(self):
         """Test that starting a new timer cancels an existing timer."""
+        scheduler = Mock()
+        manager = WindowManager(self.window, scheduler)
         callback1 = Mock()
         callback2 = Mock()
-        self.manager.start_timer(600, callback1)
-        mock_timer_instance = mock_timer.return_value
-        mock_timer_instance.cancel = Mock()
+        manager.start_timer(600, callback1)
+        first_handle = manager._timer
+
+        manager.start_timer(300, callback2)
+        scheduler.cancel.assert_called_once_with(first_handle)
+        scheduler.schedule.assert_called_with(300, manager._on_timer_expire, callback2, None, 0, ANY)
+
+    def test_timer_fires_through_scheduler(self):
+        """Test that an armed timer expires via the shared scheduler thread."""
+        fired = threading.Event()
+        self.manager.start_timer(1, fired.set)
+        self.assertTrue(fired.wait(3))
+        self.assertTrue(self.manager.timer_expired)
+
+    def test_thread_count_flat(self):
+        """Test that many open windows do not spawn one thread each."""
+        threads_before = threading.active_count()
+        managers = [WindowManager(Window(self.room), self.scheduler) for _ in range(200)]
+        for manager in managers:
+            manager.start_timer(600, Mock())
+        self.assertLessEqual(threading.active_count(), threads_before + 1)
+        self.assertEqual(self.scheduler.pending, 200)
+
+    def test_apply_open_and_close(self):
+        """Test that apply arms the timer on open and cancels it on close."""
+        transition = self.manager.apply(WindowStatus.OPEN, 600, Mock())
+        self.assertEqual(transition.previous, WindowStatus.CLOSED)
+        self.assertTrue(transition.timer_started)
+        self.assertIsNotNone(self.manager._timer)
+
+        self.manager._timer_expired = True
+        transition = self.manager.apply(WindowStatus.CLOSED, 600)
+        self.assertTrue(transition.timer_cancelled)
+        self.assertTrue(transition.was_expired)
+        self.assertIsNone(self.manager._timer)
+        self.assertEqual(self.manager.status, WindowStatus.CLOSED)
 
-        self.manager.start_timer(300, callback2)
-        mock_timer_instance.cancel.assert_called_once()
-        mock_timer.assert_called_with(300, self.manager._on_timer_expire, [callback2])
+    def test_apply_many_single_lock(self):
+        """Test that apply_many applies every status in order with one lock acquisition."""
+        lock = Mock(wraps=threading.Lock())
+        lock.__enter__ = Mock(return_value=None)
+        lock.__exit__ = Mock(return_value=None)
+        self.manager._lock = lock
+        transitions = self.manager.apply_many([WindowStatus.OPEN, WindowStatus.CLOSED, WindowStatus.OPEN], 600)
+        self.assertEqual(lock.__enter__.call_count, 1)
+        self.assertEqual([t.status for t in transitions], [WindowStatus.OPEN, WindowStatus.CLOSED, WindowStatus.OPEN])
+        self.assertEqual(self.scheduler.pending, 1)
+
+    def test_apply_invalid_duration(self):
+        """Test that apply validates the duration like start_timer."""
+        with self.assertRaises(ValueError):
+            self.manager.apply(WindowStatus.OPEN, 0)
+
+    def test_listener_receives_events(self):
+        """Test that listeners see status changes with the deadline and the expiry."""
+        listener = Mock()
+        self.manager.add_listener(listener)
+        self.manager.apply(WindowStatus.OPEN, 600)
+        manager, event = listener.call_args[0]
+        self.assertIs(manager, self.manager)
+        self.assertEqual((event.kind, event.previous, event.status), ("status", WindowStatus.CLOSED, WindowStatus.OPEN))
+        self.assertIsNotNone(event.deadline)
+
+        self.manager._on_timer_expire(None)
+        event = listener.call_args[0][1]
+        self.assertEqual(event.kind, "expired")
+        self.assertTrue(event.expired)
+        self.assertIsNone(event.deadline)
+
+    def test_failing_listener_is_isolated(self):
+        """Test that an exception in a listener does not break the transition."""
+        self.manager.add_listener(Mock(side_effect=Exception("boom")))
+        transition = self.manager.apply(WindowStatus.OPEN, 600)
+        self.assertTrue(transition.timer_started)
+
+    def test_restore(self):
+        """Test restoring an open window re-arms the timer with the remaining time."""
+        self.manager.restore(WindowStatus.OPEN, remaining=120.5)
+        self.assertEqual(self.manager.status, WindowStatus.OPEN)
+        self.assertIsNotNone(self.manager._timer)
+        self.assertEqual(self.scheduler.pending, 1)
 
     def test_str_representation(self):
         """Test the __str__ representation of WindowManager."""
@@ -90,5 +173,82 @@ class TestWindowManager(unittest.TestCase):
         self.assertEqual(repr(self.manager), f"WindowManager(window={self.window!r}, timer_expired=False)")
 
 
+class TestEscalation(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a manager on a mock scheduler with a three stage schedule."""
+        self.scheduler = Mock()
+        self.manager = WindowManager(Window(Room("bath", 0)), self.scheduler)
+        self.schedule = EscalationSchedule((Stage(600), Stage(1200), Stage(2700)), (Stage(1800),))
+        self.callback = Mock()
+
+    def fire(self):
+        _, callback, *args = self.scheduler.schedule.call_args[0]
+        callback(*args)
+
+    def test_only_the_next_stage_is_armed(self):
+        """Test that each stage arms the following one and passes itself to the callback."""
+        transition = self.manager.apply(WindowStatus.OPEN, self.schedule, self.callback)
+        self.assertTrue(transition.timer_started)
+        self.assertEqual(self.scheduler.schedule.call_count, 1)
+        self.assertEqual(self.scheduler.schedule.call_args[0][0], 600)
+        deadline = self.manager.deadline
+        self.fire()
+        self.callback.assert_called_once_with(self.schedule.open[0])
+        self.assertEqual(self.manager.stage, 1)
+        self.assertEqual(self.scheduler.schedule.call_count, 2)
+        self.assertAlmostEqual(self.manager.deadline, deadline + 600)
+        self.fire()
+        self.fire()
+        self.assertEqual(self.callback.call_args[0][0], self.schedule.open[2])
+        self.assertEqual(self.manager.stage, 3)
+        self.assertIsNone(self.manager.deadline)
+        self.assertEqual(self.scheduler.schedule.call_count, 3)
+
+    def test_tilted_windows_use_their_own_stages(self):
+        """Test that a tilted window is armed with the tilted stages."""
+        self.manager.apply(WindowStatus.TILTED, self.schedule, self.callback)
+        self.assertEqual(self.scheduler.schedule.call_args[0][0], 1800)
+
+    def test_switching_to_tilted_keeps_the_alert(self):
+        """Test that tilting a reported window restarts the schedule but still reports closing."""
+        self.manager.apply(WindowStatus.OPEN, self.schedule, self.callback)
+        self.fire()
+        transition = self.manager.apply(WindowStatus.TILTED, self.schedule, self.callback)
+        self.assertTrue(transition.timer_started)
+        self.assertEqual(self.manager.stage, 0)
+        self.assertTrue(self.manager.timer_expired)
+        transition = self.manager.apply(WindowStatus.CLOSED, self.schedule, self.callback)
+        self.assertTrue(transition.was_expired)
+        self.assertIsNone(self.manager.deadline)
+
+    def test_restore_resumes_the_next_stage(self):
+        """Test that restored state re-arms the stage that had not fired yet."""
+        self.manager.restore(WindowStatus.OPEN, 30, True, self.callback, self.schedule.open, 2)
+        self.scheduler.schedule.assert_called_once_with(30, self.manager._on_timer_expire, self.callback,
+                                                        self.schedule.open, 2, ANY)
+        self.assertTrue(self.manager.timer_expired)
+        self.assertEqual(self.manager.stage, 2)
+
+    def test_expiry_taken_before_close_is_ignored(self):
+        """Test that an expiry the scheduler took out before the window closed or re-opened does nothing."""
+        scheduler = VirtualScheduler(VirtualClock(1000.0))
+        manager = WindowManager(Window(Room("bath", 0)), scheduler)
+        manager.apply(WindowStatus.OPEN, self.schedule, self.callback)
+        stale = manager._timer
+        manager.apply(WindowStatus.CLOSED, self.schedule, self.callback)
+        stale.callback(*stale.args)  # The scheduler had already popped it when the window closed
+        self.assertEqual((manager.deadline, manager.timer_expired, manager.stage), (None, False, 0))
+
+        manager.apply(WindowStatus.OPEN, self.schedule, self.callback)
+        current, deadline = manager._timer, manager.deadline
+        stale.callback(*stale.args)
+        self.assertIs(manager._timer, current)
+        self.assertEqual((manager.deadline, manager.timer_expired), (deadline, False))
+        manager.apply(WindowStatus.CLOSED, self.schedule, self.callback)
+        scheduler.advance(3600)
+        self.callback.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
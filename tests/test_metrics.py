@@ -0,0 +1,114 @@
+import threading
+import unittest
+
+from timeraas.manager import WindowManager
+from timeraas.metrics import MetricsRegistry, TimedLock, timed
+from timeraas.room import Room
+from timeraas.scheduler import TimerScheduler
+from timeraas.window import Window
+from timeraas import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an empty metrics registry."""
+        self.metrics = MetricsRegistry()
+
+    def test_counter_sums_shards_of_all_threads(self):
+        """Test that increments from several threads, including finished ones, are all counted."""
+        counter = self.metrics.counter("events_total", "Events.")
+
+        def work():
+            for _ in range(1000):
+                counter.inc()
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc()  # Registers a new shard and folds the finished ones
+        self.assertEqual(counter.value, 8001)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket assignment on the upper bound and the rendered cumulative counts."""
+        histogram = self.metrics.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 5.65)
+        text = self.metrics.render()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count 4', text)
+
+    def test_invalid_buckets(self):
+        """Test that unsorted buckets are rejected."""
+        with self.assertRaises(ValueError):
+            self.metrics.histogram("bad_seconds", "Bad.", buckets=(1.0, 0.1))
+
+    def test_registration_returns_existing_metric(self):
+        """Test that the same name and labels return the same metric and conflicting kinds are rejected."""
+        first = self.metrics.counter("requests_total", "Requests.", labels={"endpoint": "a"})
+        self.assertIs(self.metrics.counter("requests_total", "Requests.", labels={"endpoint": "a"}), first)
+        self.assertIsNot(self.metrics.counter("requests_total", "Requests.", labels={"endpoint": "b"}), first)
+        with self.assertRaises(ValueError):
+            self.metrics.histogram("requests_total", "Requests.", labels={"endpoint": "a"})
+
+    def test_render_groups_labelled_metrics(self):
+        """Test that one HELP and TYPE line is written per metric name."""
+        self.metrics.counter("requests_total", "Requests.", labels={"endpoint": "a"}).inc(2)
+        self.metrics.counter("requests_total", "Requests.", labels={"endpoint": "b\"x"}).inc()
+        self.metrics.gauge("open_windows", "Open windows.", lambda: 3)
+        text = self.metrics.render()
+        self.assertEqual(text.count("# TYPE requests_total counter"), 1)
+        self.assertIn('requests_total{endpoint="a"} 2', text)
+        self.assertIn('requests_total{endpoint="b\\"x"} 1', text)
+        self.assertIn("# TYPE open_windows gauge\nopen_windows 3\n", text)
+
+    def test_timed_decorator(self):
+        """Test that timed observes every call, including failing ones."""
+        histogram = self.metrics.histogram("call_seconds", "Calls.")
+
+        @timed(histogram)
+        def fail():
+            raise RuntimeError("boom")
+        with self.assertRaises(RuntimeError):
+            fail()
+        self.assertEqual(histogram.count, 1)
+
+    def test_timed_lock_records_waits(self):
+        """Test that a contended acquisition records its wait time."""
+        histogram = self.metrics.histogram("wait_seconds", "Waits.", buckets=(0.001, 1.0))
+        lock = TimedLock(histogram)
+        with lock:
+            pass
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(histogram.sum, 0.0)
+
+        lock.acquire()
+        waiter = threading.Thread(target=lambda: (lock.acquire(), lock.release()))
+        waiter.start()
+        threading.Event().wait(0.02)
+        lock.release()
+        waiter.join()
+        self.assertEqual(histogram.count, 3)
+        self.assertGreater(histogram.sum, 0.01)
+
+    def test_timer_expiry_lag_is_recorded(self):
+        """Test that a WindowManager records how late its timer fired."""
+        scheduler = TimerScheduler(tick=0.01)
+        manager = WindowManager(Window(Room("toilet", 0)), scheduler)
+        before = metrics.TIMER_EXPIRY_LAG.count
+        fired = threading.Event()
+        manager.start_timer(1, fired.set)
+        manager._deadline -= 1  # Pretend the deadline passed a second ago
+        scheduler.schedule(0, manager._on_timer_expire, fired.set)
+        self.assertTrue(fired.wait(1))
+        self.assertEqual(metrics.TIMER_EXPIRY_LAG.count, before + 1)
+        scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
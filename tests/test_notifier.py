@@ -0,0 +1,188 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import requests
+
+from timeraas.notifier import Notifier, TokenBucket, retry_after
+
+
+def make_response(status_code, headers=None, body=None):
+    """Builds a mocked requests.Response with the given status, headers and JSON body."""
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = body or {}
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status_code} Error", response=response)
+    return response
+
+
+class TestNotifier(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a Notifier with a mocked session."""
+        self.session = Mock()
+        self.notifier = Notifier('http://mock.url', workers=2, queue_size=10, session=self.session,
+                                 rate=1000, burst=1000, backoff=0)
+
+    def tearDown(self):
+        self.notifier.close()
+
+    def test_invalid_arguments(self):
+        """Test that invalid worker and queue sizes are rejected."""
+        with self.assertRaises(ValueError):
+            Notifier('http://mock.url', workers=0)
+        with self.assertRaises(ValueError):
+            Notifier('http://mock.url', queue_size=0)
+        with self.assertRaises(ValueError):
+            Notifier('http://mock.url', digest_window=-1)
+
+    def test_deliver_success(self):
+        """Test successful delivery of a message through the session."""
+        self.assertTrue(self.notifier.deliver("Test message"))
+        self.session.post.assert_called_once_with('http://mock.url', json={"content": "Test message"}, timeout=10.0)
+        self.assertEqual(self.notifier.stats()['sent'], 1)
+
+    @patch('timeraas.notifier.logger')
+    def test_deliver_failure(self, mock_logger):
+        """Test that a failed delivery is logged and counted."""
+        self.session.post.side_effect = requests.RequestException("Network error")
+        self.assertFalse(self.notifier.deliver("Test message"))
+        mock_logger.error.assert_called_once()
+        self.assertIn("Failed to send message to Discord", mock_logger.error.call_args[0][0])
+        self.assertEqual(self.notifier.stats()['failed'], 1)
+        self.assertEqual(self.session.post.call_count, 6)  # first attempt plus five retries
+
+    def test_deliver_retries_transient_failure(self):
+        """Test that a server error is retried and the message is not dropped."""
+        self.session.post.side_effect = [make_response(503), make_response(204)]
+        self.assertTrue(self.notifier.deliver("Test message"))
+        self.assertEqual(self.notifier.stats()['retried'], 1)
+
+    @patch('timeraas.notifier.logger')
+    def test_deliver_does_not_retry_client_error(self, mock_logger):
+        """Test that a client error other than 429 fails without retrying."""
+        self.session.post.return_value = make_response(404)
+        self.assertFalse(self.notifier.deliver("Test message"))
+        self.session.post.assert_called_once()
+
+    def test_deliver_honors_retry_after(self):
+        """Test that a 429 response pauses the bucket for Retry-After and then retries."""
+        self.session.post.side_effect = [make_response(429, {'Retry-After': '0.05'}), make_response(204)]
+        with patch.object(self.notifier._bucket, 'pause', wraps=self.notifier._bucket.pause) as mock_pause:
+            self.assertTrue(self.notifier.deliver("Test message"))
+        mock_pause.assert_called_once_with(0.05)
+        self.assertEqual(self.notifier.stats()['rate_limited'], 1)
+        self.assertEqual(self.session.post.call_count, 2)
+
+    def test_retry_after_parsing(self):
+        """Test reading the wait from headers and from Discord's JSON body."""
+        self.assertEqual(retry_after(make_response(429, {'Retry-After': '2'})), 2.0)
+        self.assertEqual(retry_after(make_response(429, {'X-RateLimit-Reset-After': '1.5'})), 1.5)
+        self.assertEqual(retry_after(make_response(429, body={'retry_after': 0.3})), 0.3)
+        self.assertIsNone(retry_after(make_response(429)))
+
+    def test_digest_coalesces_alerts(self):
+        """Test that alerts arriving within the digest window are merged into one message."""
+        notifier = Notifier('http://mock.url', workers=1, session=self.session, digest_window=0.2,
+                            rate=1000, burst=1000)
+        notifier.send("Ich bin noch auf!", "toilet/window")
+        notifier.send("Mir wird kalt!", "kitchen/left")
+        notifier.join()
+        notifier.close()
+        self.session.post.assert_called_once()
+        content = self.session.post.call_args[1]['json']['content']
+        self.assertIn("kitchen/left, toilet/window", content)
+        self.assertIn("- toilet/window: Ich bin noch auf!", content)
+        self.assertEqual(notifier.stats()['coalesced'], 1)
+
+    def test_digest_is_not_split_between_workers(self):
+        """Test that with several workers a burst of alerts still becomes one digest."""
+        notifier = Notifier('http://mock.url', workers=4, session=self.session, digest_window=0.2,
+                            rate=1000, burst=1000)
+        for i in range(6):
+            notifier.send(f"message {i}", f"room{i}/window")
+            time.sleep(0.01)  # Idle workers would pick up the later alerts of the burst
+        notifier.join()
+        notifier.close()
+        self.session.post.assert_called_once()
+        self.assertEqual(notifier.stats()['coalesced'], 5)
+
+    def test_send_after_close_is_dropped(self):
+        """Test that a closed notifier drops messages instead of starting new workers."""
+        self.notifier.send("before")
+        self.notifier.close()
+        threads = threading.active_count()
+        self.assertFalse(self.notifier.send("after"))
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(self.notifier.stats()['dropped'], 1)
+        self.assertEqual(self.session.post.call_count, 1)
+
+    def test_format_digest_single(self):
+        """Test that a single alert is sent unchanged."""
+        self.assertEqual(Notifier.format_digest([("toilet/window", "Hallo")]), "Hallo")
+
+    def test_send_is_asynchronous(self):
+        """Test that send returns before a slow delivery has finished."""
+        release = threading.Event()
+        self.session.post.side_effect = lambda *args, **kwargs: release.wait(2) and Mock()
+        self.assertTrue(self.notifier.send("Test message"))
+        self.assertEqual(self.notifier.stats()['sent'], 0)
+        release.set()
+        self.notifier.join()
+        self.assertEqual(self.notifier.stats()['sent'], 1)
+
+    def test_queue_full_drops(self):
+        """Test that messages are dropped once the bounded queue is full."""
+        release = threading.Event()
+        self.session.post.side_effect = lambda *args, **kwargs: release.wait(2) and Mock()
+        results = [self.notifier.send(f"message {i}") for i in range(20)]
+        self.assertIn(False, results)
+        self.assertGreater(self.notifier.stats()['dropped'], 0)
+        self.assertLessEqual(self.notifier.stats()['queue_depth'], 10)
+        release.set()
+
+    def test_stats_latency(self):
+        """Test that send latency is recorded."""
+        self.notifier.send("Test message")
+        self.notifier.join()
+        stats = self.notifier.stats()
+        self.assertGreaterEqual(stats['latency_max'], stats['latency_avg'])
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_close_drains_queue(self):
+        """Test that close delivers queued messages before stopping the workers."""
+        for i in range(5):
+            self.notifier.send(f"message {i}")
+        self.notifier.close()
+        self.assertEqual(self.session.post.call_count, 5)
+        self.session.close.assert_called_once()
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_invalid_arguments(self):
+        """Test that invalid rates and capacities are rejected."""
+        with self.assertRaises(ValueError):
+            TokenBucket(0, 1)
+        with self.assertRaises(ValueError):
+            TokenBucket(1, 0)
+
+    def test_burst_then_wait(self):
+        """Test that the burst is free and further tokens have to wait for the refill."""
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.02)
+
+    def test_pause(self):
+        """Test that a pause delays the next token by at least the paused time."""
+        bucket = TokenBucket(rate=10, capacity=5)
+        bucket.pause(1.0)
+        self.assertGreater(bucket.reserve(), 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+
+from timeraas.profiler import SamplingProfiler, SlowCallRecorder, render_collapsed
+
+
+def stuck(seconds):
+    time.sleep(seconds)
+
+
+def busy_wait(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_profile_collects_other_threads(self):
+        """Test that the stacks of other threads are sampled as collapsed stacks rooted at the thread name."""
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_wait, args=(stop,), name="busy worker")
+        thread.start()
+        try:
+            stacks = SamplingProfiler().profile(0.1, 0.002)
+        finally:
+            stop.set()
+            thread.join()
+        busy = {stack: count for stack, count in stacks.items() if "test_profiler.busy_wait" in stack}
+        self.assertTrue(busy)
+        self.assertTrue(all(stack.startswith("busy_worker;") for stack in busy))
+        self.assertFalse(any("test_profile_collects_other_threads" in stack for stack in stacks))
+        line = render_collapsed(busy).splitlines()[0]
+        self.assertRegex(line, r"^busy_worker;\S+ \d+$")
+
+    def test_one_profile_at_a_time(self):
+        """Test that a second profile is refused while one runs, and invalid settings are rejected."""
+        profiler = SamplingProfiler()
+        thread = threading.Thread(target=profiler.profile, args=(0.2,))
+        thread.start()
+        while not profiler.running:
+            time.sleep(0.001)
+        with self.assertRaises(RuntimeError):
+            profiler.profile(0.1)
+        thread.join()
+        with self.assertRaises(ValueError):
+            profiler.profile(0)
+        with self.assertRaises(ValueError):
+            profiler.profile(1, interval=0)
+
+
+class TestSlowCallRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = SlowCallRecorder(capacity=2, sample_after=0.01)
+        self.addCleanup(self.recorder.close)
+
+    def call(self, name, seconds):
+        with self.recorder.record(name):
+            stuck(seconds)
+
+    def test_keeps_slowest_calls(self):
+        """Test that only the slowest calls are kept, slowest first."""
+        self.call("fast", 0)
+        self.call("slow", 0.03)
+        self.call("slower", 0.05)
+        self.call("medium", 0.02)
+        self.assertEqual([call.name for call in self.recorder.calls()], ["slower", "slow"])
+        self.assertEqual(self.recorder.stats()["kept"], 2)
+
+    def test_stack_sampled_while_slow(self):
+        """Test that a slow call carries the stack it was stuck in."""
+        self.call("slow", 0.05)
+        call = self.recorder.calls()[0]
+        self.assertTrue(call.stack[-1].endswith(" in stuck"))  # Sampled inside the call, not at its end
+        self.assertTrue(call.stack[-2].endswith(" in call"))
+        self.assertGreaterEqual(call.to_dict()["duration_ms"], 50)
+
+    def test_old_calls_expire(self):
+        """Test that calls older than the window are dropped."""
+        recorder = SlowCallRecorder(capacity=2, window=0.05)
+        self.addCleanup(recorder.close)
+        with recorder.record("old"):
+            pass
+        time.sleep(0.06)
+        self.assertEqual(recorder.calls(), [])
+
+    def test_expired_floor_admits_faster_calls(self):
+        """Test that once the kept calls leave the window, faster calls are recorded without reading them first."""
+        recorder = SlowCallRecorder(capacity=1, window=0.05)
+        self.addCleanup(recorder.close)
+        with recorder.record("slow"):
+            stuck(0.02)
+        time.sleep(0.06)
+        with recorder.record("fast"):
+            pass
+        self.assertEqual([call.name for call in recorder.calls()], ["fast"])
+
+    def test_nested_calls(self):
+        """Test that a nested call neither hides the outer call from the watchdog nor loses it."""
+        with self.recorder.record("outer"):
+            self.call("inner", 0)
+            self.assertEqual(self.recorder.stats()["running"], 1)
+            stuck(0.05)
+        self.assertEqual(self.recorder.stats()["running"], 0)
+        outer = self.recorder.calls()[0]
+        self.assertEqual(outer.name, "outer")
+        self.assertTrue(outer.stack[-1].endswith(" in stuck"))
+
+    def test_disabled(self):
+        """Test that a capacity of 0 records nothing and starts no thread."""
+        recorder = SlowCallRecorder(capacity=0)
+        with recorder.record("ignored"):
+            pass
+        self.assertEqual(recorder.calls(), [])
+        with self.assertRaises(ValueError):
+            SlowCallRecorder(capacity=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import Mock
+
+from timeraas.registry import WindowRegistry, parse_room_floors
+from timeraas.room import Room
+
+
+class TestWindowRegistry(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a registry with one configured floor."""
+        self.registry = WindowRegistry(floors={"bedroom": 1}, scheduler=Mock())
+
+    def test_lazy_creation(self):
+        """Test that managers are only created on first access."""
+        self.assertEqual(len(self.registry), 0)
+        self.assertIsNone(self.registry.get("bedroom", "left"))
+        manager = self.registry.get_or_create("bedroom", "left")
+        self.assertEqual(len(self.registry), 1)
+        self.assertIs(self.registry.get("bedroom", "left"), manager)
+        self.assertIs(self.registry.get_or_create("bedroom", "left"), manager)
+        self.assertIn(("bedroom", "left"), self.registry)
+
+    def test_room_floor(self):
+        """Test that rooms use the configured floor and fall back to the default floor."""
+        self.assertEqual(self.registry.get_or_create("bedroom", "left").window.location, Room("bedroom", 1))
+        self.assertEqual(self.registry.get_or_create("hall", "door").window.location, Room("hall", 0))
+
+    def test_windows_are_independent(self):
+        """Test that windows in the same room get separate managers sharing one Room."""
+        left = self.registry.get_or_create("bedroom", "left")
+        right = self.registry.get_or_create("bedroom", "right")
+        self.assertIsNot(left, right)
+        self.assertIs(left.window.location, right.window.location)
+        self.assertEqual(len(self.registry.items()), 2)
+
+    def test_cancel_timers(self):
+        """Test that every armed timer is cancelled and counted."""
+        left = self.registry.get_or_create("bedroom", "left")
+        left.start_timer(60, lambda: None)
+        self.registry.get_or_create("bedroom", "right")
+        self.assertEqual(self.registry.cancel_timers(), 1)
+        self.assertIsNone(left._timer)
+        self.registry.table.scheduler.cancel.assert_called_once()
+        self.assertEqual(self.registry.cancel_timers(), 0)
+
+    def test_invalid_room_name(self):
+        """Test that an invalid room name is rejected by Room validation."""
+        with self.assertRaises(ValueError):
+            self.registry.get_or_create("   ", "left")
+
+    def test_parse_room_floors(self):
+        """Test parsing of the ROOM_FLOORS configuration string."""
+        self.assertEqual(parse_room_floors("toilet:0, bedroom:1,attic:2"), {"toilet": 0, "bedroom": 1, "attic": 2})
+        self.assertEqual(parse_room_floors(""), {})
+        with self.assertRaises(ValueError):
+            parse_room_floors("toilet")
+        with self.assertRaises(ValueError):
+            parse_room_floors("toilet:ground")
+
+
+if __name__ == "__main__":
+    unittest.main()
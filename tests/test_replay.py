@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from timeraas.config import Config
+from timeraas.replay import ReplayEvent, parse_line, read_events, replay
+
+
+def log_time(value):
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S,%f").timestamp()
+
+
+class TestReplay(unittest.TestCase):
+
+    def write(self, lines):
+        path = os.path.join(tempfile.mkdtemp(), "events.log")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        return path
+
+    def test_parse_text_log(self):
+        """Test that update requests are read from the text log and everything else is skipped."""
+        line = "2026-10-17 08:21:12,192 - INFO - Received request to update toilet/window status to OPEN"
+        self.assertEqual(parse_line(line, {}),
+                         ReplayEvent(log_time("2026-10-17 08:21:12,192"), "toilet", "window", "OPEN"))
+        self.assertIsNone(parse_line("2026-10-17 08:21:12,193 - INFO - Escalation started as toilet/window "
+                                     "is now open.", {}))
+        self.assertIsNone(parse_line("", {}))
+
+    def test_parse_json_log(self):
+        """Test that update requests are read from the JSON log format."""
+        line = json.dumps({"time": "2026-10-17 08:21:12,192", "level": "INFO", "logger": "timeraas.app",
+                           "message": "Received request to update bath/left status to TILTED"})
+        self.assertEqual(parse_line(line, {}),
+                         ReplayEvent(log_time("2026-10-17 08:21:12,192"), "bath", "left", "TILTED"))
+
+    def test_parse_journal(self):
+        """Test that journal records of expiries, which keep the status, are not replayed."""
+        last_status = {}
+        opened = json.dumps({"room": "bath", "window": "left", "status": "OPEN", "deadline": 700.0,
+                             "expired": False, "stage": 0, "timestamp": 100.0})
+        expired = json.dumps({"room": "bath", "window": "left", "status": "OPEN", "deadline": None,
+                              "expired": True, "stage": 1, "timestamp": 700.0})
+        self.assertEqual(parse_line(opened, last_status), ReplayEvent(100.0, "bath", "left", "OPEN"))
+        self.assertIsNone(parse_line(expired, last_status))
+        self.assertIsNone(parse_line(json.dumps({"room": "bath", "window": "left", "status": "OPEN"}), {}))
+
+    def test_replay_fires_alerts(self):
+        """Test that a window left open past its timer is reported and one closed in time is not."""
+        path = self.write([
+            "2026-10-17 08:00:00,000 - INFO - Received request to update bath/left status to OPEN",
+            "2026-10-17 08:05:00,000 - INFO - Received request to update kitchen/right status to OPEN",
+            "2026-10-17 08:09:00,000 - INFO - Received request to update kitchen/right status to CLOSED",
+            "2026-10-17 08:30:00,000 - INFO - Received request to update bath/left status to CLOSED",
+            "2026-10-17 08:31:00,000 - INFO - Received request to update bath/left status to AJAR",
+        ])
+        events = read_events([path])
+        self.assertEqual(len(events), 5)
+        report = replay(events, Config(timer_duration=600), tail=0)
+        self.assertEqual(report["applied"], 4)
+        self.assertEqual(report["errors"], 1)
+        # The alert for bath/left and the all-clear message once it is closed
+        self.assertEqual(report["alerts_by_location"], {"bath/left": 2})
+        self.assertEqual(report["simulated_seconds"], 31 * 60)
+        self.assertEqual(report["timers_unfired"], 0)
+
+    def test_replay_policy(self):
+        """Test that a longer timer duration suppresses the alert."""
+        start = log_time("2026-10-17 08:00:00,000")
+        events = [ReplayEvent(start, "bath", "left", "OPEN"), ReplayEvent(start + 900, "bath", "left", "CLOSED")]
+        self.assertEqual(replay(events, Config(timer_duration=1200))["alerts"], 0)
+        self.assertEqual(replay(events, Config(timer_duration=600))["alerts"], 2)
+        with self.assertRaises(ValueError):
+            replay(events, tail=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from timeraas.scheduler import TimerScheduler, default_scheduler
+
+
+class TestTimerScheduler(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a fine-grained scheduler so tests do not wait long."""
+        self.scheduler = TimerScheduler(tick=0.01, wheel_size=8)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_invalid_arguments(self):
+        """Test that invalid tick, wheel size, delay and callback are rejected."""
+        with self.assertRaises(ValueError):
+            TimerScheduler(tick=0)
+        with self.assertRaises(ValueError):
+            TimerScheduler(wheel_size=0)
+        with self.assertRaises(ValueError):
+            self.scheduler.schedule(-1, Mock())
+        with self.assertRaises(ValueError):
+            self.scheduler.schedule(1, "not callable")
+
+    def test_callback_fires_with_args(self):
+        """Test that a scheduled callback is called with its arguments."""
+        fired = threading.Event()
+        callback = Mock(side_effect=lambda *args: fired.set())
+        self.scheduler.schedule(0.02, callback, "a", 1)
+        self.assertTrue(fired.wait(2))
+        callback.assert_called_once_with("a", 1)
+        self.assertEqual(self.scheduler.pending, 0)
+
+    def test_delay_longer_than_wheel(self):
+        """Test that delays spanning several wheel rotations fire on time, not early."""
+        fired = threading.Event()
+        start = time.monotonic()
+        self.scheduler.schedule(0.2, fired.set)  # 20 ticks on an 8-slot wheel
+        self.assertTrue(fired.wait(2))
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_cancel(self):
+        """Test that a cancelled timer never fires and is removed from the wheel."""
+        callback = Mock()
+        handle = self.scheduler.schedule(0.05, callback)
+        self.assertEqual(self.scheduler.pending, 1)
+        self.assertTrue(self.scheduler.cancel(handle))
+        self.assertFalse(self.scheduler.cancel(handle))
+        self.assertEqual(self.scheduler.pending, 0)
+        time.sleep(0.1)
+        callback.assert_not_called()
+
+    def test_single_thread(self):
+        """Test that arming many timers starts only one scheduler thread."""
+        threads_before = threading.active_count()
+        handles = [self.scheduler.schedule(60, Mock()) for _ in range(500)]
+        self.assertEqual(threading.active_count(), threads_before + 1)
+        self.assertEqual(self.scheduler.pending, 500)
+        for handle in handles:
+            self.scheduler.cancel(handle)
+        self.assertEqual(self.scheduler.pending, 0)
+
+    @patch('timeraas.scheduler.logger')
+    def test_failing_callback_does_not_stop_scheduler(self, mock_logger):
+        """Test that an exception in one callback is logged and later timers still fire."""
+        fired = threading.Event()
+        self.scheduler.schedule(0.01, Mock(side_effect=Exception("boom")))
+        self.scheduler.schedule(0.03, fired.set)
+        self.assertTrue(fired.wait(2))
+        mock_logger.error.assert_called_once()
+
+    def test_shutdown(self):
+        """Test that shutdown drops pending timers and refuses new ones."""
+        callback = Mock()
+        self.scheduler.schedule(0.05, callback)
+        self.scheduler.shutdown()
+        self.assertEqual(self.scheduler.pending, 0)
+        with self.assertRaises(RuntimeError):
+            self.scheduler.schedule(1, callback)
+        time.sleep(0.1)
+        callback.assert_not_called()
+
+    def test_default_scheduler_is_shared(self):
+        """Test that the default scheduler is a process-wide singleton."""
+        self.assertIs(default_scheduler(), default_scheduler())
+
+
+if __name__ == "__main__":
+    unittest.main()
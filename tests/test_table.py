@@ -0,0 +1,135 @@
+import math
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from timeraas.manager import WindowManager
+from timeraas.room import Room
+from timeraas.table import WindowTable
+from timeraas.window import Window, WindowStatus
+
+
+class TestWindowTable(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a table with two rooms."""
+        self.table = WindowTable(scheduler=Mock(), lock_stripes=4)
+        self.bath = Room("bath", 0)
+        self.attic = Room("attic", 2)
+
+    def test_add_and_find(self):
+        """Test that rows are appended once per window and found by room and window id."""
+        left = self.table.add(self.bath, "left")
+        right = self.table.add(self.bath, "right")
+        attic = self.table.add(self.attic, "left")
+        self.assertEqual((left, right, attic), (0, 1, 2))
+        self.assertEqual(self.table.add(self.bath, "left"), left)
+        self.assertEqual(self.table.find("bath", "right"), right)
+        self.assertEqual(self.table.find("attic", "left"), attic)
+        self.assertIsNone(self.table.find("attic", "right"))
+        self.assertIsNone(self.table.find("cellar", "left"))
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.name(attic), "left")
+        self.assertEqual(len(self.table.names), 2)  # Window ids are stored once
+        self.assertEqual(self.table.keys(), [(self.bath, "left", 0), (self.bath, "right", 1), (self.attic, "left", 2)])
+
+    def test_new_rows_are_closed_and_unarmed(self):
+        """Test the initial column values of a row."""
+        index = self.table.add(self.bath, "left")
+        self.assertEqual(self.table.statuses[index], WindowStatus.CLOSED.value)
+        self.assertTrue(math.isnan(self.table.deadlines[index]))
+        self.assertIsNone(self.table.timers[index])
+        self.assertNotIn(index, self.table.histories)
+
+    def test_concurrent_adds_create_one_row(self):
+        """Test that racing adds of the same window return the same row."""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.table.add(self.bath, "left")))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(set(results), {0})
+        self.assertEqual(len(self.table), 1)
+
+    def test_lock_stripes(self):
+        """Test that rows share a fixed pool of locks."""
+        self.assertIs(self.table.lock(1), self.table.lock(5))
+        self.assertIsNot(self.table.lock(1), self.table.lock(2))
+        with self.assertRaises(ValueError):
+            WindowTable(lock_stripes=0)
+
+    def test_vectorized_scans(self):
+        """Test status counts, armed timers and overdue windows over the columns."""
+        for number in range(6):
+            WindowManager.view(self.table, self.table.add(self.bath, f"w{number}"))
+        now = time.time()
+        managers = [WindowManager.view(self.table, index) for index in range(6)]
+        managers[0].status = WindowStatus.OPEN
+        managers[1].status = WindowStatus.OPEN
+        managers[2].status = WindowStatus.TILTED
+        managers[0]._deadline = now - 1
+        managers[1]._deadline = now + 60
+        self.assertEqual(self.table.count(WindowStatus.OPEN), 2)
+        self.assertEqual(self.table.count(WindowStatus.CLOSED), 3)
+        self.assertEqual(self.table.armed(), 2)
+        self.assertEqual(list(self.table.overdue(now)), [0])
+        columns = self.table.columns()
+        self.assertEqual(list(columns["status"][:3]), [1, 1, 2])
+        self.assertEqual(list(columns["room"]), [0] * 6)
+        # The columns are copies, so rows can still be appended
+        self.table.add(self.attic, "skylight")
+        self.assertEqual(len(columns["status"]), 6)
+
+
+class TestViews(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a table with one window."""
+        self.table = WindowTable(scheduler=Mock())
+        self.index = self.table.add(Room("bath", 0), "left")
+
+    def test_views_share_row_state(self):
+        """Test that every view of a row reads and writes the same table state."""
+        manager = WindowManager.view(self.table, self.index)
+        other = WindowManager(Window(None, self.table, self.index), self.table.scheduler)
+        manager.apply(WindowStatus.OPEN, 600)
+        self.assertEqual(other.status, WindowStatus.OPEN)
+        self.assertEqual(other.deadline, manager.deadline)
+        self.assertIsNotNone(other._timer)
+        self.assertEqual(other.window.location, Room("bath", 0))
+        self.assertEqual(other.name, "left")
+
+    def test_live_view_is_reused(self):
+        """Test that the view of a row is reused while it is referenced."""
+        manager = WindowManager.view(self.table, self.index)
+        self.assertIs(WindowManager.view(self.table, self.index), manager)
+
+    def test_views_use_slots(self):
+        """Test that views carry no per-instance dict."""
+        manager = WindowManager.view(self.table, self.index)
+        self.assertFalse(hasattr(manager, "__dict__"))
+        self.assertFalse(hasattr(manager.window, "__dict__"))
+        self.assertFalse(hasattr(manager.window.location, "__dict__"))
+
+    def test_standalone_window_gets_private_table(self):
+        """Test that a Window created on its own still works without a registry."""
+        window = Window(Room("kitchen", 1))
+        window.status = "open"
+        self.assertEqual(window.status, WindowStatus.OPEN)
+        self.assertEqual(len(window.table), 1)
+        self.assertIsNot(window.table, self.table)
+
+    def test_history_is_allocated_on_first_transition(self):
+        """Test that windows without transitions cost no history buffer."""
+        manager = WindowManager.view(self.table, self.index)
+        self.assertEqual(manager.history(), [])
+        self.assertNotIn(self.index, self.table.histories)
+        manager.apply(WindowStatus.OPEN, 600)
+        self.assertEqual(len(manager.history()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
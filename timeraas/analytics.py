@@ -0,0 +1,222 @@
+import threading
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+
+from timeraas.clock import SYSTEM_CLOCK, Clock
+from timeraas.window import WindowStatus
+
+DAY = 86400.0
+OPEN_VALUES = (WindowStatus.OPEN.value, WindowStatus.TILTED.value)
+
+
+def open_intervals(times, statuses, now: float = None) -> tuple:
+    """Turns sorted transition arrays into (starts, ends) arrays of the periods the window was open.
+
+    A window still open after its last transition gets an interval up to ``now``
+    if it is given, otherwise that trailing period is left out.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    is_open = np.isin(np.asarray(statuses), OPEN_VALUES)
+    ends = np.append(times[1:], now if now is not None else np.nan)
+    mask = is_open & ~np.isnan(ends)
+    return times[mask], ends[mask]
+
+
+def split_by_day(starts, ends) -> tuple:
+    """Splits intervals at UTC midnight. Returns (day numbers, seconds within that day)."""
+    first = np.floor(starts / DAY).astype(np.int64)
+    last = np.maximum(first, np.ceil(ends / DAY).astype(np.int64) - 1)
+    counts = last - first + 1
+    interval = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    days = first[interval] + offsets
+    seconds = np.minimum(ends[interval], (days + 1) * DAY) - np.maximum(starts[interval], days * DAY)
+    return days, np.maximum(seconds, 0.0)
+
+
+def group_sum_max(keys, values) -> tuple:
+    """Groups ``values`` by integer ``keys``. Returns (unique keys, sums, maxima)."""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(unique))
+    maxima = np.zeros(len(unique))
+    np.maximum.at(maxima, inverse, values)
+    return unique, sums, maxima
+
+
+class OpenTimeAnalytics:
+    """Open-time statistics per window, per UTC day and per floor.
+
+    Closed open-periods and timer expiries are buffered in compact arrays as
+    they arrive and folded into cached aggregates with batched NumPy
+    operations the next time a report is requested, so each report only pays
+    for the transitions since the previous one plus the windows still open.
+    The buffer is also folded once it holds ``flush_threshold`` entries, so
+    memory stays bounded when no reports are requested.
+    """
+
+    def __init__(self, flush_threshold: int = 4096, clock: Clock = None):
+        if not isinstance(flush_threshold, int) or flush_threshold <= 0:
+            raise ValueError("Flush threshold must be a positive integer.")
+        self._clock = clock if clock is not None else SYSTEM_CLOCK  # Default report time, same as the events
+        self._flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._codes = {}  # (room, window) -> dense window index
+        self._keys = []
+        self._floors = array('q')
+        self._open_since = {}  # window index -> start of the current open period
+        # Buffered since the last report
+        self._pending_codes = array('q')
+        self._pending_starts = array('d')
+        self._pending_ends = array('d')
+        self._pending_expired_codes = array('q')
+        self._pending_expired_times = array('d')
+        # Cached aggregates
+        self._window_total = np.zeros(0)
+        self._window_longest = np.zeros(0)
+        self._window_expired = np.zeros(0, dtype=np.int64)
+        self._days = {}  # UTC day number -> [open seconds, longest open period, expired timers]
+
+    def _code(self, room: str, window: str, floor: int) -> int:
+        # Caller must hold self._lock
+        key = (room, window)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self._keys)
+            self._keys.append(key)
+            self._floors.append(floor)
+        return code
+
+    def listener(self, manager, event):
+        """WindowManager listener feeding status changes and expiries into the statistics."""
+        location = manager.window.location
+        is_open = event.status.value in OPEN_VALUES
+        with self._lock:
+            code = self._code(location.name, manager.name, location.floor)
+            if event.kind == "expired":
+                self._pending_expired_codes.append(code)
+                self._pending_expired_times.append(event.timestamp)
+            elif is_open and code not in self._open_since:
+                self._open_since[code] = event.timestamp
+            elif not is_open and code in self._open_since:
+                self._pending_codes.append(code)
+                self._pending_starts.append(self._open_since.pop(code))
+                self._pending_ends.append(event.timestamp)
+            if len(self._pending_codes) + len(self._pending_expired_codes) >= self._flush_threshold:
+                self._flush()
+
+    def add_transitions(self, room: str, window: str, floor: int, times, statuses):
+        """Bulk-loads a window's recorded (sorted) transitions, e.g. when replaying history.
+
+        ``statuses`` are WindowStatus values. A trailing open period stays open
+        and is counted up to the report time.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        statuses = np.asarray(statuses)
+        starts, ends = open_intervals(times, statuses)
+        with self._lock:
+            code = self._code(room, window, floor)
+            self._fold(np.full(len(starts), code, dtype=np.int64), starts, ends)
+            if len(times) and statuses[-1] in OPEN_VALUES:
+                self._open_since[code] = float(times[-1])
+            else:
+                self._open_since.pop(code, None)
+
+    def _grow(self):
+        # Caller must hold self._lock
+        missing = len(self._keys) - len(self._window_total)
+        if missing > 0:
+            self._window_total = np.append(self._window_total, np.zeros(missing))
+            self._window_longest = np.append(self._window_longest, np.zeros(missing))
+            self._window_expired = np.append(self._window_expired, np.zeros(missing, dtype=np.int64))
+
+    def _fold(self, codes, starts, ends):
+        # Caller must hold self._lock
+        self._grow()
+        if not len(codes):
+            return
+        durations = ends - starts
+        np.add.at(self._window_total, codes, durations)
+        np.maximum.at(self._window_longest, codes, durations)
+        for day, total, longest in self._aggregate_days(starts, ends):
+            entry = self._days.setdefault(day, [0.0, 0.0, 0])
+            entry[0] += total
+            entry[1] = max(entry[1], longest)
+
+    @staticmethod
+    def _aggregate_days(starts, ends) -> list:
+        """Returns (day, open seconds, longest period started that day) for the given intervals."""
+        days, seconds = split_by_day(starts, ends)
+        total_days, totals, _ = group_sum_max(days, seconds)
+        longest_days, _, longest = group_sum_max(np.floor(starts / DAY).astype(np.int64), ends - starts)
+        longest_by_day = dict(zip(longest_days.tolist(), longest.tolist()))
+        return [(day, total, longest_by_day.get(day, 0.0))
+                for day, total in zip(total_days.tolist(), totals.tolist())]
+
+    def _flush(self):
+        # Caller must hold self._lock
+        self._fold(np.frombuffer(self._pending_codes, dtype=np.int64),
+                   np.frombuffer(self._pending_starts), np.frombuffer(self._pending_ends))
+        if self._pending_expired_codes:
+            np.add.at(self._window_expired, np.frombuffer(self._pending_expired_codes, dtype=np.int64), 1)
+            days, counts = np.unique(np.floor(np.frombuffer(self._pending_expired_times) / DAY).astype(np.int64),
+                                     return_counts=True)
+            for day, count in zip(days.tolist(), counts.tolist()):
+                self._days.setdefault(day, [0.0, 0.0, 0])[2] += count
+        self._pending_codes = array('q')
+        self._pending_starts = array('d')
+        self._pending_ends = array('d')
+        self._pending_expired_codes = array('q')
+        self._pending_expired_times = array('d')
+
+    def report(self, now: float = None) -> dict:
+        """Returns open-time totals, longest open periods and expired timers per window, day and floor."""
+        now = self._clock.time() if now is None else now
+        with self._lock:
+            self._flush()
+            window_total = self._window_total.copy()
+            window_longest = self._window_longest.copy()
+            days = {day: list(entry) for day, entry in self._days.items()}
+            # Windows that are open right now count up to the report time
+            if self._open_since:
+                codes = np.fromiter(self._open_since.keys(), dtype=np.int64, count=len(self._open_since))
+                starts = np.fromiter(self._open_since.values(), dtype=np.float64, count=len(self._open_since))
+                ends = np.maximum(starts, now)
+                np.add.at(window_total, codes, ends - starts)
+                np.maximum.at(window_longest, codes, ends - starts)
+                for day, total, longest in self._aggregate_days(starts, ends):
+                    entry = days.setdefault(day, [0.0, 0.0, 0])
+                    entry[0] += total
+                    entry[1] = max(entry[1], longest)
+            window_expired = self._window_expired.copy()
+            keys = list(self._keys)
+            floors = np.asarray(self._floors, dtype=np.int64)
+
+        floor_values, inverse = np.unique(floors, return_inverse=True)
+        floor_totals = np.bincount(inverse, weights=window_total, minlength=len(floor_values))
+        floor_expired = np.bincount(inverse, weights=window_expired, minlength=len(floor_values))
+        floor_longest = np.zeros(len(floor_values))
+        np.maximum.at(floor_longest, inverse, window_longest)
+        return {
+            "generated_at": now,
+            "windows": [
+                {"room": room, "window": window, "floor": floor, "open_seconds": total,
+                 "longest_open_seconds": longest, "expired": expired}
+                for (room, window), floor, total, longest, expired in zip(
+                    keys, floors.tolist(), window_total.tolist(), window_longest.tolist(), window_expired.tolist())
+            ],
+            "floors": [
+                {"floor": floor, "open_seconds": total, "longest_open_seconds": longest, "expired": int(expired)}
+                for floor, total, longest, expired in zip(
+                    floor_values.tolist(), floor_totals.tolist(), floor_longest.tolist(), floor_expired.tolist())
+            ],
+            "days": [
+                {"date": datetime.fromtimestamp(day * DAY, timezone.utc).date().isoformat(),
+                 "open_seconds": total, "longest_open_seconds": longest, "expired": expired}
+                for day, (total, longest, expired) in sorted(days.items())
+            ],
+        }
+
+    def __repr__(self) -> str:
+        return f"OpenTimeAnalytics(windows={len(self._keys)})"
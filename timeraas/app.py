@@ -1,115 +1,688 @@
+"""Flask entry point.
+
+``create_app(config)`` builds an app whose subsystems are created on first
+use, so importing this module starts no threads and opens no files. The
+module-level ``app`` used by ``python -m timeraas.app`` and WSGI servers
+(``gunicorn timeraas.app:app``) is built from the environment the first
+time it is accessed.
+"""
+import functools
+import hmac
+import json
 import logging
-import os
 import random
+import threading
 
-import requests
-from flask import Flask, request, jsonify
-
-from timeraas.manager import WindowManager
-from timeraas.room import Room
-from timeraas.window import Window, WindowStatus
-
-app = Flask(__name__)
-
-# Load environment variables for configuration
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
-DEBUG_MODE = bool(int(os.getenv("DEBUG_MODE", "0")))
-
-# Basic logger setup
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG if os.getenv("DEBUG_MODE") else logging.INFO)
-
-# Console handler with color (optional)
-console_handler = logging.StreamHandler()
-console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(console_formatter)
-logger.addHandler(console_handler)
-
-# File handler without ANSI color codes
-file_handler = logging.FileHandler('timeraas.log', encoding='utf-8')
-file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
-
-# Initialize room and window manager
-toilet = Room("toilet", 0)
-toilet_window = Window(toilet)
-toilet_window_manager = WindowManager(toilet_window)
-
-if DISCORD_WEBHOOK_URL is None:
-    logger.error("Discord webhook URL is not configured. No message will be sent out!")
-if DEBUG_MODE:
-    logger.debug("Debug mode is active")
-
-
-def timer_expired():
-    """Triggers actions when the timer expires if not in debug mode."""
-    messages = [
-        "Ich bin noch auf! 😱",
-        "Mir wird kalt! 🥶",
-        "Hier steigt gleich jemand ein! 🦹"
-    ]
-    if not DEBUG_MODE:
-        send_discord_message(random.choice(messages))
-    else:
-        logger.debug("Would now have sent message to Discord.")
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 
+from timeraas import ingest, metrics
+from timeraas.broadcast import etag_matches, state_etag, window_state
+from timeraas.clock import SYSTEM_CLOCK, Clock, VirtualClock
+from timeraas.cluster import FORWARDED_HEADER, valid_record
+from timeraas.config import Config
+from timeraas.dedupe import event_key
+from timeraas.ingest import ACCEPTED_STATUSES, INVALID_STATUS_ERROR, validate_status
+from timeraas.messages import CLOSED_AGAIN_MESSAGE, EXPIRED_MESSAGES
+from timeraas.profiler import render_collapsed
+from timeraas.registry import WindowRegistry, parse_room_floors
+from timeraas.scheduler import TimerScheduler, VirtualScheduler
 
-def send_discord_message(message):
-    """Sends a message to the configured Discord webhook."""
-    if not DISCORD_WEBHOOK_URL:
-        logger.error("Discord webhook URL is not configured.")
-        return
+logger = logging.getLogger("timeraas.app")
 
-    data = {"content": message}
-    try:
-        response = requests.post(DISCORD_WEBHOOK_URL, json=data)
-        response.raise_for_status()
-        logger.info("Message delivered successfully to Discord.")
-    except requests.RequestException as e:
-        logger.error(f"Failed to send message to Discord: {e}")
+EXTENSION = "timeraas"
+MAX_PROFILE_SECONDS = 60
 
 
-def validate_status(new_status):
-    """Validates if the provided status is a recognized WindowStatus."""
-    try:
-        return WindowStatus[new_status]
-    except KeyError:
-        return None
+def _subsystem(create):
+    """Property creating the subsystem once, even when concurrent requests are the first to use it."""
+    name = create.__name__
+
+    @functools.wraps(create)
+    def get(self):
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = create(self)
+            return self.__dict__[name]
+
+    return property(get)
+
+
+class Services:
+    """Subsystems of one app, each created on first use and torn down by ``shutdown``."""
+
+    def __init__(self, config: Config, **subsystems):
+        """``subsystems`` replace the ones built from the config, e.g. ``clock=VirtualClock()``."""
+        for name in subsystems:
+            if not isinstance(getattr(type(self), name, None), property):
+                raise ValueError(f"Unknown subsystem '{name}'.")
+        self.config = config
+        self.__dict__.update(subsystems)
+        self._lock = threading.RLock()  # Serializes the creation of subsystems; reentrant as they depend on each other
+        self._closed = False
+
+    def _created(self, name: str) -> bool:
+        return name in self.__dict__
+
+    @_subsystem
+    def log_listener(self):
+        """Queue listener writing the log records, or None if the config leaves logging alone."""
+        if self.config.log_file is None:
+            return None
+        from timeraas.logs import configure_logging
+
+        # Log through a queue so handlers format and write on a background thread, off the request path
+        return configure_logging(level=logging.DEBUG if self.config.debug else logging.INFO,
+                                 path=self.config.log_file, json_format=self.config.log_format == "json",
+                                 max_bytes=self.config.log_max_bytes, backup_count=self.config.log_backup_count,
+                                 rotate_interval=self.config.log_rotate_interval)
+
+    @_subsystem
+    def clock(self) -> Clock:
+        """Source of deadlines and timestamps; a VirtualClock lets replays and tests run faster than real time."""
+        return SYSTEM_CLOCK
+
+    @_subsystem
+    def scheduler(self) -> TimerScheduler:
+        """Timer wheel owned by this app, so shutdown drops exactly its timers."""
+        if isinstance(self.clock, VirtualClock):
+            return VirtualScheduler(self.clock)
+        return TimerScheduler(clock=self.clock)
+
+    @_subsystem
+    def registry(self) -> WindowRegistry:
+        """Window managers, created lazily per room and window on the first event."""
+        backend = self.backend
+        registry = WindowRegistry(floors=parse_room_floors(self.config.room_floors),
+                                  scheduler=backend.scheduler if backend is not None else self.scheduler,
+                                  history_size=self.config.history_size, clock=self.clock)
+        # Open-time statistics and the SSE ring buffer are updated incrementally from the window events
+        registry.add_listener(self.analytics.listener)
+        registry.add_listener(self.broadcaster.listener)
+        if backend is not None:
+            # The shared database replaces the journal: it is durable and restores the windows of every worker
+            backend.attach(registry, self.expiry_callback, self.escalation)
+        elif self.journal is not None:
+            # Restore open windows and re-arm their timers before new transitions are journaled
+            from timeraas.journal import recover
+
+            recover(registry, self.journal, self.expiry_callback, self.escalation)
+            registry.add_listener(self.journal.listener)
+        return registry
+
+    @_subsystem
+    def cluster(self):
+        """Membership and window ownership of this node in cluster mode, or None for a standalone node."""
+        if not self.config.cluster_node:
+            return None
+        if self.config.state_backend != "local":
+            raise ValueError("Cluster mode needs the local state backend; every node is one process.")
+        from timeraas.cluster import Cluster, parse_nodes
+
+        if self.config.journal_path:
+            logger.warning("JOURNAL_PATH is ignored, window state is replicated to the next node instead.")
+        return Cluster(self.config.cluster_node, parse_nodes(self.config.cluster_peers), self.registry,
+                       self.expiry_callback, self.escalation, heartbeat=self.config.cluster_heartbeat)
+
+    @_subsystem
+    def backend(self):
+        """Shared state for pre-forking servers, or None if every process keeps its own windows."""
+        if self.config.state_backend == "local":
+            return None
+        if self.config.state_backend != "sqlite":
+            raise ValueError(f"Unknown state backend '{self.config.state_backend}'. Expected 'local' or 'sqlite'.")
+        from timeraas.backend import SqliteBackend
+
+        if self.config.journal_path:
+            logger.warning("JOURNAL_PATH is ignored, window state is kept in %s.", self.config.state_path)
+        return SqliteBackend(self.config.state_path, self.scheduler, poll_interval=self.config.state_poll_interval)
+
+    @_subsystem
+    def gauges(self) -> metrics.MetricsRegistry:
+        """Window gauges, per app so several apps in one process do not replace each other's."""
+        gauges = metrics.MetricsRegistry()
+        metrics.register_window_gauges(self.registry, self.notifier, gauges)
+        return gauges
+
+    @_subsystem
+    def notifier(self):
+        """Outbound messages are queued and delivered by a worker pool off the request path."""
+        from timeraas.notifier import Notifier
+
+        if self.config.webhook_url is None:
+            logger.error("Discord webhook URL is not configured. No message will be sent out!")
+        return Notifier(self.config.webhook_url, workers=self.config.notifier_workers,
+                        queue_size=self.config.notifier_queue_size,
+                        digest_window=self.config.notifier_digest_window, rate=self.config.notifier_rate)
+
+    @_subsystem
+    def escalation(self):
+        """Reminder stages per room; only the next stage of a window is ever armed."""
+        from timeraas.escalation import parse_escalation
+
+        return parse_escalation(self.config.escalation_schedules, self.config.timer_duration,
+                                self.config.tilted_timer_duration)
+
+    @_subsystem
+    def debouncer(self):
+        """Bouncing contacts are collapsed into one transition per hysteresis window."""
+        from timeraas.debounce import Debouncer
+
+        return Debouncer(self.config.debounce_window, self.scheduler, clock=self.clock)
+
+    @_subsystem
+    def deduplicator(self):
+        """Retried and reordered events carrying an id or sequence number are dropped before they reach a window."""
+        from timeraas.dedupe import EventDeduplicator
+
+        return EventDeduplicator(self.config.dedupe_capacity)
+
+    @_subsystem
+    def analytics(self):
+        from timeraas.analytics import OpenTimeAnalytics
+
+        return OpenTimeAnalytics(clock=self.clock)
+
+    @_subsystem
+    def broadcaster(self):
+        """Every transition and expiry is pushed to the SSE subscribers through one shared ring buffer."""
+        from timeraas.broadcast import Broadcaster
+
+        return Broadcaster(self.config.event_buffer_size)
+
+    @_subsystem
+    def journal(self):
+        """State transitions are journaled so a restart restores open windows, if a path is configured."""
+        if not self.config.journal_path or self.config.state_backend != "local" or self.config.cluster_node:
+            return None
+        from timeraas.journal import Journal
+
+        return Journal(self.config.journal_path)
+
+    @_subsystem
+    def datagram(self):
+        """Binary UDP listener for sensor gateways, if a UDP port is configured."""
+        if self.config.udp_port is None:
+            return None
+        from timeraas.datagram import DatagramListener, parse_window_ids
+
+        return DatagramListener(self.config.udp_host, self.config.udp_port,
+                                parse_window_ids(self.config.udp_windows), self.apply_events)
+
+    @_subsystem
+    def profiler(self):
+        """On-demand sampling profiler behind ``POST /admin/profile``."""
+        from timeraas.profiler import SamplingProfiler
+
+        return SamplingProfiler()
+
+    @_subsystem
+    def slow_calls(self):
+        """Always-on record of the slowest recent status updates with their stacks."""
+        from timeraas.profiler import SlowCallRecorder
+
+        return SlowCallRecorder(self.config.slow_call_capacity, self.config.slow_call_window)
+
+    @_subsystem
+    def poller(self):
+        """Polls the Fritz!Box directly instead of waiting for pushed updates, if a URL is configured."""
+        if not self.config.fritzbox_url:
+            return None
+        from timeraas.fritzbox import FritzBoxClient, FritzBoxPoller, parse_device_map
+
+        return FritzBoxPoller(FritzBoxClient(self.config.fritzbox_url, self.config.fritzbox_user,
+                                             self.config.fritzbox_password),
+                              self.registry, self.apply_events, devices=parse_device_map(self.config.fritzbox_devices),
+                              min_interval=self.config.fritzbox_poll_min, max_interval=self.config.fritzbox_poll_max,
+                              owns=self.cluster.assigned if self.cluster is not None else None)
+
+    def expiry_callback(self, location: str):
+        """Callback a window at ``location`` calls when its timer or an escalation stage expires."""
+        callback = functools.partial(self.timer_expired, location)
+        if self.backend is not None:
+            return self.backend.guard(location, callback)
+        return callback
+
+    def timer_expired(self, location=None, stage=None):
+        """Triggers actions when the timer or an escalation stage expires if not in debug mode."""
+        if not self.config.debug:
+            if stage is None:
+                self.send_discord_message(random.choice(EXPIRED_MESSAGES), location)
+            else:
+                self.send_discord_message(stage.format(random.choice(stage.messages)), location)
+        else:
+            logger.debug("Would now have sent message to Discord.")
+
+    def send_discord_message(self, message, location=None):
+        """Queues a message for delivery to the configured Discord webhook and returns immediately."""
+        if not self.config.webhook_url:
+            logger.error("Discord webhook URL is not configured.")
+            return
+
+        self.notifier.send(message, location)
+
+    def report_transition(self, location, transition):
+        """Logs an applied transition and sends the all-clear message if the window had been reported."""
+        if transition.timer_started:
+            logger.info("Escalation started as %s is now %s.", location, transition.status.name.lower())
+        elif transition.timer_cancelled:
+            if transition.was_expired:
+                self.send_discord_message(CLOSED_AGAIN_MESSAGE, location)
+            logger.info("Timer cancelled as %s is now closed.", location)
+
+    def update_status(self, room: str, window: str, status, event_id=None, sequence: int = None) -> dict:
+        """Applies one validated status update like ``POST /home/<room>/<window>`` and returns the response body.
+
+        Raises ValueError for an invalid room or window name.
+        """
+        window_manager = self.registry.get_or_create(room, window)
+        reason = self.deduplicator.check(room, window, event_id, sequence)
+        if reason is not None:
+            return {'status': window_manager.status.name, 'dropped': reason}
+
+        location = f"{room}/{window}"
+        transition = self.debouncer.apply(window_manager, status, self.escalation.schedule(room),
+                                          self.expiry_callback(location),
+                                          functools.partial(self.report_transition, location))
+        self.report_transition(location, transition)
+        return {'status': transition.status.name}
+
+    def apply_events(self, events, forwarded: bool = False):
+        """Validates and applies a batch of status events, returning one result per event in input order.
+
+        In cluster mode, events of windows owned by other nodes are forwarded
+        to them, unless the batch was ``forwarded`` by another node already.
+        """
+        if self.cluster is not None and not forwarded:
+            return self.cluster.apply_events(events, self.apply_local_events)
+        return self.apply_local_events(events)
+
+    def apply_local_events(self, events):
+        """Applies a batch of status events to this node's windows."""
+        results = ingest.apply_events(self.registry, events, self.escalation, self.expiry_callback,
+                                      self.report_transition, self.debouncer, self.deduplicator)
+        logger.info("Applied batch of %s events", len(events))
+        return results
+
+    def start(self):
+        """Sets up what has to exist before the first request: logging, journal recovery and the poller."""
+        if self.log_listener is not None:
+            logger.debug("Logging to %s", self.config.log_file or "the console")
+        if self.config.debug:
+            logger.debug("Debug mode is active")
+        if self.backend is not None or self.journal is not None:
+            # Creating the registry recovers the journaled or shared windows
+            logger.info("Recovered %s windows", len(self.registry))
+        if self.config.cluster_node:
+            self.cluster.start()
+        if self.config.fritzbox_url:
+            self.poller.start()
+        if self.config.udp_port is not None:
+            self.datagram.start()
+
+    def shutdown(self):
+        """Cancels every armed timer and stops the subsystems that were created, in dependency order.
+
+        Subsystems that were never used are not created just to be closed.
+        Calling this more than once is harmless.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._created("poller") and self.poller is not None:
+            self.poller.stop()
+        if self._created("datagram") and self.datagram is not None:
+            self.datagram.stop()
+        if self._created("cluster") and self.cluster is not None:
+            # Hands the windows and their timers over to the remaining nodes
+            self.cluster.leave()
+        if self._created("backend") and self.backend is not None:
+            # Hands the timers over to another worker before they are cancelled here
+            self.backend.close()
+        cancelled = self.registry.cancel_timers() if self._created("registry") else 0
+        if self._created("scheduler"):
+            # Also drops the settle timers of the debouncer
+            self.scheduler.shutdown()
+        if self._created("broadcaster"):
+            self.broadcaster.close()
+        if self._created("notifier"):
+            self.notifier.close()
+        if self._created("journal") and self.journal is not None:
+            self.journal.close()
+        if self._created("slow_calls"):
+            self.slow_calls.close()
+        logger.info("Application shutdown, cancelled %s timers.", cancelled)
+        if self._created("log_listener") and self.log_listener is not None:
+            self.log_listener.stop()
+
+    def __repr__(self) -> str:
+        created = [name for name in ("log_listener", "scheduler", "registry", "notifier", "journal", "poller")
+                   if self._created(name)]
+        return f"Services(created={created}, closed={self._closed})"
+
+
+def services() -> Services:
+    """Services of the app handling the current request."""
+    return current_app.extensions[EXTENSION]
+
+
+api = Blueprint("timeraas", __name__)
+
+
+def create_app(config: Config = None) -> Flask:
+    """Builds a Flask app serving the timeraas endpoints.
+
+    Logging, the registry, the notifier and every other subsystem are
+    created when first needed; only a configured journal or Fritz!Box poller
+    is set up right away, since windows have to be recovered and polled
+    before the first request. Call ``app.extensions["timeraas"].shutdown()``
+    to cancel all timers and stop the background threads.
+    """
+    config = Config() if config is None else config
+    app = Flask(__name__)
+    app.config["TIMERAAS"] = config
+    app.extensions[EXTENSION] = service = Services(config)
+    app.register_blueprint(api)
+    service.start()
+    return app
 
 
-@app.route('/home/toilet/window', methods=['POST'])
-def update_window_status():
+def admin_required(view):
+    """Serves ``view`` only to requests carrying the configured admin token; without one it does not exist."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = services().config.admin_token
+        if not token:
+            return jsonify({"error": "Not found."}), 404
+        scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(given.strip().encode(), token.encode()):
+            return jsonify({"error": "Forbidden."}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@api.route('/home/<room>/<window>', methods=['POST'])
+@metrics.timed(metrics.REQUEST_LATENCY["update_window_status"])
+def update_window_status(room, window):
+    service = services()
+    with service.slow_calls.record(f"update_window_status {room}/{window}"):
+        return apply_window_status(service, room, window)
+
+
+def apply_window_status(service, room, window):
     try:
         new_status = request.json.get('status')
         validated_status = validate_status(new_status)
-        if validated_status is None or validated_status not in {WindowStatus.OPEN, WindowStatus.CLOSED}:
-            return jsonify({"error": 'Invalid status value. Must be "OPEN" or "CLOSED"'}), 400
+        if validated_status is None or validated_status not in ACCEPTED_STATUSES:
+            return jsonify({"error": INVALID_STATUS_ERROR}), 400
+
+        try:
+            event_id, sequence = event_key(request.json)
+            forwarded = forward_to_owner(service, room, window, 'POST', request.json)
+            if forwarded is not None:
+                return forwarded
+            logger.info("Received request to update %s/%s status to %s", room, window, new_status)
+            return jsonify(service.update_status(room, window, validated_status, event_id, sequence)), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    except Exception as e:
+        logger.error("An error occurred: %s", e)
+        error_message = "An internal error occurred."
+        if service.config.debug:
+            error_message += f" Details: {e}"
+        return jsonify({"error": error_message}), 500
+
+
+def forward_to_owner(service, room, window, method, payload=None):
+    """Returns the owner's response if another cluster node owns the window, None to handle it here."""
+    if service.cluster is None or FORWARDED_HEADER in request.headers:
+        return None
+    forwarded = service.cluster.forward(room, window, method, service.cluster.window_path(room, window), payload)
+    if forwarded is None:
+        return None
+    body, status = forwarded
+    return jsonify(body), status
+
+
+def conditional(payload, etag: str):
+    """Returns 304 if the client already has the representation with ``etag``, the JSON payload otherwise."""
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(payload())
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-        logger.info(f"Received request to update window status to {new_status}")
 
-        if toilet_window_manager.status == WindowStatus.CLOSED and validated_status == WindowStatus.OPEN:
-            duration = 600
-            toilet_window_manager.start_timer(duration, timer_expired)
-            logger.info(f"Timer started for {duration} seconds as window is now open.")
-        elif toilet_window_manager.status == WindowStatus.OPEN and validated_status == WindowStatus.CLOSED:
-            if toilet_window_manager.timer_expired:
-                send_discord_message("Bin wieder zu, danke! 😊")
-            toilet_window_manager.cancel_timer()
-            logger.info("Timer cancelled as window is now closed.")
+@api.route('/home', methods=['GET'])
+def all_window_status():
+    service = services()
+    cluster = service.cluster
+    return conditional(lambda: {"windows": [window_state(room.name, name, manager)
+                                            for (room, name), manager in service.registry.items()
+                                            if cluster is None or cluster.owns(room.name, name)]},
+                       service.broadcaster.etag())
 
-        toilet_window_manager.status = validated_status
-        return jsonify({'status': toilet_window_manager.status.name}), 200
+
+@api.route('/home/<room>/<window>', methods=['GET'])
+def window_status(room, window):
+    service = services()
+    forwarded = forward_to_owner(service, room, window, 'GET')
+    if forwarded is not None:
+        return forwarded
+    window_manager = service.registry.get(room, window)
+    if window_manager is None:
+        return jsonify({"error": "Unknown window."}), 404
+    return conditional(lambda: window_state(room, window, window_manager), state_etag(window_manager))
+
+
+@api.route('/events', methods=['GET'])
+def event_stream():
+    """Streams window events as Server-Sent Events, resuming after the Last-Event-ID header if given."""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    return Response(services().broadcaster.stream(last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@api.route('/home/<room>/<window>/history', methods=['GET'])
+def window_history(room, window):
+    window_manager = services().registry.get(room, window)
+    if window_manager is None:
+        return jsonify({"error": "Unknown window."}), 404
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({"error": "Invalid since or limit parameter."}), 400
+    transitions = window_manager.history(since, limit)
+    return jsonify({
+        "room": room,
+        "window": window,
+        "transitions": [{"timestamp": timestamp, "status": status.name} for timestamp, status in transitions],
+    }), 200
+
+
+@api.route('/home/events', methods=['POST'])
+@metrics.timed(metrics.REQUEST_LATENCY["ingest_events"])
+def ingest_events():
+    service = services()
+    try:
+        events = request.get_json(silent=True)
+        if not isinstance(events, list):
+            return jsonify({"error": "Request body must be a JSON array of events."}), 400
+        return jsonify({"results": service.apply_events(events, FORWARDED_HEADER in request.headers)}), 200
 
     except Exception as e:
-        logger.error(f"An error occurred: {e}")
+        logger.error("An error occurred: %s", e)
         error_message = "An internal error occurred."
-        if DEBUG_MODE:
+        if service.config.debug:
             error_message += f" Details: {e}"
         return jsonify({"error": error_message}), 500
 
 
-if __name__ == '__main__':
+@api.route('/home/events/stream', methods=['POST'])
+def ingest_event_stream():
+    """Applies newline-delimited JSON events in chunks and streams back one NDJSON result per line."""
+    service = services()
+    chunk_size = service.config.ingest_chunk_size
+
+    def parse(line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def generate():
+        chunk = []
+        for line in request.stream:
+            if line.strip():
+                chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield from (json.dumps(result) + "\n" for result in service.apply_events([parse(item) for item in chunk]))
+                chunk = []
+        if chunk:
+            yield from (json.dumps(result) + "\n" for result in service.apply_events([parse(item) for item in chunk]))
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@api.route('/reports/open-time', methods=['GET'])
+def open_time_report():
+    return jsonify(services().analytics.report()), 200
+
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render() + services().gauges.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@api.route('/stats', methods=['GET'])
+def stats():
+    service = services()
+    return jsonify({"notifier": service.notifier.stats(), "debounce": service.debouncer.stats(),
+                    "dedupe": service.deduplicator.stats(), "windows": len(service.registry),
+                    "backend": service.backend.stats() if service.backend is not None else None,
+                    "slow_calls": service.slow_calls.stats(),
+                    "datagram": service.datagram.stats() if service.datagram is not None else None,
+                    "cluster": service.cluster.stats() if service.cluster is not None else None}), 200
+
+
+def cluster_required(view):
+    """Serves ``view`` only in cluster mode."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if services().cluster is None:
+            return jsonify({"error": "Not found."}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@api.route('/cluster/ping', methods=['GET'])
+@cluster_required
+def cluster_ping():
+    return jsonify(services().cluster.ping()), 200
+
+
+def cluster_field(name: str, kind: type):
+    """Returns the ``name`` field of the JSON request body, or None unless it is a ``kind``."""
+    body = request.get_json(silent=True)
+    value = body.get(name) if isinstance(body, dict) else None
+    return value if isinstance(value, kind) else None
+
+
+@api.route('/cluster/join', methods=['POST'])
+@cluster_required
+def cluster_join():
+    node = cluster_field('node', str)
+    if not node:
+        return jsonify({"error": "Request body must be a JSON object with a 'node' URL."}), 400
+    services().cluster.join(node)
+    return jsonify(services().cluster.ping()), 200
+
+
+@api.route('/cluster/leave', methods=['POST'])
+@cluster_required
+def cluster_leave():
+    node = cluster_field('node', str)
+    if not node:
+        return jsonify({"error": "Request body must be a JSON object with a 'node' URL."}), 400
+    services().cluster.leave_node(node)
+    return jsonify(services().cluster.ping()), 200
+
+
+@api.route('/cluster/handover', methods=['POST'])
+@cluster_required
+def cluster_handover():
+    """Takes over windows, with their timers, from a node that no longer owns them."""
+    windows = cluster_field('windows', list)
+    if windows is None or not all(valid_record(record) for record in windows):
+        return jsonify({"error": "Request body must be a JSON object with a 'windows' list of window records."}), 400
+    return jsonify({"restored": services().cluster.handover(windows)}), 200
+
+
+@api.route('/cluster/replicate', methods=['POST'])
+@cluster_required
+def cluster_replicate():
+    """Stores the state of windows this node backs up."""
+    windows = cluster_field('windows', list)
+    if windows is None or not all(valid_record(record) for record in windows):
+        return jsonify({"error": "Request body must be a JSON object with a 'windows' list of window records."}), 400
+    return jsonify({"stored": services().cluster.replicate(windows)}), 200
+
+
+@api.route('/admin/profile', methods=['POST'])
+@admin_required
+def profile():
+    """Samples every thread for ``seconds`` and returns the collapsed stacks, ready for flamegraph.pl."""
+    seconds = request.args.get('seconds', default=10.0, type=float)
+    interval = request.args.get('interval', default=0.005, type=float)
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        return jsonify({"error": f"Duration must be between 0 and {MAX_PROFILE_SECONDS} seconds."}), 400
+    try:
+        stacks = services().profiler.profile(seconds, interval)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return Response(render_collapsed(stacks), content_type='text/plain; charset=utf-8',
+                    headers={'X-Profile-Samples': str(sum(stacks.values()))})
+
+
+@api.route('/admin/slow-calls', methods=['GET'])
+@admin_required
+def slow_call_report():
+    """Lists the slowest status updates of the last ``SLOW_CALL_WINDOW`` seconds with their stacks."""
+    recorder = services().slow_calls
+    return jsonify({"calls": [call.to_dict() for call in recorder.calls()], "stats": recorder.stats()}), 200
+
+
+_default_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # The default app is only built when a server or ``python -m timeraas.app`` asks for it (PEP 562)
+    if name == "app":
+        with _default_app_lock:
+            if "app" not in globals():
+                globals()["app"] = create_app(Config.from_env())
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main():
+    default_app = create_app(Config.from_env())
     logger.info("Starting the application...")
-    app.run(host='0.0.0.0', port=5000, debug=DEBUG_MODE)
-    logger.info("Application shutdown.")
+    try:
+        default_app.run(host='0.0.0.0', port=5000, debug=default_app.config["TIMERAAS"].debug)
+    finally:
+        default_app.extensions[EXTENSION].shutdown()
+
+
+if __name__ == '__main__':
+    main()
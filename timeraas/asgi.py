@@ -0,0 +1,628 @@
+"""Asyncio/ASGI entry point serving the same endpoints as the Flask app.
+
+Window deadlines are ``loop.call_later`` handles and notifications are sent
+from asyncio tasks, so a single event loop thread serves every sensor
+connection and timer. Run it with any ASGI server, e.g.::
+
+    uvicorn timeraas.asgi:app --host 0.0.0.0 --port 5000
+
+or ``python -m timeraas.asgi`` if uvicorn is installed. Webhook posts use
+``httpx.AsyncClient`` when httpx is installed and fall back to the pooled
+``requests`` session on a worker thread otherwise.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import time
+from urllib.parse import parse_qs
+
+from timeraas import ingest, metrics
+from timeraas.broadcast import Broadcaster, etag_matches, state_etag, window_state
+from timeraas.config import Config
+from timeraas.debounce import Debouncer
+from timeraas.dedupe import EventDeduplicator, event_key
+from timeraas.escalation import Escalation, parse_escalation
+from timeraas.ingest import ACCEPTED_STATUSES, INVALID_STATUS_ERROR, validate_status
+from timeraas.journal import Journal, recover
+from timeraas.messages import CLOSED_AGAIN_MESSAGE, EXPIRED_MESSAGES
+from timeraas.notifier import Notifier, TokenBucket, retry_after
+from timeraas.registry import WindowRegistry, parse_room_floors
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - depends on the environment
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Sentinel telling a worker task to exit
+
+
+class AsyncioTimer:
+    """Reference to a callback scheduled on the event loop."""
+
+    __slots__ = ("handle", "cancelled")
+
+    def __init__(self):
+        self.handle = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.handle is not None:
+            self.handle.cancel()
+
+
+class AsyncioScheduler:
+    """Scheduler backed by ``loop.call_later`` with the same interface as TimerScheduler.
+
+    It must only be used from the event loop thread.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        self._loop = loop
+        self._timers = set()
+
+    @property
+    def pending(self) -> int:
+        """Number of timers that are armed and not yet fired or cancelled."""
+        return len(self._timers)
+
+    def schedule(self, delay: float, callback, *args) -> AsyncioTimer:
+        """Arms a timer that calls ``callback(*args)`` after ``delay`` seconds."""
+        if delay < 0:
+            raise ValueError("Delay must not be negative.")
+        if not callable(callback):
+            raise ValueError("Callback must be a callable function.")
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        timer = AsyncioTimer()
+        timer.handle = self._loop.call_later(delay, self._fire, timer, callback, args)
+        self._timers.add(timer)
+        return timer
+
+    def cancel(self, timer: AsyncioTimer) -> bool:
+        """Cancels a pending timer. Returns False if it already fired or was cancelled."""
+        timer.cancel()
+        if timer in self._timers:
+            self._timers.remove(timer)
+            return True
+        return False
+
+    def shutdown(self):
+        """Cancels all pending timers."""
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+
+    def _fire(self, timer: AsyncioTimer, callback, args):
+        self._timers.discard(timer)
+        if timer.cancelled:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error("Timer callback failed: %s", e)
+
+
+class AsyncNotifier:
+    """Delivers webhook messages from an asyncio queue drained by worker tasks.
+
+    Behaves like Notifier: ``send`` never blocks, alerts within
+    ``digest_window`` are merged by a single collector task, sends are paced
+    by a token bucket and 429 or server errors are retried with backoff.
+    Messages sent after ``close`` are dropped.
+    """
+
+    def __init__(self, webhook_url: str, workers: int = 2, queue_size: int = 1000, timeout: float = 10.0,
+                 client=None, digest_window: float = 0.0, max_digest: int = 25, rate: float = 2.5,
+                 burst: int = 5, max_retries: int = 5, backoff: float = 1.0):
+        if not isinstance(workers, int) or workers <= 0:
+            raise ValueError("Workers must be a positive integer.")
+        if not isinstance(queue_size, int) or queue_size <= 0:
+            raise ValueError("Queue size must be a positive integer.")
+        self._webhook_url = webhook_url
+        self._worker_count = workers
+        self._queue_size = queue_size
+        self._timeout = timeout
+        self._client = client
+        self._digest_window = digest_window
+        self._max_digest = max_digest
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._bucket = TokenBucket(rate, burst)
+        self._fallback = None  # Blocking Notifier used on a worker thread when httpx is missing
+        self._queue = None
+        self._deliveries = None  # (room, message) items for the workers, fed by the collector with digests
+        self._collector = None
+        self._workers = []
+        self._closed = False
+        self._sent = 0
+        self._failed = 0
+        self._dropped = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def start(self):
+        """Creates the queue and worker tasks on the running loop if that has not happened yet."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._deliveries = asyncio.Queue(maxsize=self._queue_size) if self._digest_window > 0 else self._queue
+        if self._client is None:
+            if httpx is not None:
+                self._client = httpx.AsyncClient(timeout=self._timeout,
+                                                 limits=httpx.Limits(max_keepalive_connections=self._worker_count))
+            else:
+                self._fallback = Notifier(self._webhook_url, workers=self._worker_count, timeout=self._timeout,
+                                          max_retries=self._max_retries, backoff=self._backoff)
+        loop = asyncio.get_running_loop()
+        if self._deliveries is not self._queue:
+            self._collector = loop.create_task(self._run_collector())
+        self._workers = [loop.create_task(self._run()) for _ in range(self._worker_count)]
+
+    def send(self, message: str, room: str = None) -> bool:
+        """Queues a message for delivery. Returns False if the queue is full or the notifier is closed."""
+        if self._closed:
+            self._dropped += 1
+            logger.warning("Notifier is closed, dropping message.")
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait((room, message))
+        except asyncio.QueueFull:
+            self._dropped += 1
+            logger.warning("Notification queue is full, dropping message.")
+            return False
+        return True
+
+    async def deliver(self, message: str) -> bool:
+        """Posts a message to the webhook without blocking the event loop."""
+        start = time.perf_counter()
+        if self._fallback is not None:
+            success = await asyncio.get_running_loop().run_in_executor(None, self._fallback.deliver, message)
+        else:
+            success = await self._post(message)
+        latency = time.perf_counter() - start
+        if self._fallback is None:
+            # The fallback notifier records its own deliveries
+            metrics.DISCORD_SEND_LATENCY.observe(latency)
+            (metrics.DISCORD_SENT if success else metrics.DISCORD_FAILURES).inc()
+        if success:
+            self._sent += 1
+        else:
+            self._failed += 1
+        self._latency_total += latency
+        self._latency_max = max(self._latency_max, latency)
+        return success
+
+    async def _post(self, message: str) -> bool:
+        for attempt in range(self._max_retries + 1):
+            await asyncio.sleep(self._bucket.reserve())
+            try:
+                response = await self._client.post(self._webhook_url, json={"content": message})
+            except Exception as e:
+                if attempt == self._max_retries:
+                    logger.error("Failed to send message to Discord: %s", e)
+                    return False
+                await asyncio.sleep(self._backoff * 2 ** attempt)
+                continue
+            if response.status_code == 429:
+                wait = retry_after(response)
+                self._bucket.pause(wait if wait is not None else self._backoff * 2 ** attempt)
+                logger.warning("Discord rate limit hit, retrying.")
+                continue
+            if response.status_code >= 500 and attempt < self._max_retries:
+                await asyncio.sleep(self._backoff * 2 ** attempt)
+                continue
+            if response.status_code >= 400:
+                logger.error("Failed to send message to Discord: HTTP %s", response.status_code)
+                return False
+            logger.info("Message delivered successfully to Discord.")
+            return True
+        logger.error("Failed to send message to Discord: still rate limited after retries.")
+        return False
+
+    def stats(self) -> dict:
+        """Returns queue depth, delivery counters and send latency in seconds."""
+        attempts = self._sent + self._failed
+        depth = self._queue.qsize() if self._queue is not None else 0
+        if self._deliveries is not self._queue:
+            depth += self._deliveries.qsize()
+        return {
+            "queue_depth": depth,
+            "sent": self._sent,
+            "failed": self._failed,
+            "dropped": self._dropped,
+            "latency_avg": self._latency_total / attempts if attempts else 0.0,
+            "latency_max": self._latency_max,
+        }
+
+    async def join(self):
+        """Waits until every queued message has been processed."""
+        if self._queue is not None:
+            await self._queue.join()  # The collector hands a digest to the workers before it marks its alerts done
+            await self._deliveries.join()
+
+    async def close(self):
+        """Delivers the remaining messages and stops the worker tasks."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._queue is None:
+            return
+        if self._collector is not None:
+            await self._queue.put(_STOP)
+            await self._collector
+            self._collector = None
+        for _ in self._workers:
+            await self._deliveries.put(_STOP)
+        await asyncio.gather(*self._workers)
+        self._workers = []
+        if self._client is not None and hasattr(self._client, "aclose"):
+            await self._client.aclose()
+        if self._fallback is not None:
+            self._fallback.close()
+
+    async def _collect(self, first) -> tuple:
+        alerts = [first]
+        deadline = time.monotonic() + self._digest_window
+        while len(alerts) < self._max_digest:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is _STOP:
+                return alerts, True
+            alerts.append(item)
+        return alerts, False
+
+    async def _run_collector(self):
+        # Merges queued alerts into digests in one place, so a digest is never split between workers
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            alerts, stop = [item], False
+            try:
+                alerts, stop = await self._collect(item)
+                await self._deliveries.put((None, Notifier.format_digest(alerts)))
+            except Exception as e:
+                logger.error("Notification digest failed: %s", e)
+            finally:
+                for _ in range(len(alerts) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    async def _run(self):
+        while True:
+            item = await self._deliveries.get()
+            try:
+                if item is _STOP:
+                    return
+                await self.deliver(item[1])
+            except Exception as e:
+                logger.error("Notification worker failed: %s", e)
+            finally:
+                self._deliveries.task_done()
+
+
+class TimeraasASGI:
+    """ASGI application implementing the Flask endpoint contract on a single event loop."""
+
+    def __init__(self, webhook_url: str = None, duration: int = 600, floors: dict = None, debug: bool = False,
+                 notifier: AsyncNotifier = None, chunk_size: int = 500, journal: Journal = None,
+                 debounce: float = 0.0, escalation: Escalation = None, event_buffer: int = 1024,
+                 dedupe_capacity: int = 10000):
+        self.webhook_url = webhook_url
+        self.journal = journal
+        self.duration = duration
+        self.escalation = escalation  # Without one every window gets a single timer of ``duration`` seconds
+        self.debug = debug
+        self.chunk_size = chunk_size
+        self.scheduler = AsyncioScheduler()
+        self.registry = WindowRegistry(floors=floors, scheduler=self.scheduler)
+        self.debouncer = Debouncer(debounce, self.scheduler)
+        self.broadcaster = Broadcaster(event_buffer)
+        self.deduplicator = EventDeduplicator(dedupe_capacity)
+        self.registry.add_listener(self.broadcaster.listener)
+        self.notifier = notifier if notifier is not None else AsyncNotifier(webhook_url)
+        # Gauges are per instance so several apps in one process do not replace each other's
+        self.gauges = metrics.MetricsRegistry()
+        metrics.register_window_gauges(self.registry, self.notifier, self.gauges)
+
+    def timer_expired(self, location=None, stage=None):
+        """Triggers actions when the timer or an escalation stage expires if not in debug mode."""
+        if not self.debug:
+            if stage is None:
+                self.send_discord_message(random.choice(EXPIRED_MESSAGES), location)
+            else:
+                self.send_discord_message(stage.format(random.choice(stage.messages)), location)
+        else:
+            logger.debug("Would now have sent message to Discord.")
+
+    def send_discord_message(self, message, location=None):
+        """Queues a message for delivery to the configured Discord webhook and returns immediately."""
+        if not self.webhook_url:
+            logger.error("Discord webhook URL is not configured.")
+            return
+        self.notifier.send(message, location)
+
+    def report_transition(self, location, transition):
+        if transition.timer_started:
+            logger.info("Escalation started as %s is now %s.", location, transition.status.name.lower())
+        elif transition.timer_cancelled:
+            if transition.was_expired:
+                self.send_discord_message(CLOSED_AGAIN_MESSAGE, location)
+            logger.info("Timer cancelled as %s is now closed.", location)
+
+    def apply_events(self, events):
+        return ingest.apply_events(self.registry, events, self.escalation or self.duration,
+                                   lambda location: functools.partial(self.timer_expired, location),
+                                   self.report_transition, self.debouncer, self.deduplicator)
+
+    @metrics.timed(metrics.REQUEST_LATENCY["update_window_status"])
+    def update_window_status(self, room, window, payload):
+        validated_status = validate_status(payload.get('status') if isinstance(payload, dict) else None)
+        if validated_status is None or validated_status not in ACCEPTED_STATUSES:
+            return 400, {"error": INVALID_STATUS_ERROR}
+        try:
+            event_id, sequence = event_key(payload)
+            window_manager = self.registry.get_or_create(room, window)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+        logger.info("Received request to update %s/%s status to %s", room, window, validated_status.name)
+        reason = self.deduplicator.check(room, window, event_id, sequence)
+        if reason is not None:
+            return 200, {'status': window_manager.status.name, 'dropped': reason}
+        location = f"{room}/{window}"
+        timing = self.escalation.schedule(room) if self.escalation is not None else self.duration
+        transition = self.debouncer.apply(window_manager, validated_status, timing,
+                                          functools.partial(self.timer_expired, location),
+                                          functools.partial(self.report_transition, location))
+        self.report_transition(location, transition)
+        return 200, {'status': transition.status.name}
+
+    def window_history(self, room, window, query):
+        window_manager = self.registry.get(room, window)
+        if window_manager is None:
+            return 404, {"error": "Unknown window."}
+        try:
+            since = float(query["since"][0]) if "since" in query else None
+            limit = int(query["limit"][0]) if "limit" in query else None
+        except ValueError:
+            return 400, {"error": "Invalid since or limit parameter."}
+        transitions = window_manager.history(since, limit)
+        return 200, {
+            "room": room,
+            "window": window,
+            "transitions": [{"timestamp": timestamp, "status": status.name} for timestamp, status in transitions],
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, parts = scope["method"], scope["path"].strip("/").split("/")
+        try:
+            if method == "POST" and parts == ["home", "events", "stream"]:
+                await self._stream_events(receive, send)
+                return
+            if method == "POST" and parts == ["home", "events"]:
+                events = self._decode(await self._read_body(receive))
+                if not isinstance(events, list):
+                    status, payload = 400, {"error": "Request body must be a JSON array of events."}
+                else:
+                    with metrics.REQUEST_LATENCY["ingest_events"].time():
+                        status, payload = 200, {"results": self.apply_events(events)}
+            elif method == "POST" and len(parts) == 3 and parts[0] == "home":
+                status, payload = self.update_window_status(parts[1], parts[2],
+                                                            self._decode(await self._read_body(receive)))
+            elif method == "GET" and parts == ["events"]:
+                await self._event_stream(scope, receive, send)
+                return
+            elif method == "GET" and parts == ["home"]:
+                await self._respond_conditional(scope, send, lambda: {"windows": [
+                    window_state(room.name, name, manager) for (room, name), manager in self.registry.items()]},
+                    self.broadcaster.etag())
+                return
+            elif method == "GET" and len(parts) == 3 and parts[0] == "home":
+                window_manager = self.registry.get(parts[1], parts[2])
+                if window_manager is None:
+                    status, payload = 404, {"error": "Unknown window."}
+                else:
+                    await self._respond_conditional(scope, send,
+                                                    lambda: window_state(parts[1], parts[2], window_manager),
+                                                    state_etag(window_manager))
+                    return
+            elif method == "GET" and len(parts) == 4 and parts[0] == "home" and parts[3] == "history":
+                query = parse_qs(scope.get("query_string", b"").decode())
+                status, payload = self.window_history(parts[1], parts[2], query)
+            elif method == "GET" and parts == ["metrics"]:
+                await self._respond_text(send, 200, metrics.REGISTRY.render() + self.gauges.render(),
+                                         metrics.CONTENT_TYPE)
+                return
+            elif method == "GET" and parts == ["stats"]:
+                status, payload = 200, {"notifier": self.notifier.stats(), "debounce": self.debouncer.stats(),
+                                        "dedupe": self.deduplicator.stats(), "windows": len(self.registry)}
+            else:
+                status, payload = 404, {"error": "Not found."}
+        except Exception as e:
+            logger.error("An error occurred: %s", e)
+            error_message = "An internal error occurred."
+            if self.debug:
+                error_message += f" Details: {e}"
+            status, payload = 500, {"error": error_message}
+        await self._respond(send, status, payload)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.notifier.start()
+                if self.journal is not None:
+                    # Timers are loop handles, so recovery has to run on the loop
+                    recover(self.registry, self.journal,
+                            lambda location: functools.partial(self.timer_expired, location), self.escalation)
+                    self.registry.add_listener(self.journal.listener)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.broadcaster.close()
+                self.scheduler.shutdown()
+                await self.notifier.close()
+                if self.journal is not None:
+                    self.journal.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    def _decode(body: bytes):
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _respond(send, status: int, payload):
+        body = json.dumps(payload).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _header(scope, name: bytes) -> str:
+        for key, value in scope.get("headers", []):
+            if key.lower() == name:
+                return value.decode("latin-1")
+        return None
+
+    async def _respond_conditional(self, scope, send, payload, etag: str):
+        """Sends 304 if the client already has the representation with ``etag``, the JSON payload otherwise."""
+        headers = [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+        if etag_matches(self._header(scope, b"if-none-match"), etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        body = json.dumps(payload()).encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": headers + [(b"content-type", b"application/json"),
+                                          (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _event_stream(self, scope, receive, send):
+        """Streams window events as Server-Sent Events until the client disconnects."""
+        last_event_id = self._header(scope, b"last-event-id")
+        if not last_event_id:
+            last_event_id = parse_qs(scope.get("query_string", b"").decode()).get("lastEventId", [None])[0]
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                                (b"x-accel-buffering", b"no")]})
+
+        async def disconnected():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        disconnect = asyncio.ensure_future(disconnected())
+        stream = self.broadcaster.stream_async(last_event_id)
+        try:
+            while True:
+                chunk = asyncio.ensure_future(stream.__anext__())
+                await asyncio.wait({chunk, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnect.done():
+                    chunk.cancel()
+                    await asyncio.gather(chunk, return_exceptions=True)
+                    break
+                try:
+                    body = chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+        finally:
+            disconnect.cancel()
+            await stream.aclose()
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _respond_text(send, status: int, text: str, content_type: str):
+        body = text.encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _stream_events(self, receive, send):
+        """Applies NDJSON events chunk by chunk while the body is still arriving."""
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson")]})
+        buffer, chunk, more_body = b"", [], True
+        while more_body:
+            message = await receive()
+            more_body = message.get("more_body", False)
+            buffer += message.get("body", b"")
+            *lines, buffer = buffer.split(b"\n")
+            if not more_body:
+                lines.append(buffer)
+            chunk.extend(line for line in lines if line.strip())
+            if len(chunk) >= self.chunk_size or (not more_body and chunk):
+                results = self.apply_events([self._decode(line) for line in chunk])
+                chunk = []
+                body = "".join(json.dumps(result) + "\n" for result in results).encode()
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def create_asgi_app(config: Config = None) -> TimeraasASGI:
+    """Builds the ASGI app from a Config, by default read from the same environment variables as the Flask app."""
+    config = Config.from_env() if config is None else config
+    notifier = AsyncNotifier(config.webhook_url, workers=config.notifier_workers,
+                             queue_size=config.notifier_queue_size, digest_window=config.notifier_digest_window,
+                             rate=config.notifier_rate)
+    return TimeraasASGI(webhook_url=config.webhook_url,
+                        duration=config.timer_duration,
+                        floors=parse_room_floors(config.room_floors),
+                        debug=config.debug,
+                        notifier=notifier,
+                        chunk_size=config.ingest_chunk_size,
+                        debounce=config.debounce_window,
+                        event_buffer=config.event_buffer_size,
+                        dedupe_capacity=config.dedupe_capacity,
+                        escalation=parse_escalation(config.escalation_schedules, config.timer_duration,
+                                                    config.tilted_timer_duration),
+                        journal=Journal(config.journal_path) if config.journal_path else None)
+
+
+def __getattr__(name):
+    # Built on first access, so importing the module neither reads the environment nor opens the journal
+    if name == "app":
+        app = globals()["app"] = create_asgi_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The asyncio entry point needs an ASGI server: pip install uvicorn")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    uvicorn.run(create_asgi_app(), host='0.0.0.0', port=int(os.getenv("PORT", "5000")))
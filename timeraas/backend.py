@@ -0,0 +1,303 @@
+"""Window state shared by several worker processes of a pre-forking server.
+
+Every worker keeps its own WindowTable, but status changes are applied in a
+SQLite transaction (WAL mode) against the shared row of the window, so an
+OPEN and a CLOSED handled by different workers see each other. Exactly one
+process, the one holding an exclusive ``flock`` on the lock file, arms real
+timers; the others only record deadlines. An alert is sent only after its
+expiry was written to the shared row with a compare-and-set, so a window
+closed by another worker at the same moment is never reported.
+"""
+import contextlib
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+
+from timeraas.scheduler import TimerScheduler
+from timeraas.window import WindowStatus
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS windows (
+    room TEXT NOT NULL,
+    window TEXT NOT NULL,
+    status TEXT NOT NULL,
+    deadline REAL,
+    expired INTEGER NOT NULL DEFAULT 0,
+    stage INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL,
+    writer TEXT NOT NULL,
+    changed INTEGER NOT NULL,
+    PRIMARY KEY (room, window)
+);
+CREATE INDEX IF NOT EXISTS windows_changed ON windows (changed);
+"""
+COLUMNS = "room, window, status, deadline, expired, stage, version, writer, changed"
+NEXT_CHANGE = "(SELECT COALESCE(MAX(changed), 0) + 1 FROM windows)"
+
+
+class _Unarmed:
+    """Handle of a timer that only the timer-owner process arms."""
+
+    __slots__ = ()
+
+    def cancel(self):
+        pass
+
+
+UNARMED = _Unarmed()
+
+
+class OwnedScheduler:
+    """Scheduler that only arms timers while its process owns the timers.
+
+    Other processes still compute and share the deadlines, but their
+    ``schedule`` calls return an inert handle, so each expiry fires once.
+    """
+
+    def __init__(self, scheduler: TimerScheduler):
+        self._scheduler = scheduler
+        self.owner = False
+
+    @property
+    def pending(self) -> int:
+        return self._scheduler.pending
+
+    def schedule(self, delay: float, callback, *args):
+        if not self.owner:
+            return UNARMED
+        return self._scheduler.schedule(delay, callback, *args)
+
+    def cancel(self, handle) -> bool:
+        if handle is UNARMED:
+            return False
+        return self._scheduler.cancel(handle)
+
+    def shutdown(self):
+        self._scheduler.shutdown()
+
+
+class SqliteBackend:
+    """Shares window state between processes through one SQLite database in WAL mode.
+
+    ``attach`` hooks the backend into a WindowRegistry created with
+    ``scheduler``. A background thread polls the rows changed by other
+    processes every ``poll_interval`` seconds and restores them into the
+    local table, and takes over the timers if the owning process exits.
+    """
+
+    def __init__(self, path: str, scheduler: TimerScheduler = None, poll_interval: float = 0.25,
+                 timeout: float = 5.0, lock_path: str = None):
+        if poll_interval <= 0:
+            raise ValueError("Poll interval must be a positive number of seconds.")
+        if timeout <= 0:
+            raise ValueError("Timeout must be a positive number of seconds.")
+        self._path = path
+        self._lock_path = lock_path or f"{path}.owner"
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+        self._scheduler = OwnedScheduler(scheduler if scheduler is not None else TimerScheduler())
+        self._token = f"{os.getpid()}-{os.urandom(4).hex()}"  # Tells this process's writes from others'
+        # Writes are serialized per process, so threads never spin in SQLite's busy handler against each other
+        self._lock = threading.Lock()
+        self._transaction_thread = None
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._versions = {}  # (room, window) -> version of the shared row the local row reflects
+        self._pending = {}  # Location -> (key, row, base version) of an expiry waiting to be claimed
+        self._cursor = 0  # Highest ``changed`` value restored locally
+        self._owner_file = None
+        self._registry = None
+        self._expiry_callback = None
+        self._escalation = None
+        self._conflicts = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def scheduler(self) -> OwnedScheduler:
+        """Scheduler to create the WindowRegistry with."""
+        return self._scheduler
+
+    @property
+    def owner(self) -> bool:
+        """Whether this process arms the timers."""
+        return self._scheduler.owner
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; commits skip the fsync
+        return connection
+
+    def attach(self, registry, expiry_callback, escalation=None):
+        """Routes the registry's status changes through the shared rows and starts the poll thread.
+
+        ``expiry_callback(location)`` builds the timer callback of a window,
+        wrapped with ``guard``; ``escalation`` resolves the stages to re-arm.
+        """
+        self._registry = registry
+        self._expiry_callback = expiry_callback
+        self._escalation = escalation
+        registry.add_listener(self.listener)
+        registry.table.backend = self
+        self.poll()
+        self._thread = threading.Thread(target=self._run, name="timeraas-backend", daemon=True)
+        self._thread.start()
+
+    @contextlib.contextmanager
+    def transaction(self, manager):
+        """Holds the database write lock while a status change is applied to ``manager``.
+
+        The local row is first brought up to date with the shared one; the
+        events emitted meanwhile are written in the same transaction.
+        """
+        if self._transaction_thread == threading.get_ident():
+            yield  # Already inside a transaction of this thread
+            return
+        key = (manager.window.location.name, manager.name)
+        with self._lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            self._transaction_thread = threading.get_ident()
+            try:
+                row = self._writer.execute(f"SELECT {COLUMNS} FROM windows WHERE room = ? AND window = ?",
+                                           key).fetchone()
+                if row is not None and row[6] > self._versions.get(key, 0):
+                    self._restore(manager, row)
+                yield
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                self._versions.pop(key, None)  # The local row may be ahead now; resync on the next change
+                raise
+            finally:
+                self._transaction_thread = None
+
+    def listener(self, manager, event):
+        """WindowManager listener writing status changes and queueing expiries for ``guard``."""
+        if event.kind == "restored":
+            return  # Restored state came from the shared row
+        key = (manager.window.location.name, manager.name)
+        row = (event.status.name, event.deadline, int(event.expired), event.stage)
+        if self._transaction_thread == threading.get_ident():
+            version = self._versions.get(key, 0) + 1
+            self._writer.execute(
+                f"INSERT INTO windows ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, {NEXT_CHANGE}) "
+                "ON CONFLICT (room, window) DO UPDATE SET status = excluded.status, deadline = excluded.deadline, "
+                "expired = excluded.expired, stage = excluded.stage, version = excluded.version, "
+                "writer = excluded.writer, changed = excluded.changed",
+                key + row + (version, self._token))
+            self._versions[key] = version
+        elif event.kind == "expired":
+            self._pending[f"{key[0]}/{key[1]}"] = (key, row, self._versions.get(key, 0))
+        else:
+            logger.warning("Event of %s/%s changed outside of a shared transaction.", *key)
+
+    def guard(self, location: str, callback):
+        """Wraps an expiry callback so it only runs if the expiry could be written to the shared row."""
+        def guarded(*args):
+            pending = self._pending.pop(location, None)
+            if pending is not None and not self._claim(*pending):
+                logger.info("Skipped alert for %s, it was changed by another process.", location)
+                return
+            callback(*args)
+
+        return guarded
+
+    def _claim(self, key: tuple, row: tuple, base: int) -> bool:
+        with self._lock:
+            if self._stopped.is_set():
+                return False  # The expiry is still unclaimed in the shared row, so the next owner fires it
+            cursor = self._writer.execute(
+                "UPDATE windows SET status = ?, deadline = ?, expired = ?, stage = ?, version = ?, writer = ?, "
+                f"changed = {NEXT_CHANGE} WHERE room = ? AND window = ? AND version = ?",
+                row + (base + 1, self._token) + key + (base,))
+            if cursor.rowcount != 1:
+                self._conflicts += 1
+                return False
+            self._versions[key] = base + 1
+            return True
+
+    def _restore(self, manager, row: tuple):
+        # Caller must hold self._lock
+        room, window, status, deadline, expired, stage, version = row[:7]
+        status = WindowStatus[status]
+        now = self._registry.table.clock.time()  # The registry's clock, so virtual time restores correctly
+        remaining = deadline - now if deadline is not None and status != WindowStatus.CLOSED else None
+        stages = self._escalation.schedule(room).stages(status) if self._escalation is not None else None
+        manager.restore(status, remaining, bool(expired), self._expiry_callback(f"{room}/{window}"), stages, stage)
+        self._versions[(room, window)] = version
+
+    def poll(self):
+        """Takes over the timers if no process owns them, then restores the rows changed by other processes."""
+        if not self.owner and self._acquire():
+            logger.info("Process %s now owns the window timers.", os.getpid())
+            self._scheduler.owner = True
+            self._cursor = 0  # Re-arm every window with its remaining time
+        rows = self._query(f"SELECT {COLUMNS} FROM windows WHERE changed > ? ORDER BY changed",
+                                 (self._cursor,))
+        for row in rows:
+            self._cursor = max(self._cursor, row[8])
+            with self._lock:
+                if row[6] > self._versions.get((row[0], row[1]), 0) or (self.owner and self._unarmed(row)):
+                    self._restore(self._registry.get_or_create(row[0], row[1]), row)
+
+    def _unarmed(self, row: tuple) -> bool:
+        # A new owner arms the deadlines it only recorded while another process owned the timers
+        manager = self._registry.get(row[0], row[1])
+        return row[3] is not None and (manager is None or manager._timer in (None, UNARMED))
+
+    def _query(self, query: str, parameters: tuple) -> list:
+        with self._lock:
+            return self._writer.execute(query, parameters).fetchall()
+
+    def _acquire(self) -> bool:
+        owner_file = open(self._lock_path, "a")
+        try:
+            fcntl.flock(owner_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            owner_file.close()
+            return False
+        self._owner_file = owner_file  # The lock is released when the process exits
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self._poll_interval):
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                logger.error("Failed to read shared window state: %s", e)
+
+    def state(self) -> dict:
+        """Returns the latest shared state per (room, window), like ``Journal.state``."""
+        rows = self._query(f"SELECT {COLUMNS} FROM windows", ())
+        return {(row[0], row[1]): {"room": row[0], "window": row[1], "status": row[2], "deadline": row[3],
+                                   "expired": bool(row[4]), "stage": row[5]} for row in rows}
+
+    def stats(self) -> dict:
+        return {"owner": self.owner, "conflicts": self._conflicts, "cursor": self._cursor}
+
+    def close(self):
+        """Stops the poll thread and releases the timers, so another process takes them over."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._registry is not None:
+            self._registry.table.backend = None
+        self._scheduler.owner = False
+        if self._owner_file is not None:
+            self._owner_file.close()
+            self._owner_file = None
+        with self._lock:
+            self._writer.close()
+
+    def __repr__(self) -> str:
+        return f"SqliteBackend(path={self._path!r}, owner={self.owner})"
@@ -0,0 +1,250 @@
+"""Server-Sent Events broadcast of window events through one shared ring buffer."""
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+class Broadcaster:
+    """Ring buffer of the latest window events shared by every SSE subscriber.
+
+    Events get consecutive ids, so a subscriber only remembers the id it sent
+    last and resumes from ``Last-Event-ID`` after reconnecting. Ids are
+    prefixed with a random epoch per process, so a client reconnecting after
+    a restart is told to refetch instead of resuming from an unrelated id. Publishing
+    stores the raw event and signals a single waiter, so it costs the same no
+    matter how many dashboards are connected. Each event is encoded once, by
+    the first subscriber that reads it. Thread subscribers are woken by a
+    dispatcher thread, asyncio subscribers by one event on their loop.
+    """
+
+    def __init__(self, capacity: int = 1024, keepalive: float = 15.0):
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("Capacity must be a positive integer.")
+        if keepalive <= 0:
+            raise ValueError("Keepalive must be a positive number of seconds.")
+        self.epoch = os.urandom(4).hex()
+        self._capacity = capacity
+        self._keepalive = keepalive
+        self._ring = [None] * capacity  # Slot id % capacity -> [id, kind, data, encoded or None]
+        self._next_id = 1
+        self._lock = threading.Lock()  # Taken by publish; never held while waking subscribers
+        self._condition = threading.Condition()  # Thread subscribers wait here
+        self._pending = threading.Event()  # Wakes the dispatcher thread
+        self._dispatcher = None
+        self._closed = False
+        self._loop = None
+        self._loop_event = None
+        self._loop_wakeup_scheduled = False
+        self._subscribers = 0
+
+    @property
+    def last_id(self) -> int:
+        """Id of the latest published event, 0 before the first one."""
+        return self._next_id - 1
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def publish(self, kind: str, data: dict) -> int:
+        """Appends an event to the ring buffer and wakes the subscribers. Returns the event id."""
+        with self._lock:
+            event_id = self._next_id
+            self._ring[event_id % self._capacity] = [event_id, kind, data, None]
+            self._next_id = event_id + 1
+            loop, wake_loop = self._loop, not self._loop_wakeup_scheduled
+            if loop is not None:
+                self._loop_wakeup_scheduled = True
+        if self._dispatcher is not None:
+            self._pending.set()
+        if loop is not None and wake_loop:
+            try:
+                loop.call_soon_threadsafe(self._wake_loop)
+            except RuntimeError:  # The loop has been closed
+                self._loop = None
+        return event_id
+
+    def listener(self, manager, event):
+        """WindowManager listener publishing every event of the manager's window."""
+        self.publish(event.kind, {
+            "room": manager.window.location.name,
+            "window": manager.name,
+            "status": event.status.name,
+            "previous": event.previous.name,
+            "deadline": event.deadline,
+            "expired": event.expired,
+            "stage": event.stage,
+            "timestamp": event.timestamp,
+        })
+
+    def since(self, last_id: int) -> tuple:
+        """Returns (encoded events after ``last_id``, id of the latest of them).
+
+        If events after ``last_id`` were already overwritten, a ``reset`` event
+        telling the client to refetch the window states comes first.
+        """
+        with self._lock:
+            next_id = self._next_id
+            first = max(last_id + 1, next_id - self._capacity, 1)
+            entries = [self._ring[event_id % self._capacity] for event_id in range(first, next_id)]
+        events = [self._encode(entry) for entry in entries]
+        if first > last_id + 1:
+            events.insert(0, self._reset(next_id - 1))
+        return events, max(last_id, next_id - 1)
+
+    def event_id(self, number: int) -> str:
+        """SSE id of the event with the given number."""
+        return f"{self.epoch}.{number}"
+
+    def _encode(self, entry: list) -> bytes:
+        encoded = entry[3]
+        if encoded is None:
+            # Two subscribers may encode the same event at once; both results are identical
+            encoded = entry[3] = (f"id: {self.event_id(entry[0])}\nevent: {entry[1]}\n"
+                                  f"data: {json.dumps(entry[2])}\n\n").encode("utf-8")
+        return encoded
+
+    def _reset(self, last_id: int) -> bytes:
+        return f"id: {self.event_id(last_id)}\nevent: reset\ndata: {{}}\n\n".encode()
+
+    def _resume(self, last_event_id: str = None) -> tuple:
+        """Returns the first chunks of a new stream and the event number it continues after."""
+        if not last_event_id:
+            return [], self.last_id
+        epoch, _, number = last_event_id.strip().partition(".")
+        if epoch == self.epoch and number.isdigit() and int(number) <= self.last_id:
+            return self.since(int(number))
+        # An id of another process or one this buffer never issued: start over with the current state
+        last_id = self.last_id
+        return [self._reset(last_id)], last_id
+
+    def wait(self, last_id: int, timeout: float = None) -> bool:
+        """Blocks the calling thread until an event after ``last_id`` exists. Returns False on timeout."""
+        self._ensure_dispatcher()
+        with self._condition:
+            if self.last_id > last_id:
+                return True
+            self._condition.wait(timeout)
+        return self.last_id > last_id
+
+    def stream(self, last_event_id: str = None):
+        """Yields SSE chunks on the calling thread, resuming after ``Last-Event-ID`` or with the next event."""
+        events, last_id = self._resume(last_event_id)
+        self._count_subscriber(1)
+        try:
+            yield b"retry: 3000\n\n"
+            while not self._closed:
+                if events:
+                    yield b"".join(events)
+                elif not self.wait(last_id, self._keepalive):
+                    yield KEEPALIVE
+                events, last_id = self.since(last_id)
+        finally:
+            self._count_subscriber(-1)
+
+    async def wait_async(self, last_id: int, timeout: float = None) -> bool:
+        """Waits on the running loop until an event after ``last_id`` exists. Returns False on timeout."""
+        import asyncio  # Only asyncio subscribers need it; the Flask app should not pay for importing it
+
+        if self.last_id > last_id:
+            return True
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            with self._lock:
+                self._loop, self._loop_event, self._loop_wakeup_scheduled = loop, asyncio.Event(), False
+        try:
+            await asyncio.wait_for(self._loop_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.last_id > last_id
+
+    async def stream_async(self, last_event_id: str = None):
+        """Async variant of ``stream`` for subscribers served from an event loop."""
+        events, last_id = self._resume(last_event_id)
+        self._count_subscriber(1)
+        try:
+            yield b"retry: 3000\n\n"
+            while not self._closed:
+                if events:
+                    yield b"".join(events)
+                elif not await self.wait_async(last_id, self._keepalive):
+                    yield KEEPALIVE
+                events, last_id = self.since(last_id)
+        finally:
+            self._count_subscriber(-1)
+
+    def _count_subscriber(self, delta: int):
+        with self._lock:
+            self._subscribers += delta
+
+    def _wake_loop(self):
+        import asyncio
+
+        with self._lock:
+            self._loop_wakeup_scheduled = False
+            event, self._loop_event = self._loop_event, asyncio.Event()
+        event.set()
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is not None:
+            return
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="timeraas-broadcast", daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch(self):
+        while not self._closed:
+            self._pending.wait()
+            self._pending.clear()
+            with self._condition:
+                self._condition.notify_all()
+
+    def close(self):
+        """Ends every stream at its next wakeup and stops the dispatcher thread."""
+        self._closed = True
+        self._pending.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake_loop)
+            except RuntimeError:
+                pass
+
+    def etag(self) -> str:
+        """ETag that changes with every published event, for responses covering all windows."""
+        return f'"{self.event_id(self.last_id)}"'
+
+    def __repr__(self) -> str:
+        return f"Broadcaster(last_id={self.last_id}, subscribers={self._subscribers})"
+
+
+def window_state(room: str, window: str, manager) -> dict:
+    """Current state of a window as served by the status endpoint."""
+    return {
+        "room": room,
+        "window": window,
+        "status": manager.status.name,
+        "deadline": manager.deadline,
+        "expired": manager.timer_expired,
+        "stage": manager.stage,
+    }
+
+
+def state_etag(manager) -> str:
+    """Strong ETag of a window's state, computed from the table row without serializing it."""
+    return f'"{manager.status.value}-{manager.stage}-{int(manager.timer_expired)}-{manager.deadline!r}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an ``If-None-Match`` header value matches ``etag``."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
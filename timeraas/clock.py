@@ -0,0 +1,55 @@
+import time
+
+
+class Clock:
+    """Wall-clock and monotonic time of the system, the default clock of every component."""
+
+    __slots__ = ()
+
+    def time(self) -> float:
+        """Seconds since the epoch, used for deadlines, history and event timestamps."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Seconds on a clock that never goes backwards, used to measure intervals."""
+        return time.monotonic()
+
+    def __repr__(self) -> str:
+        return "Clock()"
+
+
+SYSTEM_CLOCK = Clock()
+
+
+class VirtualClock(Clock):
+    """Clock that only moves when it is advanced, for tests and accelerated replays.
+
+    Both readings return the same virtual time, so deadlines and intervals
+    stay consistent with each other.
+    """
+
+    __slots__ = ("_now",)
+
+    def __init__(self, start: float = 0.0):
+        self._now = float(start)
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float):
+        """Moves the clock forward by ``seconds``."""
+        if seconds < 0:
+            raise ValueError("Virtual time must not go backwards.")
+        self._now += seconds
+
+    def set(self, now: float):
+        """Moves the clock forward to ``now``."""
+        if now < self._now:
+            raise ValueError("Virtual time must not go backwards.")
+        self._now = float(now)
+
+    def __repr__(self) -> str:
+        return f"VirtualClock(now={self._now})"
@@ -0,0 +1,445 @@
+"""Cluster mode: windows partitioned across several timeraas nodes by consistent hashing.
+
+Every node is identified by its base URL. The ``room/window`` key of a
+window is hashed onto a ring of virtual nodes; the first node clockwise owns
+the window and arms its timers, the second one keeps a replica of its
+state. Any node accepts updates and forwards those of windows it does not
+own to the owner over pooled keep-alive connections, marked with the
+``X-Timeraas-Forwarded`` header so they are never forwarded again.
+
+Nodes ping the other known nodes every ``heartbeat`` seconds and learn about
+new nodes from the answers. When the set of live nodes changes, every node
+rebuilds the ring: windows whose owner changed are handed over with their
+deadline and escalation stage, so the new owner re-arms the remaining time,
+and a replica whose owner disappeared is promoted, which covers a node that
+crashed. As replication is asynchronous, a crash can lose the last changes
+of its windows, and an alert can be repeated by the promoted replica.
+"""
+import collections
+import hashlib
+import logging
+import threading
+from bisect import bisect_right
+from urllib.parse import quote
+
+from timeraas.journal import restore_entry
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_HEADER = "X-Timeraas-Forwarded"
+
+
+def valid_record(record) -> bool:
+    """Checks that a handed over or replicated window record names its window and carries a timestamp."""
+    if not isinstance(record, dict):
+        return False
+    timestamp = record.get("timestamp")
+    return (isinstance(record.get("room"), str) and isinstance(record.get("window"), str)
+            and isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool))
+
+
+def parse_nodes(spec: str) -> list:
+    """Parses a comma-separated list of node URLs."""
+    return [node.strip().rstrip("/") for node in spec.split(",") if node.strip()]
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with ``replicas`` virtual nodes per node.
+
+    Adding or removing a node only moves the keys between it and its
+    neighbours on the ring, about ``1 / len(nodes)`` of them.
+    """
+
+    def __init__(self, nodes, replicas: int = 64):
+        if replicas < 1:
+            raise ValueError("Replicas must be a positive number of virtual nodes.")
+        self._nodes = tuple(sorted(set(nodes)))
+        if not self._nodes:
+            raise ValueError("A ring needs at least one node.")
+        points = sorted((_hash(f"{node}#{replica}"), node) for node in self._nodes for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    @property
+    def nodes(self) -> tuple:
+        return self._nodes
+
+    def owners(self, key: str, count: int = 1) -> list:
+        """Returns up to ``count`` distinct nodes responsible for ``key``, the owner first."""
+        count = min(count, len(self._nodes))
+        owners, position = [], bisect_right(self._hashes, _hash(key))
+        for offset in range(len(self._owners)):
+            node = self._owners[(position + offset) % len(self._owners)]
+            if node not in owners:
+                owners.append(node)
+                if len(owners) == count:
+                    break
+        return owners
+
+    def owner(self, key: str) -> str:
+        return self.owners(key)[0]
+
+    def __repr__(self) -> str:
+        return f"HashRing(nodes={list(self._nodes)})"
+
+
+class ClusterError(Exception):
+    """Raised when another node cannot be reached."""
+
+
+class Cluster:
+    """Membership, request forwarding and timer handover of one node.
+
+    ``registry``, ``expiry_callback(location)`` and ``escalation`` are the
+    node's own; windows handed over or promoted are restored into the
+    registry like journaled ones. ``peers`` are the node URLs to contact
+    first; one live peer is enough to learn about the others.
+    """
+
+    def __init__(self, node: str, peers, registry, expiry_callback, escalation=None, heartbeat: float = 1.0,
+                 timeout: float = 2.0, misses: int = 2, replicas: int = 64, pool_size: int = 8):
+        if heartbeat <= 0 or timeout <= 0:
+            raise ValueError("Heartbeat and timeout must be positive numbers of seconds.")
+        if misses < 1:
+            raise ValueError("Misses must be a positive number of heartbeats.")
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.node = node.rstrip("/")
+        self._known = {peer for peer in parse_nodes(",".join(peers)) if peer != self.node}
+        self._alive = {self.node}
+        self._missed = collections.Counter()
+        self._replicas_per_node = replicas
+        self._ring = HashRing(self._alive, replicas)
+        self._registry = registry
+        self._expiry_callback = expiry_callback
+        self._escalation = escalation
+        self._heartbeat = heartbeat
+        self._timeout = timeout
+        self._misses = misses
+        self._session = requests.Session()  # Keep-alive connections to every peer, reused by all threads
+        adapter = HTTPAdapter(pool_connections=max(1, len(self._known)) + 1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._request_error = requests.RequestException
+        self._membership = threading.Lock()  # Serializes ring changes and the handovers they cause
+        self._lock = threading.Lock()  # Guards the ownership state below
+        self._owned = set()  # (room, window) this node is authoritative for
+        self._changed = {}  # (room, window) -> timestamp of the last change this node knows about
+        self._replicas = {}  # (room, window) -> state record replicated by the owner
+        self._outgoing = {}  # (room, window) -> state record waiting to be replicated
+        self._wakeup = threading.Condition(self._lock)
+        self._counts = collections.Counter()
+        self._retry_handover = False  # A handover failed; the next heartbeat tries again
+        self._stopped = threading.Event()
+        self._threads = []
+        registry.add_listener(self.listener)
+
+    @property
+    def nodes(self) -> tuple:
+        """Live nodes, including this one while it is a member."""
+        return self._ring.nodes
+
+    def owner(self, room: str, window: str) -> str:
+        return self._ring.owner(f"{room}/{window}")
+
+    def owns(self, room: str, window: str) -> bool:
+        return (room, window) in self._owned
+
+    def assigned(self, room: str, window: str) -> bool:
+        """Whether the ring assigns the window to this node, even if it has not seen an update for it yet."""
+        return self.owner(room, window) == self.node
+
+    def start(self):
+        """Finds the live peers, announces this node and starts the heartbeat and replication threads."""
+        self._ping_all()
+        for peer in self._alive - {self.node}:
+            self._notify(peer, "/cluster/join")
+        for target in (self._run_heartbeat, self._run_replication):
+            thread = threading.Thread(target=target, name=f"timeraas-cluster-{target.__name__[5:]}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Node %s joined the cluster of %s nodes.", self.node, len(self.nodes))
+
+    def leave(self):
+        """Hands every owned window over to its next owner and tells the peers this node is gone."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._flush_replication()
+        peers = self._alive - {self.node}
+        if peers:
+            with self._membership:
+                self._ring = HashRing(peers, self._replicas_per_node)
+                self._rebalance()
+            for peer in peers:
+                self._notify(peer, "/cluster/leave")
+        logger.info("Node %s left the cluster, handed over %s windows.", self.node, self._counts["handed_over"])
+        self._session.close()
+
+    def _request(self, node: str, method: str, path: str, payload=None) -> tuple:
+        try:
+            response = self._session.request(method, node + path, json=payload, timeout=self._timeout,
+                                             headers={FORWARDED_HEADER: self.node})
+            return response.json(), response.status_code
+        except (self._request_error, ValueError) as e:
+            raise ClusterError(f"Node {node} is unreachable: {e}") from e
+
+    def forward(self, room: str, window: str, method: str, path: str, payload=None):
+        """Sends a request about a window to its owner and returns (body, status code).
+
+        Returns None if this node owns the window. An unreachable owner is
+        marked dead, so the request goes to the next owner or is handled
+        locally. If the ring does not change, e.g. because this node is
+        leaving, the result is a 503 error.
+        """
+        while True:
+            owner = self.owner(room, window)
+            if owner == self.node:
+                return None
+            try:
+                result = self._request(owner, method, path, payload)
+            except ClusterError as e:
+                logger.warning("%s", e)
+                self._mark_dead(owner, immediately=True)
+                if self.owner(room, window) == owner:
+                    return {"error": f"Owner {owner} is unreachable."}, 503
+                continue
+            self._counts["forwarded"] += 1
+            return result
+
+    def window_path(self, room: str, window: str) -> str:
+        return f"/home/{quote(room, safe='')}/{quote(window, safe='')}"
+
+    def apply_events(self, events: list, apply_local) -> list:
+        """Applies the events of owned windows with ``apply_local(events)`` and forwards the rest in batches."""
+        results = [None] * len(events)
+        remaining = list(range(len(events)))
+        while remaining:
+            batches = collections.defaultdict(list)
+            for index in remaining:
+                event = events[index]
+                room, window = (event.get("room"), event.get("window")) if isinstance(event, dict) else (None, None)
+                local = not isinstance(room, str) or not isinstance(window, str)  # Rejected by local validation
+                batches[self.node if local else self.owner(room, window)].append(index)
+            remaining = []
+            for node, indexes in batches.items():
+                if node == self.node:
+                    for index, result in zip(indexes, apply_local([events[index] for index in indexes])):
+                        results[index] = result
+                    continue
+                try:
+                    body, status = self._request(node, "POST", "/home/events", [events[index] for index in indexes])
+                except ClusterError as e:
+                    logger.warning("%s", e)
+                    self._mark_dead(node, immediately=True)
+                    for index in indexes:
+                        if self.owner(events[index]["room"], events[index]["window"]) == node:
+                            results[index] = {"error": f"Owner {node} is unreachable."}  # The ring did not change
+                        else:
+                            remaining.append(index)  # Routed again on the changed ring
+                    continue
+                forwarded = body.get("results") if status == 200 and isinstance(body, dict) else None
+                for position, index in enumerate(indexes):
+                    results[index] = forwarded[position] if forwarded else {"error": f"Owner {node} failed."}
+                self._counts["forwarded"] += len(indexes)
+        return results
+
+    def listener(self, manager, event):
+        """WindowManager listener taking ownership of locally changed windows and queueing their replication."""
+        key = (manager.window.location.name, manager.name)
+        with self._wakeup:
+            if event.kind != "restored":
+                self._owned.add(key)
+                self._changed[key] = event.timestamp
+            elif key not in self._owned:
+                return
+            self._outgoing[key] = {"room": key[0], "window": key[1], "status": event.status.name,
+                                   "deadline": event.deadline, "expired": event.expired, "stage": event.stage,
+                                   "timestamp": self._changed.get(key, event.timestamp)}
+            self._wakeup.notify()
+
+    def _record(self, key: tuple) -> dict:
+        manager = self._registry.get(*key)
+        return {"room": key[0], "window": key[1], "status": manager.status.name, "deadline": manager.deadline,
+                "expired": manager.timer_expired, "stage": manager.stage, "timestamp": self._changed.get(key, 0.0)}
+
+    def _restore(self, record: dict) -> bool:
+        key = (record["room"], record["window"])
+        with self._lock:
+            if key in self._owned and self._changed.get(key, 0.0) > record.get("timestamp", 0.0):
+                return False  # This node applied a newer change meanwhile
+            self._owned.add(key)
+            self._changed[key] = record.get("timestamp", 0.0)
+            self._replicas.pop(key, None)
+        try:
+            restore_entry(self._registry, key[0], key[1], record, self._expiry_callback, self._escalation)
+        except (KeyError, ValueError) as e:
+            logger.warning("Skipping unrestorable window %s/%s: %s", key[0], key[1], e)
+            return False
+        return True
+
+    def handover(self, records: list) -> int:
+        """Takes over the windows handed over by another node and re-arms their timers."""
+        restored = sum(1 for record in records if self._restore(record))
+        self._counts["taken_over"] += restored
+        return restored
+
+    def replicate(self, records: list) -> int:
+        """Stores the replicated state of windows owned by another node."""
+        with self._lock:
+            for record in records:
+                key = (record["room"], record["window"])
+                current = self._replicas.get(key)
+                if key not in self._owned and (current is None or current["timestamp"] <= record["timestamp"]):
+                    self._replicas[key] = record
+        return len(records)
+
+    def ping(self) -> dict:
+        """This node and its live peers; no peers once it is leaving, so it is not taken for a member."""
+        return {"node": self.node, "nodes": [] if self._stopped.is_set() else list(self.nodes)}
+
+    def join(self, node: str):
+        """Adds a node that announced itself."""
+        node = node.rstrip("/")
+        if node != self.node:
+            self._known.add(node)
+            self._missed[node] = 0
+            self._set_alive(self._alive | {node})
+
+    def leave_node(self, node: str):
+        """Removes a node that announced it is leaving."""
+        self._mark_dead(node.rstrip("/"), immediately=True)
+
+    def _notify(self, node: str, path: str):
+        try:
+            self._request(node, "POST", path, {"node": self.node})
+        except ClusterError as e:
+            logger.warning("%s", e)
+
+    def _mark_dead(self, node: str, immediately: bool = False):
+        self._missed[node] = self._misses if immediately else self._missed[node] + 1
+        if self._missed[node] >= self._misses and node in self._alive:
+            self._set_alive(self._alive - {node})
+
+    def _ping_all(self):
+        alive = {self.node}
+        for node in sorted(self._known):
+            try:
+                body, _ = self._request(node, "GET", "/cluster/ping")
+            except ClusterError:
+                self._missed[node] += 1
+                if node in self._alive and self._missed[node] < self._misses:
+                    alive.add(node)  # Not dead until it missed enough heartbeats
+                continue
+            if node not in body.get("nodes", ()):
+                self._missed[node] = self._misses  # Leaving
+                continue
+            self._missed[node] = 0
+            alive.add(node)
+            self._known.update(peer for peer in body.get("nodes", ()) if peer != self.node)
+        if not self._stopped.is_set():
+            self._set_alive(alive)
+
+    def _set_alive(self, alive: set):
+        with self._membership:
+            # A node declared dead while the caller was pinging is not revived by its stale result
+            alive = {node for node in alive if node == self.node or self._missed[node] < self._misses}
+            if alive == self._alive or self._stopped.is_set():
+                return
+            joined, left = alive - self._alive, self._alive - alive
+            self._alive = alive
+            self._ring = HashRing(alive, self._replicas_per_node)
+            logger.info("Cluster membership changed (joined: %s, left: %s), %s nodes.", sorted(joined),
+                        sorted(left), len(alive))
+            self._rebalance()
+
+    def _rebalance(self):
+        # Caller must hold self._membership
+        self._retry_handover = False
+        ring = self._ring
+        with self._lock:
+            outgoing = collections.defaultdict(list)
+            for key in self._owned:
+                owner = ring.owner(f"{key[0]}/{key[1]}")
+                if owner != self.node:
+                    outgoing[owner].append(key)
+            promoted = [record for key, record in self._replicas.items()
+                        if ring.owner(f"{key[0]}/{key[1]}") == self.node]
+        for owner, keys in outgoing.items():
+            try:
+                self._request(owner, "POST", "/cluster/handover", {"node": self.node,
+                                                                   "windows": [self._record(key) for key in keys]})
+            except ClusterError as e:
+                logger.warning("Handover to %s failed, keeping %s windows: %s", owner, len(keys), e)
+                self._retry_handover = True
+                continue
+            with self._lock:
+                self._owned.difference_update(keys)
+            for key in keys:
+                self._registry.get(*key).cancel_timer()  # The new owner armed the remaining time
+            self._counts["handed_over"] += len(keys)
+        for record in promoted:
+            if self._restore(record):
+                self._counts["promoted"] += 1
+        with self._lock:
+            owned = list(self._owned)
+        # Read outside self._lock: reading a window takes its lock, which is held while the listener waits for ours
+        records = {key: self._record(key) for key in owned}  # Their backup may have changed
+        with self._wakeup:
+            for key in list(self._replicas):
+                if self.node not in ring.owners(f"{key[0]}/{key[1]}", 2):
+                    del self._replicas[key]
+            for key, record in records.items():
+                self._outgoing.setdefault(key, record)  # A record queued by the listener meanwhile is newer
+            self._wakeup.notify()
+
+    def _run_heartbeat(self):
+        while not self._stopped.wait(self._heartbeat):
+            self._ping_all()
+            if self._retry_handover:
+                with self._membership:
+                    self._rebalance()
+
+    def _run_replication(self):
+        while not self._stopped.is_set():
+            with self._wakeup:
+                while not self._outgoing and not self._stopped.is_set():
+                    self._wakeup.wait()
+            self._flush_replication()
+
+    def _flush_replication(self):
+        with self._lock:
+            outgoing, self._outgoing = self._outgoing, {}
+        ring = self._ring
+        batches = collections.defaultdict(list)
+        for key, record in outgoing.items():
+            owners = ring.owners(f"{key[0]}/{key[1]}", 2)
+            if len(owners) == 2 and owners[0] == self.node:
+                batches[owners[1]].append(record)
+        for backup, records in batches.items():
+            try:
+                self._request(backup, "POST", "/cluster/replicate", {"node": self.node, "windows": records})
+            except ClusterError as e:
+                logger.warning("Replication to %s failed: %s", backup, e)
+                continue
+            self._counts["replicated"] += len(records)
+
+    def stats(self) -> dict:
+        with self._lock:
+            owned = list(self._owned)
+            replicas = len(self._replicas)
+        armed = sum(1 for key in owned if self._registry.get(*key).deadline is not None)
+        return {"node": self.node, "nodes": list(self.nodes), "owned": len(owned), "armed": armed,
+                "replicas": replicas, **self._counts}
+
+    def __repr__(self) -> str:
+        return f"Cluster(node={self.node!r}, nodes={len(self.nodes)})"
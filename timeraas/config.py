@@ -0,0 +1,101 @@
+import os
+from typing import NamedTuple
+
+
+class Config(NamedTuple):
+    """Settings of a timeraas app, read from the environment by ``from_env``.
+
+    The defaults match an unconfigured environment, except that ``log_file``
+    is None: an app built from a plain Config leaves logging alone, so tests
+    and embedding code keep their own handlers.
+    """
+    webhook_url: str = None
+    debug: bool = False
+    room_floors: str = ""
+    journal_path: str = None
+    history_size: int = 256
+    fritzbox_url: str = None
+    fritzbox_user: str = ""
+    fritzbox_password: str = ""
+    fritzbox_devices: str = ""
+    fritzbox_poll_min: float = 2.0
+    fritzbox_poll_max: float = 30.0
+    timer_duration: int = 600
+    tilted_duration: int = None  # None means three times the timer duration
+    escalation_schedules: str = ""
+    debounce_window: float = 0.0
+    ingest_chunk_size: int = 500
+    notifier_workers: int = 2
+    notifier_queue_size: int = 1000
+    notifier_digest_window: float = 0.0
+    notifier_rate: float = 2.5
+    dedupe_capacity: int = 10000
+    event_buffer_size: int = 1024
+    state_backend: str = "local"  # "sqlite" shares window state between the worker processes
+    state_path: str = "timeraas.db"
+    state_poll_interval: float = 0.25
+    cluster_node: str = None  # Base URL of this node; enables cluster mode
+    cluster_peers: str = ""
+    cluster_heartbeat: float = 1.0
+    udp_host: str = "0.0.0.0"
+    udp_port: int = None  # Enables the binary datagram listener
+    udp_windows: str = ""
+    admin_token: str = None  # Enables the /admin endpoints for requests carrying it as a bearer token
+    slow_call_capacity: int = 20
+    slow_call_window: float = 300.0
+    log_file: str = None
+    log_format: str = "text"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_rotate_interval: float = 86400.0
+
+    @classmethod
+    def from_env(cls, environ=None) -> "Config":
+        """Reads the settings from environment variables, ``os.environ`` by default."""
+        env = os.environ if environ is None else environ
+        timer_duration = int(env.get("TIMER_DURATION", "600"))
+        return cls(
+            webhook_url=env.get("DISCORD_WEBHOOK_URL"),
+            debug=bool(int(env.get("DEBUG_MODE", "0"))),
+            room_floors=env.get("ROOM_FLOORS", ""),
+            journal_path=env.get("JOURNAL_PATH") or None,
+            history_size=int(env.get("HISTORY_SIZE", "256")),
+            fritzbox_url=env.get("FRITZBOX_URL") or None,
+            fritzbox_user=env.get("FRITZBOX_USER", ""),
+            fritzbox_password=env.get("FRITZBOX_PASSWORD", ""),
+            fritzbox_devices=env.get("FRITZBOX_DEVICES", ""),
+            fritzbox_poll_min=float(env.get("FRITZBOX_POLL_MIN", "2")),
+            fritzbox_poll_max=float(env.get("FRITZBOX_POLL_MAX", "30")),
+            timer_duration=timer_duration,
+            tilted_duration=int(env.get("TILTED_DURATION", str(3 * timer_duration))),
+            escalation_schedules=env.get("ESCALATION_SCHEDULES", ""),
+            debounce_window=float(env.get("DEBOUNCE_WINDOW", "0")),
+            notifier_workers=int(env.get("NOTIFIER_WORKERS", "2")),
+            notifier_queue_size=int(env.get("NOTIFIER_QUEUE_SIZE", "1000")),
+            notifier_digest_window=float(env.get("NOTIFIER_DIGEST_WINDOW", "0")),
+            notifier_rate=float(env.get("NOTIFIER_RATE", "2.5")),
+            dedupe_capacity=int(env.get("DEDUPE_CAPACITY", "10000")),
+            event_buffer_size=int(env.get("EVENT_BUFFER_SIZE", "1024")),
+            state_backend=env.get("STATE_BACKEND", "local"),
+            state_path=env.get("STATE_PATH", "timeraas.db"),
+            state_poll_interval=float(env.get("STATE_POLL_INTERVAL", "0.25")),
+            cluster_node=env.get("CLUSTER_NODE") or None,
+            cluster_peers=env.get("CLUSTER_PEERS", ""),
+            cluster_heartbeat=float(env.get("CLUSTER_HEARTBEAT", "1")),
+            udp_host=env.get("UDP_HOST", "0.0.0.0"),
+            udp_port=int(env["UDP_PORT"]) if env.get("UDP_PORT") else None,
+            udp_windows=env.get("UDP_WINDOWS", ""),
+            admin_token=env.get("ADMIN_TOKEN") or None,
+            slow_call_capacity=int(env.get("SLOW_CALL_CAPACITY", "20")),
+            slow_call_window=float(env.get("SLOW_CALL_WINDOW", "300")),
+            log_file=env.get("LOG_FILE", "timeraas.log"),
+            log_format=env.get("LOG_FORMAT", "text"),
+            log_max_bytes=int(env.get("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            log_backup_count=int(env.get("LOG_BACKUP_COUNT", "5")),
+            log_rotate_interval=float(env.get("LOG_ROTATE_INTERVAL", "86400")),
+        )
+
+    @property
+    def tilted_timer_duration(self) -> int:
+        """Seconds a window may stay tilted, defaulting to three times the timer duration."""
+        return 3 * self.timer_duration if self.tilted_duration is None else self.tilted_duration
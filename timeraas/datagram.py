@@ -0,0 +1,194 @@
+"""Binary UDP ingest for sensor gateways forwarding many contact events.
+
+A datagram is a 4 byte header followed by any number of fixed-size records,
+all in network byte order::
+
+    header  2s  magic b"TW"
+            B   format version (1)
+            x   reserved
+    record  I   window id, mapped to room/window by UDP_WINDOWS
+            B   WindowStatus value (1 OPEN, 2 TILTED, 3 CLOSED)
+            3x  reserved
+            I   sequence number of the sensor, for dropping retries and reordered events
+            d   timestamp in seconds since the epoch, only used to order the records of a batch
+
+Datagrams are received into one preallocated buffer and their records are
+unpacked straight from a memoryview of it, so receiving copies nothing per
+packet. Everything the socket has queued is drained and applied as one
+batch through the same path as ``POST /home/events``, so deduplication,
+debouncing and escalation behave exactly like for HTTP updates. There is
+no authentication; only expose the port to the gateways' network.
+"""
+import logging
+import select
+import socket
+import struct
+import threading
+
+from timeraas.ingest import ACCEPTED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TW"
+VERSION = 1
+HEADER = struct.Struct("!2sBx")
+RECORD = struct.Struct("!IB3xId")
+MAX_DATAGRAM = 65507
+STATUSES = {status.value: status for status in ACCEPTED_STATUSES}
+
+
+def encode(records) -> bytes:
+    """Encodes (window id, status, sequence, timestamp) records into one datagram.
+
+    ``status`` is a WindowStatus or its value. A datagram of more than
+    ``(1472 - 4) // 20 = 73`` records is fragmented on an Ethernet link.
+    """
+    records = list(records)
+    buffer = bytearray(HEADER.size + RECORD.size * len(records))
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION)
+    for index, (window_id, status, sequence, timestamp) in enumerate(records):
+        RECORD.pack_into(buffer, HEADER.size + index * RECORD.size, window_id, getattr(status, "value", status),
+                         sequence, timestamp)
+    if len(buffer) > MAX_DATAGRAM:
+        raise ValueError(f"At most {(MAX_DATAGRAM - HEADER.size) // RECORD.size} records fit into a datagram.")
+    return bytes(buffer)
+
+
+def decode(datagram: memoryview):
+    """Returns an iterator of (window id, status value, sequence, timestamp) unpacked in place from ``datagram``.
+
+    Raises ValueError if the header or the length does not match the format.
+    """
+    if len(datagram) < HEADER.size:
+        raise ValueError("Datagram is shorter than its header.")
+    magic, version = HEADER.unpack_from(datagram)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unknown datagram format {bytes(magic)!r} version {version}.")
+    if (len(datagram) - HEADER.size) % RECORD.size:
+        raise ValueError(f"Datagram length {len(datagram)} is not a whole number of records.")
+    return RECORD.iter_unpack(datagram[HEADER.size:])
+
+
+def parse_window_ids(spec: str) -> dict:
+    """Parses an ``id=room/window,id=room/window`` string into a mapping of window ids to (room, window)."""
+    windows = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        window_id, _, location = entry.partition("=")
+        room, _, window = location.partition("/")
+        if not window_id.strip().isdigit() or not room.strip():
+            raise ValueError(f"Invalid window id entry '{entry}'. Expected 'id=room/window'.")
+        windows[int(window_id)] = (room.strip(), window.strip() or "window")
+    return windows
+
+
+class DatagramListener:
+    """Receives binary status records on a UDP socket and applies them in batches.
+
+    ``apply_events(events)`` is called with the event dicts of up to
+    ``batch_datagrams`` datagrams at a time; it is ``Services.apply_events``
+    in the app.
+    """
+
+    def __init__(self, host: str, port: int, windows: dict, apply_events, batch_datagrams: int = 64,
+                 receive_buffer: int = 1 << 20):
+        if batch_datagrams < 1:
+            raise ValueError("Batch size must be a positive number of datagrams.")
+        self._windows = dict(windows)
+        self._apply_events = apply_events
+        self._batch_datagrams = batch_datagrams
+        self._socket = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)  # Absorbs bursts
+        self._socket.bind((host, port))
+        self._socket.setblocking(False)
+        self._buffer = bytearray(MAX_DATAGRAM)
+        self._view = memoryview(self._buffer)
+        self._stats = {"datagrams": 0, "records": 0, "applied": 0, "dropped": 0, "malformed": 0,
+                       "unknown_windows": 0, "invalid": 0}
+        self._stopped = threading.Event()
+        self._wakeup, self._wakeup_sender = socket.socketpair()  # Interrupts select() on stop()
+        self._thread = None
+
+    @property
+    def address(self) -> tuple:
+        """Bound (host, port), so port 0 can be used to pick a free port."""
+        return self._socket.getsockname()[:2]
+
+    def start(self):
+        """Starts the receive thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="timeraas-datagram", daemon=True)
+            self._thread.start()
+            logger.info("Listening for status datagrams on %s:%s", *self.address)
+
+    def stop(self):
+        """Stops the receive thread and closes the socket."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup_sender.send(b"\0")
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._socket.close()
+        self._wakeup.close()
+        self._wakeup_sender.close()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([self._socket, self._wakeup], [], [])
+            if self._socket not in readable:
+                continue
+            try:
+                self.apply(self._drain())
+            except OSError as e:
+                logger.error("Failed to receive status datagrams: %s", e)
+            except Exception as e:
+                logger.error("Failed to apply status datagrams: %s", e)
+
+    def _drain(self) -> list:
+        """Decodes the datagrams queued on the socket, up to the batch size."""
+        events = []
+        for _ in range(self._batch_datagrams):
+            try:
+                size = self._socket.recv_into(self._buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            self.decode_into(self._view[:size], events)
+        return events
+
+    def decode_into(self, datagram: memoryview, events: list):
+        """Appends the events of one datagram to ``events``, counting malformed datagrams and unknown windows."""
+        self._stats["datagrams"] += 1
+        try:
+            records = decode(datagram)
+        except ValueError as e:
+            self._stats["malformed"] += 1
+            logger.debug("Dropped status datagram: %s", e)
+            return
+        windows = self._windows
+        for window_id, status, sequence, timestamp in records:
+            self._stats["records"] += 1
+            location = windows.get(window_id)
+            if location is None:
+                self._stats["unknown_windows"] += 1
+                continue
+            events.append({"room": location[0], "window": location[1], "status": STATUSES.get(status),
+                           "seq": sequence, "timestamp": timestamp})
+
+    def apply(self, events: list):
+        """Applies decoded events as one batch."""
+        if not events:
+            return
+        for result in self._apply_events(events):
+            if "error" in result:
+                self._stats["invalid"] += 1
+            elif "dropped" in result:
+                self._stats["dropped"] += 1
+            else:
+                self._stats["applied"] += 1
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def __repr__(self) -> str:
+        return f"DatagramListener(address={self.address}, windows={len(self._windows)})"
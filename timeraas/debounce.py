@@ -0,0 +1,161 @@
+import logging
+import threading
+
+from timeraas.clock import SYSTEM_CLOCK, Clock
+from timeraas.manager import Transition, WindowManager, validate_timing
+from timeraas.metrics import REGISTRY
+from timeraas.scheduler import TimerScheduler, default_scheduler
+from timeraas.window import WindowStatus
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_SUPPRESSED = REGISTRY.counter("timeraas_debounce_suppressed_total",
+                                       "Sensor events absorbed by the debouncer without a status change.")
+
+
+class _Settling:
+    """Window inside its hysteresis window, remembering the last status reported during it."""
+
+    __slots__ = ("manager", "quiet_at", "status", "duration", "callback", "on_settle", "deferred", "timer")
+
+    def __init__(self, manager: WindowManager, quiet_at: float):
+        self.manager = manager
+        self.quiet_at = quiet_at
+        self.status = None
+        self.duration = None
+        self.callback = None
+        self.on_settle = None
+        self.deferred = 0
+        self.timer = None
+
+
+class Debouncer:
+    """Collapses bursts of sensor events into single effective transitions.
+
+    The first status change of a quiet window is applied at once and opens a
+    hysteresis window of ``hold`` seconds. Events arriving during it only
+    remember the latest status and push the end of the window back, so a
+    bouncing contact keeps it open. Once the window has been quiet for
+    ``hold`` seconds, the remembered status is applied if it differs from the
+    current one, and every other event of the burst is counted as suppressed.
+    A ``hold`` of 0 passes every event straight through.
+    """
+
+    def __init__(self, hold: float = 0.0, scheduler: TimerScheduler = None, lock_stripes: int = 64,
+                 clock: Clock = None):
+        if hold < 0:
+            raise ValueError("Hold must be a non-negative number of seconds.")
+        if not isinstance(lock_stripes, int) or lock_stripes <= 0:
+            raise ValueError("Lock stripes must be a positive integer.")
+        self._hold = hold
+        self._scheduler = scheduler
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
+        self._settling = {}  # Window index -> _Settling
+        self._suppressed = {}  # Window index -> suppressed events, only for windows that ever bounced
+        self._total = 0
+        self._total_lock = threading.Lock()
+        # Held while deciding and applying, so the events of a window are applied in order
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    @property
+    def hold(self) -> float:
+        return self._hold
+
+    @property
+    def scheduler(self) -> TimerScheduler:
+        if self._scheduler is None:
+            self._scheduler = default_scheduler()
+        return self._scheduler
+
+    def apply(self, manager: WindowManager, new_status: WindowStatus, duration, callback=None,
+              on_settle=None) -> Transition:
+        """Applies or defers a status change, see ``apply_many``."""
+        return self.apply_many(manager, [new_status], duration, callback, on_settle)[0]
+
+    def apply_many(self, manager: WindowManager, statuses: list, duration, callback=None,
+                   on_settle=None) -> list:
+        """Applies status changes in order, deferring those that arrive within the hysteresis window.
+
+        Returns one Transition per status; deferred events get a ``suppressed``
+        transition reporting the current status. ``on_settle(transition)`` is
+        called with the transition applied when a hysteresis window ends.
+        """
+        validate_timing(duration)
+        if callback and not callable(callback):
+            raise ValueError("Callback must be a callable function.")
+        if self._hold == 0:
+            return manager.apply_many(statuses, duration, callback)
+
+        index = manager.window.index
+        transitions = []
+        with self._locks[index % len(self._locks)]:
+            for status in statuses:
+                settling = self._settling.get(index)
+                if settling is None:
+                    transition = manager.apply(status, duration, callback)
+                    if transition.previous != transition.status:
+                        self._open(index, manager)
+                    transitions.append(transition)
+                    continue
+                settling.quiet_at = self._clock.monotonic() + self._hold
+                settling.status = status
+                settling.duration = duration
+                settling.callback = callback
+                settling.on_settle = on_settle
+                settling.deferred += 1
+                current = manager.status
+                transitions.append(Transition(current, current, suppressed=True))
+        return transitions
+
+    def _open(self, index: int, manager: WindowManager):
+        # Caller must hold the lock of the window
+        settling = _Settling(manager, self._clock.monotonic() + self._hold)
+        self._settling[index] = settling
+        settling.timer = self.scheduler.schedule(self._hold, self._settle, index)
+
+    def _settle(self, index: int):
+        with self._locks[index % len(self._locks)]:
+            settling = self._settling.get(index)
+            if settling is None:
+                return
+            remaining = settling.quiet_at - self._clock.monotonic()
+            if remaining > 0:
+                # Events arrived since the timer was armed; wait until the window has been quiet for hold seconds
+                settling.timer = self.scheduler.schedule(remaining, self._settle, index)
+                return
+            del self._settling[index]
+            transition = None
+            suppressed = settling.deferred
+            if settling.status is not None and settling.status != settling.manager.status:
+                transition = settling.manager.apply(settling.status, settling.duration, settling.callback)
+                suppressed -= 1
+                # The settled change opens a new hysteresis window, so a flapping contact changes at most once per hold
+                self._open(index, settling.manager)
+            if suppressed:
+                self._suppressed[index] = self._suppressed.get(index, 0) + suppressed
+                with self._total_lock:
+                    self._total += suppressed
+                DEBOUNCE_SUPPRESSED.inc(suppressed)
+                logger.debug("Suppressed %s bouncing events of %s", suppressed, settling.manager.window)
+        if transition is not None and settling.on_settle is not None:
+            try:
+                settling.on_settle(transition)
+            except Exception as e:
+                logger.error("Debounce settle handler failed: %s", e)
+
+    def suppressed(self, manager: WindowManager = None) -> int:
+        """Number of events suppressed for the window, or for all windows if none is given."""
+        if manager is None:
+            return self._total
+        return self._suppressed.get(manager.window.index, 0)
+
+    @property
+    def settling(self) -> int:
+        """Number of windows currently inside their hysteresis window."""
+        return len(self._settling)
+
+    def stats(self) -> dict:
+        return {"hold": self._hold, "settling": self.settling, "suppressed": self._total}
+
+    def __repr__(self) -> str:
+        return f"Debouncer(hold={self._hold}, settling={self.settling}, suppressed={self._total})"
@@ -0,0 +1,99 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from timeraas.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE = "duplicate"
+OUT_OF_ORDER = "out_of_order"
+
+EVENTS_DROPPED = {
+    reason: REGISTRY.counter("timeraas_events_dropped_total", "Sensor events dropped before being applied.",
+                             labels={"reason": reason})
+    for reason in (DUPLICATE, OUT_OF_ORDER)
+}
+
+
+class EventDeduplicator:
+    """Drops retried and out-of-order sensor events using bounded LRU caches.
+
+    Events may carry an ``id`` and a per-sensor ``seq`` number. Ids are keyed
+    by window, but all windows share one cache of the last ``capacity`` ids,
+    so a few busy windows can evict the ids of quiet ones and a late retry to
+    a quiet window is then applied again. Size ``capacity`` for the id traffic
+    of all windows within the longest retry delay. The highest sequence
+    number is kept for the last ``capacity`` windows. An event whose id was
+    seen before is a duplicate, one whose sequence number is not above the
+    highest seen is out of order. A sequence number more than ``restart_gap``
+    below the highest one is taken as a restarted sensor and accepted. The
+    least recently used entries are evicted, so memory stays fixed.
+    """
+
+    def __init__(self, capacity: int = 10000, restart_gap: int = 1000):
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("Capacity must be a positive integer.")
+        if not isinstance(restart_gap, int) or restart_gap <= 0:
+            raise ValueError("Restart gap must be a positive integer.")
+        self._capacity = capacity
+        self._restart_gap = restart_gap
+        self._ids = OrderedDict()  # (room, window, id) -> None
+        self._sequences = OrderedDict()  # (room, window) -> highest sequence number
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._dropped = {DUPLICATE: 0, OUT_OF_ORDER: 0}
+
+    def check(self, room: str, window: str, event_id=None, sequence: int = None):
+        """Records an event and returns the reason to drop it, or None if it should be applied."""
+        if event_id is None and sequence is None:
+            return None
+        with self._lock:
+            reason = None
+            id_key = (room, window, event_id)
+            if event_id is not None and id_key in self._ids:
+                self._ids.move_to_end(id_key)
+                reason = DUPLICATE
+            elif sequence is not None:
+                highest = self._sequences.get((room, window))
+                if highest is not None and highest - self._restart_gap <= sequence <= highest:
+                    reason = DUPLICATE if sequence == highest else OUT_OF_ORDER
+                else:
+                    self._remember(self._sequences, (room, window), sequence)
+            if reason is None and event_id is not None:
+                self._remember(self._ids, id_key, None)
+            if reason is not None:
+                self._dropped[reason] += 1
+        if reason is not None:
+            EVENTS_DROPPED[reason].inc()
+            logger.debug("Dropped %s event for %s/%s", reason, room, window)
+        return reason
+
+    def _remember(self, cache: OrderedDict, key, value):
+        # Caller must hold self._lock
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > self._capacity:
+            cache.popitem(last=False)
+            self._evicted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"ids": len(self._ids), "sensors": len(self._sequences), "evicted": self._evicted,
+                    "duplicates": self._dropped[DUPLICATE], "out_of_order": self._dropped[OUT_OF_ORDER]}
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._sequences)
+
+    def __repr__(self) -> str:
+        return f"EventDeduplicator(capacity={self._capacity}, entries={len(self)})"
+
+
+def event_key(payload: dict) -> tuple:
+    """Returns the (id, seq) of an event payload, raising ValueError if either is malformed."""
+    event_id, sequence = payload.get("id"), payload.get("seq")
+    if event_id is not None and (not isinstance(event_id, (str, int)) or isinstance(event_id, bool)):
+        raise ValueError("Event id must be a string or an integer.")
+    if sequence is not None and (not isinstance(sequence, int) or isinstance(sequence, bool) or sequence < 0):
+        raise ValueError("Sequence number must be a non-negative integer.")
+    return event_id, sequence
@@ -0,0 +1,134 @@
+from typing import NamedTuple
+
+from timeraas.messages import ESCALATION_MESSAGES, EXPIRED_MESSAGES, TILTED_MESSAGES
+from timeraas.window import WindowStatus
+
+
+class Stage(NamedTuple):
+    """One reminder of an escalation schedule.
+
+    ``after`` is the number of seconds since the window was opened or tilted.
+    ``mention`` is prepended to the message, e.g. ``<@&role id>`` to notify a
+    Discord role from this stage on.
+    """
+    after: float
+    messages: tuple = tuple(EXPIRED_MESSAGES)
+    mention: str = None
+
+    def format(self, message: str) -> str:
+        return f"{self.mention} {message}" if self.mention else message
+
+
+def _validate(stages) -> tuple:
+    stages = tuple(stages)
+    previous = 0
+    for stage in stages:
+        if stage.after <= previous:
+            raise ValueError("Escalation stages must be positive and strictly increasing.")
+        if not stage.messages:
+            raise ValueError("Every escalation stage needs at least one message.")
+        previous = stage.after
+    return stages
+
+
+class EscalationSchedule:
+    """Reminder stages of a room, one sequence for open and one for tilted windows.
+
+    A window only ever has its next stage armed; when it fires the following
+    stage is scheduled relative to it.
+    """
+
+    __slots__ = ("_open", "_tilted")
+
+    def __init__(self, open_stages, tilted_stages=()):
+        self._open = _validate(open_stages)
+        self._tilted = _validate(tilted_stages)
+
+    @classmethod
+    def single(cls, duration: float, tilted_duration: float = None) -> "EscalationSchedule":
+        """Schedule with one reminder, the behavior of a plain timer duration."""
+        tilted = (Stage(tilted_duration, tuple(TILTED_MESSAGES)),) if tilted_duration else ()
+        return cls((Stage(duration),), tilted)
+
+    @property
+    def open(self) -> tuple:
+        return self._open
+
+    @property
+    def tilted(self) -> tuple:
+        return self._tilted
+
+    def stages(self, status: WindowStatus) -> tuple:
+        """Stages armed for a window entering ``status``; closed windows have none."""
+        if status == WindowStatus.OPEN:
+            return self._open
+        if status == WindowStatus.TILTED:
+            return self._tilted
+        return ()
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, EscalationSchedule) and (self._open, self._tilted) == (other._open, other._tilted)
+
+    def __repr__(self) -> str:
+        return f"EscalationSchedule(open={[s.after for s in self._open]}, tilted={[s.after for s in self._tilted]})"
+
+
+class Escalation:
+    """Escalation schedules per room with a default for every other room."""
+
+    def __init__(self, default: EscalationSchedule, rooms: dict = None):
+        self._default = default
+        self._rooms = dict(rooms or {})
+
+    @property
+    def default(self) -> EscalationSchedule:
+        return self._default
+
+    def schedule(self, room: str) -> EscalationSchedule:
+        """Returns the schedule configured for the room, or the default schedule."""
+        return self._rooms.get(room, self._default)
+
+    def __repr__(self) -> str:
+        return f"Escalation(default={self._default!r}, rooms={sorted(self._rooms)})"
+
+
+def _parse_stages(entry: str, stages: str, default_messages: tuple) -> tuple:
+    parsed = []
+    for number, token in enumerate(filter(None, (part.strip() for part in stages.split(",")))):
+        after, _, mention = token.partition("@")
+        try:
+            after = float(after)
+        except ValueError:
+            raise ValueError(f"Invalid stage '{token}' in escalation entry '{entry}'.")
+        messages = default_messages if number == 0 else tuple(ESCALATION_MESSAGES)
+        parsed.append(Stage(after, messages, mention.strip() or None))
+    return tuple(parsed)
+
+
+def parse_escalation(spec: str, duration: float, tilted_duration: float = None) -> Escalation:
+    """Parses an ``ESCALATION_SCHEDULES`` string into an Escalation.
+
+    Entries are separated by ``;`` and read ``key=seconds[@mention],...``.
+    ``*`` sets the default for open windows and ``*/tilted`` for tilted ones;
+    ``room`` and ``room/tilted`` override them for one room. Without entries
+    every room gets one reminder after ``duration`` seconds, and tilted
+    windows one after ``tilted_duration`` seconds, if given.
+    """
+    default = EscalationSchedule.single(duration, tilted_duration)
+    open_stages, tilted_stages = {"*": default.open}, {"*": default.tilted}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        key, separator, stages = entry.partition("=")
+        key = key.strip()
+        if not separator or not key:
+            raise ValueError(f"Invalid escalation entry '{entry}'. Expected 'room=seconds,seconds'.")
+        room, _, status = key.partition("/")
+        if status not in ("", "tilted"):
+            raise ValueError(f"Invalid status '{status}' in escalation entry '{entry}'.")
+        target, messages = (tilted_stages, TILTED_MESSAGES) if status else (open_stages, EXPIRED_MESSAGES)
+        target[room] = _parse_stages(entry, stages, tuple(messages))
+
+    default = EscalationSchedule(open_stages["*"], tilted_stages["*"])
+    rooms = {}
+    for room in (set(open_stages) | set(tilted_stages)) - {"*"}:
+        rooms[room] = EscalationSchedule(open_stages.get(room, default.open), tilted_stages.get(room, default.tilted))
+    return Escalation(default, rooms)
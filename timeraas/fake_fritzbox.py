@@ -0,0 +1,117 @@
+"""Local stand-in for the Fritz!Box AHA HTTP interface, for tests and benchmarks."""
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from timeraas.fritzbox import INVALID_SID, challenge_response
+
+
+class FakeFritzBox:
+    """Serves ``login_sid.lua`` and ``getdevicelistinfos`` for a set of simulated DECT 350 sensors."""
+
+    def __init__(self, username: str = "timeraas", password: str = "secret", host: str = "127.0.0.1", port: int = 0):
+        self.username = username
+        self.password = password
+        self.devices = {}  # AIN -> [name, alert state]
+        self.requests = []  # (path, switchcmd) of every request served
+        self.valid_sids = set()
+        self._challenge = f"2$10${os.urandom(8).hex()}$10${os.urandom(8).hex()}"
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_device(self, ain: str, name: str, state: int = 0):
+        with self._lock:
+            self.devices[ain] = [name, state]
+
+    def set_state(self, ain: str, state: int):
+        with self._lock:
+            self.devices[ain][1] = state
+
+    def expire_sessions(self):
+        """Invalidates every session id, like the box does after inactivity."""
+        with self._lock:
+            self.valid_sids.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), name="fake-fritzbox",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _session_info(self, sid: str) -> bytes:
+        return (f"<?xml version=\"1.0\" encoding=\"utf-8\"?><SessionInfo><SID>{sid}</SID>"
+                f"<Challenge>{self._challenge}</Challenge><BlockTime>0</BlockTime></SessionInfo>").encode()
+
+    def _device_list(self) -> bytes:
+        with self._lock:
+            devices = "".join(
+                f"<device identifier=\"{ain}\" functionbitmask=\"16\" productname=\"FRITZ!DECT 350\">"
+                f"<present>1</present><name>{name}</name><alert><state>{state}</state></alert></device>"
+                for ain, (name, state) in self.devices.items())
+        return f"<devicelist version=\"1\">{devices}</devicelist>".encode()
+
+    def _handler(self):
+        box = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with box._lock:
+                    box.requests.append((url.path, query.get("switchcmd")))
+                if url.path == "/login_sid.lua":
+                    self._reply(200, box._session_info(INVALID_SID))
+                elif url.path == "/webservices/homeautoswitch.lua":
+                    if query.get("sid") not in box.valid_sids:
+                        self._reply(403, b"")
+                    elif query.get("switchcmd") == "getdevicelistinfos":
+                        self._reply(200, box._device_list())
+                    else:
+                        self._reply(400, b"")
+                else:
+                    self._reply(404, b"")
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+                with box._lock:
+                    box.requests.append((url.path, None))
+                sid = INVALID_SID
+                if (url.path == "/login_sid.lua" and form.get("username") == box.username
+                        and form.get("response") == challenge_response(box._challenge, box.password)):
+                    sid = os.urandom(8).hex()
+                    with box._lock:
+                        box.valid_sids.add(sid)
+                self._reply(200, box._session_info(sid))
+
+        return Handler
@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from timeraas.window import WindowStatus
+
+logger = logging.getLogger(__name__)
+
+INVALID_SID = "0000000000000000"
+
+
+class FritzBoxError(Exception):
+    """Raised when the Fritz!Box rejects a login or returns an unusable response."""
+
+
+def challenge_response(challenge: str, password: str) -> str:
+    """Computes the login response for a PBKDF2 (``2$...``) or legacy MD5 challenge."""
+    if challenge.startswith("2$"):
+        _, iterations1, salt1, iterations2, salt2 = challenge.split("$")
+        hash1 = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt1), int(iterations1))
+        hash2 = hashlib.pbkdf2_hmac("sha256", hash1, bytes.fromhex(salt2), int(iterations2))
+        return f"{salt2}${hash2.hex()}"
+    digest = hashlib.md5(f"{challenge}-{password}".encode("utf-16-le")).hexdigest()
+    return f"{challenge}-{digest}"
+
+
+class FritzBoxClient:
+    """Client for the Fritz!Box AHA HTTP interface with a pooled session and a cached session id."""
+
+    def __init__(self, base_url: str, username: str, password: str, timeout: float = 10.0,
+                 session: requests.Session = None):
+        self._base_url = base_url.rstrip("/")
+        self._username = username
+        self._password = password
+        self._timeout = timeout
+        self._session = session if session is not None else self._build_session()
+        self._sid = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def sid(self) -> str:
+        return self._sid
+
+    def login(self) -> str:
+        """Performs the challenge-response login and caches the session id."""
+        url = f"{self._base_url}/login_sid.lua"
+        info = ElementTree.fromstring(self._session.get(url, params={"version": "2"}, timeout=self._timeout).content)
+        challenge = info.findtext("Challenge")
+        if not challenge:
+            raise FritzBoxError("Fritz!Box did not send a login challenge.")
+        response = self._session.post(url, data={"username": self._username,
+                                                 "response": challenge_response(challenge, self._password)},
+                                      params={"version": "2"}, timeout=self._timeout)
+        sid = ElementTree.fromstring(response.content).findtext("SID")
+        if not sid or sid == INVALID_SID:
+            raise FritzBoxError("Fritz!Box login failed.")
+        self._sid = sid
+        logger.info("Logged in to the Fritz!Box.")
+        return sid
+
+    def _command(self, switchcmd: str) -> bytes:
+        with self._lock:
+            for attempt in range(2):
+                if self._sid is None:
+                    self.login()
+                response = self._session.get(f"{self._base_url}/webservices/homeautoswitch.lua",
+                                             params={"switchcmd": switchcmd, "sid": self._sid}, timeout=self._timeout)
+                if response.status_code == 403 and attempt == 0:
+                    # The cached session expired, log in again once
+                    self._sid = None
+                    continue
+                response.raise_for_status()
+                return response.content
+
+    def device_states(self) -> dict:
+        """Fetches every device with one ``getdevicelistinfos`` call.
+
+        Returns a mapping of AIN to (device name, alert state) where the alert
+        state is 1 for an open contact, 0 for closed and None if the device has
+        no contact sensor or is not present.
+        """
+        devices = {}
+        for device in ElementTree.fromstring(self._command("getdevicelistinfos")).iter("device"):
+            ain = device.get("identifier", "").replace(" ", "")
+            state = device.findtext("alert/state")
+            present = device.findtext("present", "1") == "1"
+            devices[ain] = (device.findtext("name", ""), int(state) if state not in (None, "") and present else None)
+        return devices
+
+    def close(self):
+        self._session.close()
+
+
+def parse_device_map(spec: str) -> dict:
+    """Parses an ``ain=room/window,ain=room/window`` string into a mapping of AINs to (room, window)."""
+    devices = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        ain, _, location = entry.partition("=")
+        room, _, window = location.partition("/")
+        if not ain or not room:
+            raise ValueError(f"Invalid device entry '{entry}'. Expected 'ain=room/window'.")
+        devices[ain.replace(" ", "")] = (room.strip(), window.strip() or "window")
+    return devices
+
+
+class FritzBoxPoller:
+    """Polls all contact sensors in bulk and feeds only the changed windows into the registry.
+
+    The poll interval drops to ``min_interval`` after a change and backs off
+    towards ``max_interval`` while nothing changes. In cluster mode,
+    ``owns(room, window)`` limits the diff to the windows this node owns; the
+    local status of other windows is stale, so they would be reported again on
+    every poll.
+    """
+
+    def __init__(self, client: FritzBoxClient, registry, apply_events, devices: dict = None,
+                 min_interval: float = 2.0, max_interval: float = 30.0, backoff: float = 1.5, owns=None):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("Poll intervals must be positive with min_interval <= max_interval.")
+        self._client = client
+        self._registry = registry
+        self._apply_events = apply_events
+        self._devices = dict(devices or {})
+        self._owns = owns
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._interval = min_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def interval(self) -> float:
+        """Current poll interval in seconds."""
+        return self._interval
+
+    def location(self, ain: str, name: str) -> tuple:
+        """Maps a device to (room, window) via the configured devices or its ``room/window`` name."""
+        if ain in self._devices:
+            return self._devices[ain]
+        room, _, window = name.partition("/")
+        return room.strip() or ain, window.strip() or "window"
+
+    def poll(self) -> list:
+        """Runs one poll cycle and applies the changed windows. Returns the applied events."""
+        events = []
+        now = time.time()
+        for ain, (name, state) in self._client.device_states().items():
+            if state is None:
+                continue
+            room, window = self.location(ain, name)
+            if self._owns is not None and not self._owns(room, window):
+                continue  # The owning node polls it
+            status = WindowStatus.OPEN if state == 1 else WindowStatus.CLOSED
+            manager = self._registry.get(room, window)
+            current = manager.status if manager is not None else WindowStatus.CLOSED
+            if status != current:
+                events.append({"room": room, "window": window, "status": status.name, "timestamp": now})
+        if events:
+            self._apply_events(events)
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._max_interval, self._interval * self._backoff)
+        return events
+
+    def start(self):
+        """Starts polling on a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="timeraas-fritzbox", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the polling thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                changes = self.poll()
+                if changes:
+                    logger.info("Fritz!Box poll applied %s changes.", len(changes))
+            except (requests.RequestException, FritzBoxError, ElementTree.ParseError) as e:
+                logger.error("Fritz!Box poll failed: %s", e)
+                self._interval = self._max_interval
+            self._stop.wait(self._interval)
+
+    def __repr__(self) -> str:
+        return f"FritzBoxPoller(interval={self._interval}, devices={len(self._devices)})"
@@ -0,0 +1,79 @@
+from array import array
+
+from timeraas.window import WindowStatus
+
+_STATUSES = {status.value: status for status in WindowStatus}
+
+
+class TransitionHistory:
+    """Bounded ring buffer of (timestamp, WindowStatus) transitions.
+
+    Timestamps are kept in an ``array('d')`` and statuses as their enum values in
+    an ``array('B')``, about 9 bytes per transition. The arrays grow on demand
+    up to ``capacity`` and then overwrite the oldest entry. Timestamps never
+    decrease, so ranges are located by binary search.
+    """
+
+    __slots__ = ("_capacity", "_times", "_states", "_start")
+
+    def __init__(self, capacity: int = 256):
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("Capacity must be a positive integer.")
+        self._capacity = capacity
+        self._times = array('d')
+        self._states = array('B')
+        self._start = 0  # Physical index of the oldest entry once the buffer is full
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def _physical(self, index: int) -> int:
+        return (self._start + index) % len(self._times)
+
+    def append(self, timestamp: float, status: WindowStatus):
+        """Records a transition, dropping the oldest one when the buffer is full."""
+        if self._times:
+            # Keep the buffer sorted even if the wall clock stepped backwards
+            timestamp = max(timestamp, self._times[self._physical(len(self._times) - 1)])
+        if len(self._times) < self._capacity:
+            self._times.append(timestamp)
+            self._states.append(status.value)
+        else:
+            self._times[self._start] = timestamp
+            self._states[self._start] = status.value
+            self._start = (self._start + 1) % self._capacity
+
+    def bisect(self, timestamp: float) -> int:
+        """Returns the logical index of the first transition at or after ``timestamp``."""
+        low, high = 0, len(self._times)
+        while low < high:
+            middle = (low + high) // 2
+            if self._times[self._physical(middle)] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def since(self, timestamp: float = None, limit: int = None) -> list:
+        """Returns the (timestamp, WindowStatus) transitions at or after ``timestamp``, oldest first."""
+        first = 0 if timestamp is None else self.bisect(timestamp)
+        last = len(self._times) if limit is None else min(len(self._times), first + limit)
+        return [self[index] for index in range(first, last)]
+
+    def __getitem__(self, index: int) -> tuple:
+        if index < 0:
+            index += len(self._times)
+        if not 0 <= index < len(self._times):
+            raise IndexError("Transition index out of range.")
+        physical = self._physical(index)
+        return self._times[physical], _STATUSES[self._states[physical]]
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self._times)))
+
+    def __repr__(self) -> str:
+        return f"TransitionHistory(capacity={self._capacity}, transitions={len(self._times)})"
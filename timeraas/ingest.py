@@ -0,0 +1,92 @@
+import functools
+
+from timeraas.dedupe import event_key
+from timeraas.escalation import Escalation
+from timeraas.window import WindowStatus
+
+ACCEPTED_STATUSES = {WindowStatus.OPEN, WindowStatus.TILTED, WindowStatus.CLOSED}
+INVALID_STATUS_ERROR = 'Invalid status value. Must be "OPEN", "TILTED" or "CLOSED"'
+
+
+def validate_status(new_status):
+    """Validates if the provided status is a recognized WindowStatus."""
+    if isinstance(new_status, WindowStatus):
+        return new_status  # Decoded from a binary record, no name lookup needed
+    try:
+        return WindowStatus[new_status]
+    except (KeyError, TypeError):
+        return None
+
+
+def apply_events(registry, events, duration, expiry_callback, report=None, debouncer=None,
+                 deduplicator=None) -> list:
+    """Validates and applies a batch of status events, returning one result per event in input order.
+
+    Events are grouped per window and applied in timestamp order with one lock
+    acquisition per window. The ``timestamp`` of an event is only an ordering
+    key: history, analytics, debouncing and timer deadlines all use the time
+    the event is applied, so a sensor clock never shortens or extends a timer.
+    ``duration`` is a timer duration, an
+    EscalationSchedule or an Escalation resolving the schedule of each room.
+    ``expiry_callback(location)`` builds the timer callback for a window and
+    ``report(location, transition)`` is called for every applied transition.
+    With a ``debouncer``, events inside a window's hysteresis window are
+    deferred and reported once they settle. With a ``deduplicator``, events
+    whose ``id`` or ``seq`` was already seen are dropped and reported with the
+    window's current status.
+    """
+    results = [None] * len(events)
+    pending = {}  # (room, window) -> [(timestamp, index, status, event id, sequence number)]
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            results[index] = {"error": "Event must be an object."}
+            continue
+        room, window, timestamp = event.get('room'), event.get('window'), event.get('timestamp', 0)
+        validated_status = validate_status(event.get('status'))
+        if validated_status is None or validated_status not in ACCEPTED_STATUSES:
+            results[index] = {"error": INVALID_STATUS_ERROR}
+        elif not isinstance(room, str) or not isinstance(window, str) or not window:
+            results[index] = {"error": "Event must name a room and a window."}
+        elif not isinstance(timestamp, (int, float)) or isinstance(timestamp, bool):
+            results[index] = {"error": "Timestamp must be a number."}
+        else:
+            try:
+                event_id, sequence = event_key(event)
+            except ValueError as e:
+                results[index] = {"error": str(e)}
+                continue
+            pending.setdefault((room, window), []).append((timestamp, index, validated_status, event_id, sequence))
+
+    for (room, window), window_events in pending.items():
+        try:
+            window_manager = registry.get_or_create(room, window)
+        except ValueError as e:
+            for window_event in window_events:
+                results[window_event[1]] = {"error": str(e)}
+            continue
+        window_events.sort(key=lambda window_event: (window_event[0], window_event[1]))
+        dropped = []
+        if deduplicator is not None:
+            accepted = []
+            for window_event in window_events:
+                reason = deduplicator.check(room, window, window_event[3], window_event[4])
+                (accepted if reason is None else dropped).append((window_event, reason))
+            window_events = [window_event for window_event, _ in accepted]
+        location = f"{room}/{window}"
+        statuses = [window_event[2] for window_event in window_events]
+        timing = duration.schedule(room) if isinstance(duration, Escalation) else duration
+        if not statuses:
+            transitions = []
+        elif debouncer is None:
+            transitions = window_manager.apply_many(statuses, timing, expiry_callback(location))
+        else:
+            on_settle = functools.partial(report, location) if report is not None else None
+            transitions = debouncer.apply_many(window_manager, statuses, timing, expiry_callback(location),
+                                               on_settle)
+        for window_event, transition in zip(window_events, transitions):
+            if report is not None:
+                report(location, transition)
+            results[window_event[1]] = {"status": transition.status.name}
+        for window_event, reason in dropped:
+            results[window_event[1]] = {"status": window_manager.status.name, "dropped": reason}
+    return results
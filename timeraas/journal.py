@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from timeraas.window import WindowStatus
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """Append-only journal of window state with periodic compact snapshots.
+
+    Every status change, expiry and restore is appended as one JSON line. A
+    background thread group-commits the buffered records with a single write and
+    fsync every ``flush_interval`` seconds. Once ``compact_every`` records have
+    been written the latest state of every window is saved to the snapshot file
+    and the journal is truncated, so recovery reads at most one snapshot of size
+    proportional to the number of windows plus ``compact_every`` journal lines.
+    """
+
+    def __init__(self, path: str, snapshot_path: str = None, flush_interval: float = 0.05,
+                 compact_every: int = 10000):
+        if flush_interval <= 0:
+            raise ValueError("Flush interval must be a positive number of seconds.")
+        if not isinstance(compact_every, int) or compact_every <= 0:
+            raise ValueError("Compact interval must be a positive integer.")
+        self._path = path
+        self._snapshot_path = snapshot_path or f"{path}.snapshot"
+        self._flush_interval = flush_interval
+        self._compact_every = compact_every
+        self._state = self.load()  # (room, window) -> latest record
+        self._buffer = []
+        self._since_snapshot = self._count_lines()
+        self._file = open(self._path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()  # Serializes file writes between the flusher and flush()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="timeraas-journal", daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def snapshot_path(self) -> str:
+        return self._snapshot_path
+
+    def state(self) -> dict:
+        """Returns the latest recorded state per (room, window)."""
+        with self._lock:
+            return dict(self._state)
+
+    def record(self, room: str, window: str, status: WindowStatus, deadline: float = None, expired: bool = False,
+               stage: int = 0, timestamp: float = None):
+        """Buffers one state record; it is written by the next group commit.
+
+        ``timestamp`` is when the change happened, which lets the journal be replayed.
+        """
+        entry = {"room": room, "window": window, "status": status.name, "deadline": deadline, "expired": expired,
+                 "stage": stage}
+        if timestamp is not None:
+            entry["timestamp"] = timestamp
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Journal has been closed.")
+            self._state[(room, window)] = entry
+            self._buffer.append(entry)
+            self._wakeup.notify()
+
+    def listener(self, manager, event):
+        """WindowManager listener journaling every event of the manager's window."""
+        self.record(manager.window.location.name, manager.name, event.status, event.deadline, event.expired,
+                    event.stage, event.timestamp)
+
+    def flush(self):
+        """Writes and fsyncs all buffered records on the calling thread."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                self._since_snapshot += len(batch)
+                snapshot = dict(self._state) if self._since_snapshot >= self._compact_every else None
+                if snapshot is not None:
+                    self._since_snapshot = 0
+            if batch:
+                self._file.write("".join(json.dumps(entry) + "\n" for entry in batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            if snapshot is not None:
+                self._compact(snapshot)
+
+    def compact(self):
+        """Writes a snapshot of the current state and truncates the journal."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                snapshot = dict(self._state)
+                self._since_snapshot = 0
+            self._compact(snapshot)
+
+    def _compact(self, snapshot: dict):
+        # Caller must hold self._write_lock. Records replayed on top of the snapshot
+        # only overwrite state, so a crash between the two steps is harmless.
+        temp_path = f"{self._snapshot_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as snapshot_file:
+            json.dump({"windows": list(snapshot.values())}, snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, self._snapshot_path)
+        self._file.truncate(0)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        logger.info("Journal compacted into snapshot with %s windows.", len(snapshot))
+
+    def close(self):
+        """Flushes outstanding records and stops the group-commit thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+            # Give concurrent writers a moment to join this commit
+            time.sleep(self._flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error("Failed to write journal: %s", e)
+
+    def _count_lines(self) -> int:
+        if not os.path.exists(self._path):
+            return 0
+        with open(self._path, "rb") as journal_file:
+            return sum(1 for _ in journal_file)
+
+    def load(self) -> dict:
+        """Reads the snapshot and replays the journal on top of it."""
+        state = {}
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, encoding="utf-8") as snapshot_file:
+                for entry in json.load(snapshot_file).get("windows", []):
+                    state[(entry["room"], entry["window"])] = entry
+        if os.path.exists(self._path):
+            with open(self._path, encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning("Skipping torn journal record.")
+                        continue
+                    state[(entry["room"], entry["window"])] = entry
+        return state
+
+    def __repr__(self) -> str:
+        return f"Journal(path={self._path!r}, windows={len(self._state)})"
+
+
+def recover(registry, journal: Journal, expiry_callback, escalation=None) -> int:
+    """Rebuilds the registry's WindowManagers from the journal and re-arms timers with their remaining time.
+
+    ``expiry_callback(location)`` builds the timer callback for a window. With
+    an ``escalation``, the next stage of each room's schedule is re-armed.
+    Timers whose deadline passed while the service was down fire right away.
+    Returns the number of restored windows.
+    """
+    restored = 0
+    for (room, window), entry in journal.state().items():
+        try:
+            restore_entry(registry, room, window, entry, expiry_callback, escalation)
+        except (KeyError, ValueError) as e:
+            logger.warning("Skipping unrecoverable journal entry for %s/%s: %s", room, window, e)
+            continue
+        restored += 1
+    logger.info("Recovered %s windows from the journal.", restored)
+    return restored
+
+
+def restore_entry(registry, room: str, window: str, entry: dict, expiry_callback, escalation=None):
+    """Restores one window from a state record like those of ``Journal.state`` and re-arms its timer.
+
+    Raises KeyError or ValueError for a record that cannot be restored.
+    """
+    status = WindowStatus[entry["status"]]
+    manager = registry.get_or_create(room, window)
+    deadline, remaining = entry.get("deadline"), None
+    if deadline is not None and status != WindowStatus.CLOSED:
+        remaining = deadline - registry.table.clock.time()
+    stages = escalation.schedule(room).stages(status) if escalation is not None else None
+    manager.restore(status, remaining, entry.get("expired", False), expiry_callback(f"{room}/{window}"),
+                    stages, entry.get("stage", 0))
+    return manager
@@ -0,0 +1,97 @@
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates the log file when it exceeds ``maxBytes`` or when ``interval`` seconds have passed."""
+
+    def __init__(self, filename, maxBytes: int = 0, backupCount: int = 0, interval: float = 0, encoding=None):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval > 0 else None
+
+    def shouldRollover(self, record) -> bool:
+        if self.rollover_at is not None and record.created >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        if self.rollover_at is not None:
+            self.rollover_at = time.time() + self.interval
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The standard QueueHandler formats every record on the calling thread so
+    it can be pickled; records here never leave the process.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class PipelineListener(logging.handlers.QueueListener):
+    """QueueListener whose ``stop`` may be called more than once."""
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(logger_name: str = "timeraas", level: int = logging.INFO, path: str = "timeraas.log",
+                      json_format: bool = False, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                      rotate_interval: float = 86400, console: bool = True) -> PipelineListener:
+    """Routes the logger through a queue so formatting and file I/O happen on a background listener thread.
+
+    The logger only gets a QueueHandler; the console and the rotating file
+    handler run on the returned QueueListener, which has to be stopped on
+    shutdown to flush the remaining records. Calling this again replaces the
+    previous pipeline instead of adding more handlers.
+    """
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(level)
+    for handler in list(logger.handlers):
+        if getattr(handler, "timeraas_pipeline", False):
+            logger.removeHandler(handler)
+            handler.listener.stop()
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if path:
+        handlers.append(SizeAndTimeRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                       interval=rotate_interval, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    listener = PipelineListener(records, *handlers, respect_handler_level=True)
+    queue_handler = DeferredQueueHandler(records)
+    queue_handler.timeraas_pipeline = True
+    queue_handler.listener = listener
+    logger.addHandler(queue_handler)
+    listener.start()
+    return listener
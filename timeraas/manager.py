@@ -1,27 +1,187 @@
-import threading
+import logging
+from typing import NamedTuple
 
-from timeraas.window import Window
+from timeraas.escalation import EscalationSchedule
+from timeraas.history import TransitionHistory
+from timeraas.metrics import TIMER_EXPIRY_LAG
+from timeraas.scheduler import TimerScheduler, default_scheduler
+from timeraas.table import NO_DEADLINE
+from timeraas.window import Window, WindowStatus
+
+logger = logging.getLogger(__name__)
+
+
+class Transition(NamedTuple):
+    """Outcome of applying a status change to a window."""
+    previous: WindowStatus
+    status: WindowStatus
+    timer_started: bool = False
+    timer_cancelled: bool = False
+    was_expired: bool = False
+    suppressed: bool = False  # Event absorbed by a Debouncer, the status is unchanged
+
+
+class WindowEvent(NamedTuple):
+    """Change reported to WindowManager listeners.
+
+    ``kind`` is ``"status"`` for an applied status change, ``"expired"`` when the
+    timer fired and ``"restored"`` after state was recovered. ``deadline`` is the
+    wall-clock time the armed timer fires at, or None. ``stage`` counts the
+    escalation stages fired since the window was opened or tilted.
+    """
+    kind: str
+    previous: WindowStatus
+    status: WindowStatus
+    deadline: float
+    expired: bool
+    timestamp: float
+    stage: int = 0
+
+
+def validate_timing(duration):
+    """Raises ValueError unless ``duration`` is a positive integer or an EscalationSchedule."""
+    if isinstance(duration, EscalationSchedule):
+        return
+    if not isinstance(duration, int) or duration <= 0:
+        raise ValueError("Duration must be a positive integer.")
 
 
 class WindowManager:
-    def __init__(self, window: Window):
+    """View managing the timer of one WindowTable row.
+
+    All state lives in the table, so views are cheap and created on demand;
+    ``view`` hands out the live view of a row if one is still referenced.
+    """
+
+    __slots__ = ("_table", "_index", "_window", "_scheduler", "_lock", "__weakref__")
+
+    def __init__(self, window: Window, scheduler: TimerScheduler = None, listeners=None, history_size: int = None):
         self._window = window
-        self._timer = None
-        self._timer_expired = False
-        self._lock = threading.Lock()  # Lock for thread safety
+        self._table = window.table
+        self._index = window.index
+        self._scheduler = scheduler if scheduler is not None else self._table.scheduler or default_scheduler()
+        self._lock = self._table.lock(self._index)
+        if listeners:
+            self._table.window_listeners.setdefault(self._index, []).extend(listeners)
+        if history_size is not None and self._index not in self._table.histories:
+            self._table.histories[self._index] = TransitionHistory(history_size)
+
+    @classmethod
+    def view(cls, table, index: int) -> "WindowManager":
+        """Returns the view of a table row, reusing the live one if it exists."""
+        manager = table.views.get(index)
+        if manager is None:
+            # Two threads may race to create a view; both are valid since all state lives in the table
+            manager = table.views[index] = cls(Window(None, table, index))
+        return manager
 
     @property
     def window(self) -> Window:
         """Read-only access to the associated Window."""
         return self._window
 
-    def _on_timer_expire(self, callback):
-        """Handles the timer expiration event and executes the callback."""
+    @property
+    def scheduler(self) -> TimerScheduler:
+        """The scheduler the timer deadlines are registered with."""
+        return self._scheduler
+
+    @property
+    def name(self) -> str:
+        """Id of the window within its room, if the manager was created by a registry."""
+        return self._table.name(self._index)
+
+    @property
+    def deadline(self):
+        """Wall-clock time at which the armed timer fires, or None."""
+        deadline = self._table.deadlines[self._index]
+        return None if deadline != deadline else deadline  # NaN marks an unarmed timer
+
+    @property
+    def _deadline(self):
+        return self.deadline
+
+    @_deadline.setter
+    def _deadline(self, deadline):
+        self._table.deadlines[self._index] = NO_DEADLINE if deadline is None else deadline
+
+    @property
+    def _timer(self):
+        return self._table.timers[self._index]
+
+    @_timer.setter
+    def _timer(self, handle):
+        self._table.timers[self._index] = handle
+
+    @property
+    def _timer_expired(self) -> bool:
+        return bool(self._table.expired[self._index])
+
+    @_timer_expired.setter
+    def _timer_expired(self, expired: bool):
+        self._table.expired[self._index] = 1 if expired else 0
+
+    @property
+    def stage(self) -> int:
+        """Escalation stages fired since the window was opened or tilted."""
+        return self._table.stages[self._index]
+
+    @property
+    def _history(self) -> TransitionHistory:
+        return self._table.history(self._index)
+
+    def history(self, since: float = None, limit: int = None) -> list:
+        """Returns recorded (timestamp, WindowStatus) transitions at or after ``since``, oldest first."""
+        with self._lock:
+            history = self._table.histories.get(self._index)
+            return history.since(since, limit) if history is not None else []
+
+    def add_listener(self, listener):
+        """Registers ``listener(manager, event)`` to be called with every WindowEvent of this window."""
+        self._table.window_listeners.setdefault(self._index, []).append(listener)
+
+    def _emit(self, kind: str, previous: WindowStatus):
+        # Caller must hold self._lock so listeners see the events of one window in order
+        listeners = self._table.listeners
+        own = self._table.window_listeners.get(self._index)
+        if own:
+            listeners = listeners + own
+        if not listeners:
+            return
+        event = WindowEvent(kind, previous, self._window.status, self.deadline, self._timer_expired, self._table.clock.time(),
+                            self._table.stages[self._index])
+        for listener in listeners:
+            try:
+                listener(self, event)
+            except Exception as e:
+                logger.error("Window listener failed: %s", e)
+
+    def _on_timer_expire(self, callback, stages: tuple = None, stage: int = 0, timer: list = None):
+        """Handles the timer expiration event, arms the next escalation stage and executes the callback.
+
+        Plain timers call ``callback()``, escalation stages ``callback(stage)``
+        with the Stage that fired. ``timer`` holds the handle of the firing
+        timer; the expiry is ignored if the window no longer has that timer.
+        """
         with self._lock:
+            if timer is not None and self._timer is not timer[0]:
+                return  # Cancelled or replaced after the scheduler had already taken it out
+            deadline = self.deadline
+            if deadline is not None:
+                TIMER_EXPIRY_LAG.observe(max(0.0, self._table.clock.time() - deadline))
             self._timer_expired = True
-            if callback and callable(callback):
-                callback()
             self._timer = None
+            self._deadline = None
+            if stages is not None:
+                self._table.stages[self._index] = stage + 1
+                if stage + 1 < len(stages):
+                    self._arm_stage(stages, stage + 1, callback, deadline)
+            self._emit("expired", self._window.status)
+        # Run the callback outside the lock so a slow callback never blocks status reads or cancel_timer
+        if callback and callable(callback):
+            if stages is not None:
+                callback(stages[stage])
+            else:
+                callback()
 
     def start_timer(self, duration: int, callback=None):
         """Starts a timer for the specified duration in seconds with an optional callback."""
@@ -31,19 +191,126 @@ class WindowManager:
             raise ValueError("Callback must be a callable function.")
 
         with self._lock:
-            if self._timer is not None:
-                self._timer.cancel()
-            self._timer_expired = False
-            self._timer = threading.Timer(duration, self._on_timer_expire, [callback])
-            self._timer.start()
+            self._arm(duration, callback)
 
     def cancel_timer(self):
         """Cancels the active timer, if any, and resets timer expiration status."""
         with self._lock:
-            if self._timer is not None:
-                self._timer.cancel()
-                self._timer = None
-            self._timer_expired = False
+            self._disarm()
+
+    def _arm(self, duration, callback):
+        # Caller must hold self._lock
+        if self._timer is not None:
+            self._scheduler.cancel(self._timer)
+        self._timer_expired = False
+        self._table.stages[self._index] = 0
+        self._schedule(duration, callback)
+        self._deadline = self._table.clock.time() + duration
+
+    def _schedule(self, delay: float, callback, stages: tuple = None, stage: int = 0):
+        # Caller must hold self._lock, so the expiry cannot run before its handle is in the cell
+        timer = []
+        self._timer = self._scheduler.schedule(delay, self._on_timer_expire, callback, stages, stage, timer)
+        timer.append(self._timer)
+
+    def _arm_stage(self, stages: tuple, stage: int, callback, previous_deadline: float = None):
+        # Caller must hold self._lock. Only the next stage is ever armed; it is due relative to the
+        # previous stage's deadline so late firing does not push back the rest of the schedule.
+        now = self._table.clock.time()
+        if stage == 0 or previous_deadline is None:
+            deadline = now + stages[stage].after - (stages[stage - 1].after if stage else 0)
+        else:
+            deadline = previous_deadline + stages[stage].after - stages[stage - 1].after
+        if self._timer is not None:
+            self._scheduler.cancel(self._timer)
+        self._schedule(max(0.0, deadline - now), callback, stages, stage)
+        self._deadline = deadline
+
+    def _disarm(self):
+        # Caller must hold self._lock
+        if self._timer is not None:
+            self._scheduler.cancel(self._timer)
+            self._timer = None
+        self._timer_expired = False
+        self._table.stages[self._index] = 0
+        self._deadline = None
+
+    def _apply(self, new_status: WindowStatus, duration, callback) -> Transition:
+        # Caller must hold self._lock
+        previous = self._window.status
+        transition = Transition(previous, new_status)
+        if previous != new_status and new_status == WindowStatus.CLOSED:
+            transition = transition._replace(timer_cancelled=True, was_expired=self._timer_expired)
+            self._disarm()
+        elif previous != new_status:
+            # Switching between open and tilted restarts the schedule but keeps an alert that was already sent
+            reported = previous != WindowStatus.CLOSED and self._timer_expired
+            if isinstance(duration, EscalationSchedule):
+                self._disarm()
+                stages = duration.stages(new_status)
+                if stages:
+                    self._arm_stage(stages, 0, callback)
+            else:
+                self._arm(duration, callback)
+            self._timer_expired = reported
+            transition = transition._replace(timer_started=self._timer is not None)
+        self._window.status = new_status
+        if previous != new_status:
+            self._history.append(self._table.clock.time(), new_status)
+        self._emit("status", previous)
+        return transition
+
+    def apply(self, new_status: WindowStatus, duration, callback=None) -> Transition:
+        """Applies a status change, arming the timer on open or tilt and cancelling it on close.
+
+        ``duration`` is either the seconds until a single ``callback()`` or an
+        EscalationSchedule whose stages call ``callback(stage)`` one after another.
+        """
+        return self.apply_many([new_status], duration, callback)[0]
+
+    def apply_many(self, statuses: list, duration, callback=None) -> list:
+        """Applies several status changes in order under a single lock acquisition."""
+        validate_timing(duration)
+        if callback and not callable(callback):
+            raise ValueError("Callback must be a callable function.")
+
+        backend = self._table.backend
+        if backend is None:
+            with self._lock:
+                return [self._apply(status, duration, callback) for status in statuses]
+        with backend.transaction(self):
+            with self._lock:
+                return [self._apply(status, duration, callback) for status in statuses]
+
+    def restore(self, status: WindowStatus, remaining: float = None, expired: bool = False, callback=None,
+                stages: tuple = None, stage: int = 0):
+        """Restores recovered state, re-arming the timer with the ``remaining`` seconds if it had not fired.
+
+        With escalation ``stages``, ``stage`` is the number of stages that had
+        already fired and ``remaining`` the time until the next one.
+        """
+        if callback and not callable(callback):
+            raise ValueError("Callback must be a callable function.")
+
+        with self._lock:
+            previous = self._window.status
+            self._disarm()
+            self._window.status = status
+            if previous != status:
+                self._history.append(self._table.clock.time(), status)
+            if expired:
+                self._timer_expired = True
+            if stages is not None:
+                self._table.stages[self._index] = min(stage, len(stages))
+                if remaining is not None and stage < len(stages):
+                    remaining = max(0.0, remaining)
+                    self._schedule(remaining, callback, stages, stage)
+                    self._deadline = self._table.clock.time() + remaining
+            elif remaining is not None and not expired:
+                remaining = max(0.0, remaining)
+                self._schedule(remaining, callback)
+                self._deadline = self._table.clock.time() + remaining
+            self._emit("restored", previous)
 
     @property
     def status(self):
@@ -0,0 +1,18 @@
+EXPIRED_MESSAGES = [
+    "Ich bin noch auf! 😱",
+    "Mir wird kalt! 🥶",
+    "Hier steigt gleich jemand ein! 🦹"
+]
+
+CLOSED_AGAIN_MESSAGE = "Bin wieder zu, danke! 😊"
+
+ESCALATION_MESSAGES = [
+    "Ich bin immer noch auf! 🥶🥶",
+    "Hallo?! Hier zieht es seit einer Ewigkeit! 🌬️",
+    "Bitte mach mich endlich zu! 🙏"
+]
+
+TILTED_MESSAGES = [
+    "Ich bin schon lange gekippt! 🪟",
+    "Gekippt ist auch offen! 🥶"
+]
@@ -0,0 +1,305 @@
+"""Prometheus metrics recorded into per-thread shards so the hot path never contends on a shared lock."""
+import bisect
+import functools
+import math
+import threading
+import time
+
+from timeraas.window import WindowStatus
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOCK_WAIT_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)
+
+
+class _Shards:
+    """Per-thread value arrays. A thread only ever writes its own shard, so updates need no lock.
+
+    Shards of threads that have finished are folded into a retired total when
+    the next thread registers, so a thread-per-request server does not grow
+    the shard list without bound.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Only taken when a thread registers its shard or on scrape
+        self._live = []  # (thread, shard)
+        self._retired = [0] * size
+
+    def get(self) -> list:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._register()
+        return shard
+
+    def _register(self) -> list:
+        shard = [0] * self._size
+        with self._lock:
+            live = []
+            for thread, other in self._live:
+                if thread.is_alive():
+                    live.append((thread, other))
+                else:
+                    for i, value in enumerate(other):
+                        self._retired[i] += value
+            live.append((threading.current_thread(), shard))
+            self._live = live
+        self._local.shard = shard
+        return shard
+
+    def total(self) -> list:
+        with self._lock:
+            totals = list(self._retired)
+            shards = [shard for _, shard in self._live]
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: dict = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = dict(labels or {})
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1):
+        self._shards.get()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._shards.total()[0]
+
+    def samples(self) -> list:
+        return [(self.name, self.labels, self.value)]
+
+
+class Histogram:
+    """Distribution of observed values over fixed upper bounds."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=LATENCY_BUCKETS, labels: dict = None):
+        if list(buckets) != sorted(buckets) or not buckets:
+            raise ValueError("Buckets must be a non-empty sorted sequence.")
+        self.name = name
+        self.documentation = documentation
+        self.labels = dict(labels or {})
+        self.buckets = tuple(float(bound) for bound in buckets)
+        # Layout per shard: one count per bucket, the +Inf bucket, then sum and count
+        self._shards = _Shards(len(self.buckets) + 3)
+
+    def observe(self, value: float):
+        shard = self._shards.get()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def time(self):
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return self._shards.total()[-1]
+
+    @property
+    def sum(self) -> float:
+        return self._shards.total()[-2]
+
+    def samples(self) -> list:
+        totals = self._shards.total()
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), totals):
+            cumulative += count
+            samples.append((f"{self.name}_bucket", {**self.labels, "le": bound}, cumulative))
+        samples.append((f"{self.name}_sum", self.labels, totals[-2]))
+        samples.append((f"{self.name}_count", self.labels, totals[-1]))
+        return samples
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+def timed(histogram: Histogram):
+    """Decorator observing the duration of every call in ``histogram``."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class Gauge:
+    """Value computed by ``function()`` when the metrics are scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function, labels: dict = None):
+        if not callable(function):
+            raise ValueError("Gauge function must be callable.")
+        self.name = name
+        self.documentation = documentation
+        self.labels = dict(labels or {})
+        self.function = function
+
+    @property
+    def value(self) -> float:
+        return self.function()
+
+    def samples(self) -> list:
+        return [(self.name, self.labels, self.value)]
+
+
+class TimedLock:
+    """Lock recording how long each acquisition had to wait.
+
+    An uncontended acquisition is recorded as zero without reading the clock.
+    """
+
+    __slots__ = ("_lock", "_histogram")
+
+    def __init__(self, histogram: Histogram):
+        self._lock = threading.Lock()
+        self._histogram = histogram
+
+    def acquire(self) -> bool:
+        if self._lock.acquire(False):
+            # Zero always lands in the first bucket and adds nothing to the sum
+            shard = self._histogram._shards.get()
+            shard[0] += 1
+            shard[-1] += 1
+        else:
+            start = time.perf_counter()
+            self._lock.acquire()
+            self._histogram.observe(time.perf_counter() - start)
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+class MetricsRegistry:
+    """Collects metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}  # (name, sorted labels) -> metric
+        self._lock = threading.Lock()
+
+    def _register(self, metric, replace: bool = False):
+        key = (metric.name, tuple(sorted(metric.labels.items())))
+        with self._lock:
+            existing = self._metrics.get(key)
+            if existing is not None and not replace:
+                if existing.kind != metric.kind:
+                    raise ValueError(f"Metric '{metric.name}' is already registered as a {existing.kind}.")
+                return existing
+            self._metrics[key] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: dict = None) -> Counter:
+        """Returns the counter with the given name and labels, creating it on first use."""
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, buckets=LATENCY_BUCKETS, labels: dict = None) -> Histogram:
+        """Returns the histogram with the given name and labels, creating it on first use."""
+        return self._register(Histogram(name, documentation, buckets, labels))
+
+    def gauge(self, name: str, documentation: str, function, labels: dict = None) -> Gauge:
+        """Registers a gauge evaluated on every scrape, replacing an earlier one with the same name and labels."""
+        return self._register(Gauge(name, documentation, function, labels), replace=True)
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format, grouped by metric name."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        families = {}
+        for metric in metrics:
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, members in families.items():
+            lines.append(f"# HELP {name} {members[0].documentation}")
+            lines.append(f"# TYPE {name} {members[0].kind}")
+            for metric in members:
+                for sample_name, labels, value in metric.samples():
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = _format_value(value) if isinstance(value, float) else str(value)
+        value = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f"{key}=\"{value}\"")
+    return "{" + ",".join(pairs) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = {
+    endpoint: REGISTRY.histogram("timeraas_request_duration_seconds", "Time spent handling a request.",
+                                 labels={"endpoint": endpoint})
+    for endpoint in ("update_window_status", "ingest_events")
+}
+TIMER_EXPIRY_LAG = REGISTRY.histogram("timeraas_timer_expiry_lag_seconds",
+                                      "Time between a timer's deadline and the moment it fired.")
+WINDOW_LOCK_WAIT = REGISTRY.histogram("timeraas_window_lock_wait_seconds",
+                                      "Time spent waiting to acquire a WindowManager lock.", LOCK_WAIT_BUCKETS)
+DISCORD_SEND_LATENCY = REGISTRY.histogram("timeraas_discord_send_duration_seconds",
+                                          "Time to deliver a message to Discord, including retries.")
+DISCORD_SENT = REGISTRY.counter("timeraas_discord_sent_total", "Messages delivered to Discord.")
+DISCORD_FAILURES = REGISTRY.counter("timeraas_discord_failures_total", "Messages that could not be delivered.")
+
+
+def register_window_gauges(registry, notifier=None, metrics: MetricsRegistry = REGISTRY):
+    """Registers the open window, armed timer and queue depth gauges for a WindowRegistry and notifier."""
+    metrics.gauge("timeraas_open_windows", "Windows that are currently open.",
+                  lambda: registry.table.count(WindowStatus.OPEN))
+    metrics.gauge("timeraas_armed_timers", "Windows with an armed expiry timer.", registry.table.armed)
+    metrics.gauge("timeraas_windows", "Windows known to the registry.", lambda: len(registry))
+    if notifier is not None:
+        metrics.gauge("timeraas_notifier_queue_depth", "Messages waiting to be delivered.",
+                      lambda: notifier.stats()["queue_depth"])
@@ -0,0 +1,317 @@
+import logging
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from timeraas.metrics import DISCORD_FAILURES, DISCORD_SEND_LATENCY, DISCORD_SENT
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Sentinel telling a worker to exit
+
+
+class TokenBucket:
+    """Thread-safe token bucket that can additionally be paused by server rate-limit hints."""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0:
+            raise ValueError("Rate must be a positive number of tokens per second.")
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("Capacity must be a positive integer.")
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Takes one token and returns how many seconds the caller has to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def acquire(self):
+        """Blocks until a token is available."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Blocks all token use for the given number of seconds, e.g. after a 429 response."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+
+def retry_after(response) -> float:
+    """Extracts the server requested wait in seconds from a rate-limited response, or None."""
+    for header in ("Retry-After", "X-RateLimit-Reset-After"):
+        value = response.headers.get(header)
+        if value is not None:
+            try:
+                return float(value)
+            except (ValueError, TypeError):
+                pass
+    try:
+        return float(response.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class Notifier:
+    """Delivers webhook messages from a bounded queue using a pool of worker threads.
+
+    Callers enqueue and return immediately; the workers share one persistent
+    ``requests.Session`` so connections are kept alive and pooled. Alerts that
+    arrive within ``digest_window`` seconds of each other are merged into one
+    digest message by a single collector thread before they reach the
+    workers, sends are paced by a token bucket and rate-limited or failed
+    posts are retried with backoff. Messages sent after ``close`` are dropped.
+    """
+
+    def __init__(self, webhook_url: str, workers: int = 2, queue_size: int = 1000, timeout: float = 10.0,
+                 session: requests.Session = None, digest_window: float = 0.0, max_digest: int = 25,
+                 rate: float = 2.5, burst: int = 5, max_retries: int = 5, backoff: float = 1.0):
+        if not isinstance(workers, int) or workers <= 0:
+            raise ValueError("Workers must be a positive integer.")
+        if not isinstance(queue_size, int) or queue_size <= 0:
+            raise ValueError("Queue size must be a positive integer.")
+        if digest_window < 0:
+            raise ValueError("Digest window must not be negative.")
+        self._webhook_url = webhook_url
+        self._worker_count = workers
+        self._timeout = timeout
+        self._digest_window = digest_window
+        self._max_digest = max_digest
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._bucket = TokenBucket(rate, burst)
+        self._queue = queue.Queue(maxsize=queue_size)
+        # (room, message) items for the workers; digests are collected from self._queue into a queue of their own
+        self._deliveries = queue.Queue(maxsize=queue_size) if digest_window > 0 else self._queue
+        self._session = session if session is not None else self._build_session(workers)
+        self._workers = []
+        self._collector = None
+        self._closed = False
+        self._workers_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._sent = 0
+        self._failed = 0
+        self._dropped = 0
+        self._retried = 0
+        self._rate_limited = 0
+        self._coalesced = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    @staticmethod
+    def _build_session(workers: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def webhook_url(self) -> str:
+        return self._webhook_url
+
+    def send(self, message: str, room: str = None) -> bool:
+        """Queues a message for delivery. Returns False if the queue is full or the notifier is closed."""
+        if not self._ensure_workers():
+            with self._stats_lock:
+                self._dropped += 1
+            logger.warning("Notifier is closed, dropping message.")
+            return False
+        try:
+            self._queue.put_nowait((room, message))
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+            logger.warning("Notification queue is full, dropping message.")
+            return False
+        return True
+
+    @staticmethod
+    def format_digest(alerts: list) -> str:
+        """Merges several (room, message) alerts into one message listing all affected rooms."""
+        if len(alerts) == 1:
+            return alerts[0][1]
+        rooms = sorted({room for room, _ in alerts if room})
+        lines = [f"{len(alerts)} Meldungen für {', '.join(rooms) if rooms else 'unbekannte Räume'}:"]
+        lines.extend(f"- {room}: {message}" if room else f"- {message}" for room, message in alerts)
+        return "\n".join(lines)
+
+    def deliver(self, message: str) -> bool:
+        """Posts a message to the webhook on the calling thread, retrying rate limits and transient failures."""
+        start = time.perf_counter()
+        for attempt in range(self._max_retries + 1):
+            self._bucket.acquire()
+            try:
+                response = self._session.post(self._webhook_url, json={"content": message}, timeout=self._timeout)
+                if response.status_code == 429:
+                    wait = retry_after(response)
+                    wait = wait if wait is not None else self._backoff * 2 ** attempt
+                    self._bucket.pause(wait)
+                    with self._stats_lock:
+                        self._rate_limited += 1
+                    logger.warning("Discord rate limit hit, retrying in %.2f seconds.", wait)
+                    continue
+                response.raise_for_status()
+            except requests.RequestException as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if (status is not None and status < 500) or attempt == self._max_retries:
+                    self._record(time.perf_counter() - start, success=False)
+                    logger.error("Failed to send message to Discord: %s", e)
+                    return False
+                with self._stats_lock:
+                    self._retried += 1
+                time.sleep(self._backoff * 2 ** attempt)
+                continue
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                wait = retry_after(response)
+                if wait:
+                    self._bucket.pause(wait)
+            self._record(time.perf_counter() - start, success=True)
+            logger.info("Message delivered successfully to Discord.")
+            return True
+
+        self._record(time.perf_counter() - start, success=False)
+        logger.error("Failed to send message to Discord: still rate limited after retries.")
+        return False
+
+    def _record(self, latency: float, success: bool):
+        DISCORD_SEND_LATENCY.observe(latency)
+        (DISCORD_SENT if success else DISCORD_FAILURES).inc()
+        with self._stats_lock:
+            if success:
+                self._sent += 1
+            else:
+                self._failed += 1
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+
+    def stats(self) -> dict:
+        """Returns queue depth, delivery counters and send latency in seconds."""
+        depth = self._queue.qsize()
+        if self._deliveries is not self._queue:
+            depth += self._deliveries.qsize()
+        with self._stats_lock:
+            attempts = self._sent + self._failed
+            return {
+                "queue_depth": depth,
+                "sent": self._sent,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "retried": self._retried,
+                "rate_limited": self._rate_limited,
+                "coalesced": self._coalesced,
+                "latency_avg": self._latency_total / attempts if attempts else 0.0,
+                "latency_max": self._latency_max,
+            }
+
+    def join(self):
+        """Blocks until every queued message has been processed."""
+        self._queue.join()  # The collector hands a digest to the workers before it marks its alerts done
+        self._deliveries.join()
+
+    def close(self):
+        """Delivers the remaining messages, stops the workers and closes the session."""
+        with self._workers_lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers, self._workers = self._workers, []
+            collector, self._collector = self._collector, None
+        if collector is not None:
+            self._queue.put(_STOP)
+            collector.join()
+        for _ in workers:
+            self._deliveries.put(_STOP)
+        for worker in workers:
+            worker.join()
+        self._session.close()
+
+    def _ensure_workers(self) -> bool:
+        """Starts the workers on first use. Returns False once the notifier is closed."""
+        if self._workers:
+            return True
+        with self._workers_lock:
+            if self._closed:
+                return False
+            if self._workers:
+                return True
+            if self._deliveries is not self._queue:
+                self._collector = threading.Thread(target=self._run_collector, name="timeraas-notifier-digest",
+                                                   daemon=True)
+                self._collector.start()
+            for i in range(self._worker_count):
+                worker = threading.Thread(target=self._run, name=f"timeraas-notifier-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            return True
+
+    def _collect(self, first) -> tuple:
+        """Gathers alerts arriving within the digest window after ``first``. Returns (alerts, stop)."""
+        alerts = [first]
+        deadline = time.monotonic() + self._digest_window
+        while len(alerts) < self._max_digest:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return alerts, True
+            alerts.append(item)
+        return alerts, False
+
+    def _run_collector(self):
+        """Merges queued alerts into digests in one place, so a digest is never split between workers."""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            alerts, stop = [item], False
+            try:
+                alerts, stop = self._collect(item)
+                if len(alerts) > 1:
+                    with self._stats_lock:
+                        self._coalesced += len(alerts) - 1
+                self._deliveries.put((None, self.format_digest(alerts)))
+            except Exception as e:
+                logger.error("Notification digest failed: %s", e)
+            finally:
+                for _ in range(len(alerts) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _run(self):
+        while True:
+            item = self._deliveries.get()
+            try:
+                if item is _STOP:
+                    return
+                self.deliver(item[1])
+            except Exception as e:
+                logger.error("Notification worker failed: %s", e)
+            finally:
+                self._deliveries.task_done()
+
+    def __repr__(self) -> str:
+        return f"Notifier(workers={self._worker_count}, queue_depth={self._queue.qsize()})"
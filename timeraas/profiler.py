@@ -0,0 +1,265 @@
+"""Diagnostics for a live service: an on-demand sampling profiler and an always-on slow call recorder.
+
+The profiler samples the Python stacks of every thread (request handlers,
+the timer wheel, notifier workers, ...) through ``sys._current_frames`` and
+aggregates them into collapsed stacks, the input format of flamegraph.pl and
+speedscope. Nothing is traced, so the profiled code runs at full speed; the
+cost is the sampling thread walking the stacks ``1 / interval`` times a
+second while a profile runs.
+
+The slow call recorder only takes two clock readings per call. Calls still
+running after ``sample_after`` seconds have their stack sampled by a
+watchdog thread, which shows where a slow call was stuck rather than where
+it was started from.
+"""
+import heapq
+import itertools
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+def _label(code, cache: dict) -> str:
+    label = cache.get(code)
+    if label is None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        label = cache[code] = f"{module}.{code.co_qualname}".replace(";", ":")
+    return label
+
+
+def render_collapsed(stacks: dict) -> str:
+    """Renders ``stack -> samples`` as collapsed stacks, one ``frame;frame;... count`` line each."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads at a fixed interval; one profile runs at a time."""
+
+    def __init__(self, max_depth: int = 64):
+        if max_depth < 1:
+            raise ValueError("Maximum depth must be a positive number of frames.")
+        self._max_depth = max_depth
+        self._running = threading.Lock()
+        self._labels = {}  # Code object -> frame label, so steady state sampling formats no strings
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def profile(self, seconds: float, interval: float = 0.005) -> Counter:
+        """Samples for ``seconds`` on the calling thread and returns the sample count per collapsed stack.
+
+        The calling thread itself is left out. Raises RuntimeError if another
+        profile is running.
+        """
+        if seconds <= 0:
+            raise ValueError("Duration must be a positive number of seconds.")
+        if interval < 0.001:
+            raise ValueError("Interval must be at least one millisecond.")
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("A profile is already running.")
+        try:
+            stacks = Counter()
+            own = threading.get_ident()
+            start = time.perf_counter()
+            due = start
+            while due - start < seconds:
+                self._sample(stacks, own)
+                due += interval
+                time.sleep(max(0.0, due - time.perf_counter()))
+            logger.info("Profiled %s threads for %.1f s, %s samples.", threading.active_count(),
+                        time.perf_counter() - start, sum(stacks.values()))
+            return stacks
+        finally:
+            self._running.release()
+
+    def _sample(self, stacks: Counter, own: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None and len(frames) < self._max_depth:
+                frames.append(_label(frame.f_code, self._labels))
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}").replace(";", ":").replace(" ", "_"))
+            stacks[";".join(reversed(frames))] += 1
+
+
+class SlowCall(NamedTuple):
+    name: str
+    started: float  # Seconds since the epoch
+    duration: float
+    thread: str
+    stack: tuple  # "file:line in function" entries, outermost first
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "started": self.started, "duration_ms": round(self.duration * 1000, 3),
+                "thread": self.thread, "stack": list(self.stack)}
+
+
+class _Call:
+    __slots__ = ("recorder", "name", "started", "start", "stack")
+
+    def __init__(self, recorder, name: str):
+        self.recorder = recorder
+        self.name = name
+        self.stack = None  # Set by the watchdog once the call is slow
+
+    def __enter__(self):
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.recorder._inflight.setdefault(threading.get_ident(), []).append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        recorder = self.recorder
+        ident = threading.get_ident()
+        calls = recorder._inflight.get(ident)
+        if calls:
+            calls.pop()
+            if not calls:
+                del recorder._inflight[ident]
+        # Once the oldest kept call has left the window, the floor no longer holds
+        if duration > recorder._floor or self.started + duration >= recorder._floor_expires:
+            recorder._add(self, duration, sys._getframe(1))
+        return False
+
+
+class _NoCall:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_CALL = _NoCall()
+
+
+class SlowCallRecorder:
+    """Keeps the ``capacity`` slowest calls of the last ``window`` seconds with their stacks.
+
+    Wrap a call in ``with recorder.record(name):``; calls may be nested.
+    A capacity of 0 disables recording. The watchdog thread is started with
+    the first recorded call.
+    """
+
+    def __init__(self, capacity: int = 20, window: float = 300.0, sample_after: float = 0.05,
+                 max_depth: int = 64):
+        if capacity < 0:
+            raise ValueError("Capacity must not be negative.")
+        if window <= 0:
+            raise ValueError("Window must be a positive number of seconds.")
+        if sample_after <= 0:
+            raise ValueError("Sample delay must be a positive number of seconds.")
+        self._capacity = capacity
+        self._window = window
+        self._sample_after = sample_after
+        self._max_depth = max_depth
+        self._inflight = {}  # Thread id -> running _Calls, innermost last
+        self._heap = []  # (duration, sequence, SlowCall), the fastest kept call first
+        self._sequence = itertools.count()
+        self._floor = 0.0  # Calls not slower than this cannot enter a full heap; read without the lock
+        self._floor_expires = math.inf  # When the oldest kept call leaves the window and the floor stops holding
+        self._lock = threading.Lock()
+        self._recorded = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def record(self, name: str):
+        """Context manager measuring one call named ``name``."""
+        if not self._capacity:
+            return _NO_CALL
+        if self._thread is None:
+            self._start()
+        return _Call(self, name)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = threading.Thread(target=self._run, name="timeraas-slow-calls", daemon=True)
+                self._thread.start()
+
+    def _stack(self, frame) -> tuple:
+        summary = traceback.StackSummary.extract(traceback.walk_stack(frame), limit=self._max_depth,
+                                                 lookup_lines=False)
+        return tuple(f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in reversed(summary))
+
+    def _add(self, call: _Call, duration: float, frame):
+        stack = call.stack if call.stack is not None else self._stack(frame)
+        entry = SlowCall(call.name, call.started, duration, threading.current_thread().name, stack)
+        with self._lock:
+            self._expire()
+            if len(self._heap) < self._capacity:
+                heapq.heappush(self._heap, (duration, next(self._sequence), entry))
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, (duration, next(self._sequence), entry))
+            else:
+                return
+            self._recorded += 1
+            self._update_floor()
+
+    def _update_floor(self):
+        # Caller must hold self._lock
+        if len(self._heap) < self._capacity:
+            self._floor, self._floor_expires = 0.0, math.inf
+        else:
+            self._floor = self._heap[0][0]
+            self._floor_expires = min(entry.started for _, _, entry in self._heap) + self._window
+
+    def _expire(self):
+        # Caller must hold self._lock
+        horizon = time.time() - self._window
+        if any(entry.started < horizon for _, _, entry in self._heap):
+            self._heap = [item for item in self._heap if item[2].started >= horizon]
+            heapq.heapify(self._heap)
+            self._update_floor()
+
+    def _run(self):
+        while not self._stopped.wait(self._sample_after / 2):
+            if not self._inflight:
+                continue
+            frames, now = None, time.perf_counter()
+            for ident, calls in list(self._inflight.items()):
+                for call in list(calls):
+                    if call.stack is None and now - call.start >= self._sample_after:
+                        frames = frames if frames is not None else sys._current_frames()
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            call.stack = self._stack(frame)
+
+    def calls(self) -> list:
+        """Returns the recorded calls of the last ``window`` seconds, slowest first."""
+        with self._lock:
+            self._expire()
+            return [entry for _, _, entry in sorted(self._heap, reverse=True)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"capacity": self._capacity, "kept": len(self._heap), "recorded": self._recorded,
+                    "running": sum(len(calls) for calls in list(self._inflight.values()))}
+
+    def close(self):
+        """Stops the watchdog thread."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __repr__(self) -> str:
+        return f"SlowCallRecorder(capacity={self._capacity}, kept={len(self._heap)})"
@@ -0,0 +1,88 @@
+import threading
+
+from timeraas.clock import Clock
+from timeraas.manager import WindowManager
+from timeraas.room import Room
+from timeraas.scheduler import TimerScheduler
+from timeraas.table import WindowTable
+
+
+class WindowRegistry:
+    """Indexes windows by Room and window id and creates them on first use.
+
+    Window state is stored in a WindowTable; the returned WindowManagers are
+    views over its rows.
+    """
+
+    def __init__(self, floors: dict = None, scheduler: TimerScheduler = None, default_floor: int = 0,
+                 history_size: int = 256, lock_stripes: int = 64, clock: Clock = None):
+        self._floors = dict(floors or {})
+        self._default_floor = default_floor
+        self._table = WindowTable(scheduler, history_size, lock_stripes, clock)
+        self._rooms = {}  # room name -> Room
+        self._lock = threading.Lock()  # Only taken when a room has to be created
+
+    @property
+    def table(self) -> WindowTable:
+        return self._table
+
+    def room(self, name: str) -> Room:
+        """Returns the Room with the given name, creating it on the configured floor."""
+        room = self._rooms.get(name)
+        if room is None:
+            with self._lock:
+                room = self._rooms.get(name)
+                if room is None:
+                    room = Room(name, self._floors.get(name, self._default_floor))
+                    self._rooms[name] = room
+        return room
+
+    def get(self, room_name: str, window_id: str):
+        """Returns the WindowManager for the window, or None if it has not been seen yet."""
+        index = self._table.find(room_name, window_id)
+        return WindowManager.view(self._table, index) if index is not None else None
+
+    def get_or_create(self, room_name: str, window_id: str) -> WindowManager:
+        """Returns the WindowManager for the window, creating its table row lazily on the first event."""
+        return WindowManager.view(self._table, self._table.add(self.room(room_name), window_id))
+
+    def add_listener(self, listener):
+        """Registers ``listener(manager, event)`` for every existing and future window."""
+        self._table.listeners.append(listener)
+
+    def cancel_timers(self) -> int:
+        """Cancels every armed timer, e.g. on shutdown, and returns how many were armed."""
+        cancelled = 0
+        for index, timer in enumerate(list(self._table.timers)):
+            if timer is not None:
+                WindowManager.view(self._table, index).cancel_timer()
+                cancelled += 1
+        return cancelled
+
+    def items(self):
+        """Returns a snapshot of ((Room, window id), WindowManager) pairs."""
+        return [((room, name), WindowManager.view(self._table, index)) for room, name, index in self._table.keys()]
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __contains__(self, key) -> bool:
+        room_name, window_id = key
+        return self.get(room_name, window_id) is not None
+
+    def __repr__(self) -> str:
+        return f"WindowRegistry(rooms={len(self._rooms)}, windows={len(self._table)})"
+
+
+def parse_room_floors(spec: str) -> dict:
+    """Parses a ``room:floor,room:floor`` string into a mapping of room names to floors."""
+    floors = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, floor = entry.rpartition(":")
+        if not name:
+            raise ValueError(f"Invalid room floor entry '{entry}'. Expected 'room:floor'.")
+        try:
+            floors[name.strip()] = int(floor)
+        except ValueError:
+            raise ValueError(f"Invalid floor in room floor entry '{entry}'.")
+    return floors
@@ -0,0 +1,213 @@
+"""Replays a recorded event log through the status update logic on a virtual clock.
+
+Usage: python -m timeraas.replay FILE [FILE ...] [--tail 86400] [--timer-duration 600]
+                                 [--tilted-duration 1800] [--escalation SPEC] [--debounce 0]
+                                 [--output report.json]
+
+Accepted inputs are a journal (one JSON record per line with a ``timestamp``)
+and an exported ``timeraas.log`` in the text or JSON log format, from which
+the "Received request to update ..." lines are taken. Events are applied in
+timestamp order exactly like ``POST /home/<room>/<window>``, while timers
+and escalation stages fire on a virtual clock, so a day of traffic replays
+in a fraction of a second. The report lists the alerts that would have been
+sent and what each event cost to process, which makes it easy to compare
+policies (timer durations, escalation schedules, debouncing) or code changes
+against the same recorded traffic.
+"""
+import argparse
+import json
+import logging
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import NamedTuple
+
+from timeraas.app import Services
+from timeraas.clock import VirtualClock
+from timeraas.config import Config
+from timeraas.ingest import validate_status
+
+logger = logging.getLogger(__name__)
+
+LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+REQUEST_PATTERN = re.compile(r"Received request to update (?P<room>[^/\s]+)/(?P<window>\S+) status to (?P<status>\S+)")
+
+
+class ReplayEvent(NamedTuple):
+    timestamp: float
+    room: str
+    window: str
+    status: str
+
+
+class Alert(NamedTuple):
+    timestamp: float
+    location: str
+    message: str
+
+
+class AlertRecorder:
+    """Notifier stand-in recording the messages instead of posting them to Discord."""
+
+    def __init__(self, clock: VirtualClock):
+        self._clock = clock
+        self.alerts = []
+
+    def send(self, message: str, room: str = None) -> bool:
+        self.alerts.append(Alert(self._clock.time(), room, message))
+        return True
+
+    def stats(self) -> dict:
+        return {"sent": len(self.alerts)}
+
+    def close(self):
+        pass
+
+
+def _log_time(value: str) -> float:
+    return datetime.strptime(value, LOG_TIME_FORMAT).timestamp()
+
+
+def parse_line(line: str, last_status: dict):
+    """Parses one journal or log line into a ReplayEvent, or returns None for lines without a status update.
+
+    ``last_status`` maps (room, window) to the last journaled status, so
+    journal records of expiries and escalation stages, which keep the
+    status, are not replayed as updates.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if "room" in entry:  # Journal record
+            if "timestamp" not in entry:
+                return None  # Written before journal records carried their timestamp
+            key = (entry["room"], entry["window"])
+            if last_status.get(key) == entry["status"]:
+                return None
+            last_status[key] = entry["status"]
+            return ReplayEvent(float(entry["timestamp"]), entry["room"], entry["window"], entry["status"])
+        match = REQUEST_PATTERN.search(entry.get("message", ""))
+        timestamp = entry.get("time")
+    else:
+        match = REQUEST_PATTERN.search(line)
+        timestamp = line.split(" - ", 1)[0]
+    if match is None:
+        return None
+    try:
+        return ReplayEvent(_log_time(timestamp), match["room"], match["window"], match["status"])
+    except (TypeError, ValueError):
+        return None
+
+
+def read_events(paths) -> list:
+    """Reads the events of all ``paths`` and returns them in timestamp order."""
+    events, last_status = [], {}
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            events.extend(filter(None, (parse_line(line, last_status) for line in file)))
+    events.sort(key=lambda event: event.timestamp)  # Stable, so events of the same instant keep their order
+    return events
+
+
+def _percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def replay(events: list, config: Config = None, tail: float = 86400.0) -> dict:
+    """Applies ``events`` on a virtual clock and returns the report.
+
+    Timers still armed ``tail`` seconds after the last event are dropped, so
+    an escalation repeating forever does not keep the replay running.
+    """
+    if tail < 0:
+        raise ValueError("Tail must not be negative.")
+    config = (config or Config())._replace(webhook_url="replay:", debug=False, journal_path=None, log_file=None,
+                                           state_backend="local", fritzbox_url=None)
+    clock = VirtualClock(events[0].timestamp if events else 0.0)
+    alerts = AlertRecorder(clock)
+    services = Services(config, clock=clock, notifier=alerts)
+    scheduler = services.scheduler
+    for name in ("registry", "escalation", "debouncer", "deduplicator"):
+        getattr(services, name)  # Created up front, so the first event's cost is not the setup's
+    costs, results = [], Counter()
+    started = time.perf_counter()
+    try:
+        for event in events:
+            scheduler.run_until(event.timestamp)
+            status = validate_status(event.status)
+            begin = time.perf_counter()
+            try:
+                if status is None:
+                    raise ValueError(f"Invalid status {event.status}.")
+                result = services.update_status(event.room, event.window, status)
+            except ValueError as e:
+                logger.warning("Skipped event for %s/%s: %s", event.room, event.window, e)
+                results["errors"] += 1
+                continue
+            finally:
+                costs.append(time.perf_counter() - begin)
+            results["dropped" if "dropped" in result else "applied"] += 1
+        end = (events[-1].timestamp if events else clock.time()) + tail
+        scheduler.run_until(end)  # Also fires the timers armed by expiries and settling updates meanwhile
+        unfired = scheduler.pending
+    finally:
+        services.shutdown()
+    wall = time.perf_counter() - started
+    simulated = clock.time() - (events[0].timestamp if events else clock.time())
+
+    costs_us = sorted(cost * 1e6 for cost in costs)
+    return {
+        "events": len(events),
+        "applied": results["applied"],
+        "dropped": results["dropped"],
+        "errors": results["errors"],
+        "alerts": len(alerts.alerts),
+        "alerts_by_location": dict(Counter(alert.location for alert in alerts.alerts).most_common()),
+        "timers_fired": scheduler.fired,
+        "timers_unfired": unfired,
+        "cost_us": {
+            "mean": round(statistics.fmean(costs_us), 2) if costs_us else 0.0,
+            "p50": round(_percentile(costs_us, 0.5), 2) if costs_us else 0.0,
+            "p99": round(_percentile(costs_us, 0.99), 2) if costs_us else 0.0,
+            "max": round(costs_us[-1], 2) if costs_us else 0.0,
+        },
+        "wall_seconds": round(wall, 4),
+        "simulated_seconds": round(simulated, 3),
+        "speedup": round(simulated / wall, 1) if wall > 0 else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", metavar="FILE", help="Journal or timeraas.log files.")
+    parser.add_argument("--tail", type=float, default=86400.0,
+                        help="Seconds to keep running the timers after the last event.")
+    parser.add_argument("--timer-duration", type=int, default=600, help="Seconds until an open window is reported.")
+    parser.add_argument("--tilted-duration", type=int, help="Seconds until a tilted window is reported.")
+    parser.add_argument("--escalation", default="", help="Escalation schedules like ESCALATION_SCHEDULES.")
+    parser.add_argument("--debounce", type=float, default=0.0, help="Debounce window in seconds.")
+    parser.add_argument("--output", default="-", help="Report file, '-' for stdout.")
+    args = parser.parse_args(argv)
+
+    config = Config(timer_duration=args.timer_duration, tilted_duration=args.tilted_duration,
+                    escalation_schedules=args.escalation, debounce_window=args.debounce)
+    report = replay(read_events(args.paths), config, args.tail)
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    main()
@@ -1,4 +1,9 @@
+import sys
+
+
 class Room:
+    __slots__ = ("_name", "_floor")
+
     def __init__(self, name: str, floor: int):
         self.name = name  # Setter will handle validation
         self.floor = floor  # Setter will handle validation
@@ -11,7 +16,7 @@ class Room:
     def name(self, value: str):
         if not isinstance(value, str) or not value.strip():
             raise ValueError("Room name must be a non-empty string.")
-        self._name = value
+        self._name = sys.intern(value)
 
     @property
     def floor(self) -> int:
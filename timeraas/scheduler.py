@@ -0,0 +1,256 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+
+from timeraas.clock import SYSTEM_CLOCK, Clock, VirtualClock
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """Reference to a scheduled callback, used to cancel it again."""
+
+    __slots__ = ("callback", "args", "slot", "rounds", "cancelled")
+
+    def __init__(self, callback, args, slot: int, rounds: int):
+        self.callback = callback
+        self.args = args
+        self.slot = slot
+        self.rounds = rounds
+        self.cancelled = False
+
+    def cancel(self):
+        """Marks the handle as cancelled so it is never fired."""
+        self.cancelled = True
+
+    def __repr__(self) -> str:
+        return f"TimerHandle(slot={self.slot}, rounds={self.rounds}, cancelled={self.cancelled})"
+
+
+class TimerScheduler:
+    """Hashed timing wheel driven by a single daemon thread.
+
+    Arming and cancelling a timer are O(1) regardless of how many timers are
+    pending, and the number of threads stays at one no matter how many windows
+    are open. Deadlines are rounded up to the next tick.
+    """
+
+    def __init__(self, tick: float = 0.1, wheel_size: int = 1024, clock: Clock = None):
+        if tick <= 0:
+            raise ValueError("Tick must be a positive number of seconds.")
+        if not isinstance(wheel_size, int) or wheel_size <= 0:
+            raise ValueError("Wheel size must be a positive integer.")
+        self._tick_length = tick
+        self._clock = clock if clock is not None else SYSTEM_CLOCK
+        self._slots = [set() for _ in range(wheel_size)]
+        self._current_tick = 0
+        self._start = self._clock.monotonic()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._stopped = False
+
+    @property
+    def pending(self) -> int:
+        """Number of timers that are armed and not yet fired or cancelled."""
+        with self._lock:
+            return self._pending
+
+    def schedule(self, delay: float, callback, *args) -> TimerHandle:
+        """Arms a timer that calls ``callback(*args)`` after ``delay`` seconds."""
+        if delay < 0:
+            raise ValueError("Delay must not be negative.")
+        if not callable(callback):
+            raise ValueError("Callback must be a callable function.")
+
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Scheduler has been shut down.")
+            now = self._clock.monotonic()
+            if self._pending == 0:
+                # Nothing is waiting on the wheel, so re-anchor it to avoid catching up idle ticks
+                self._start = now - self._current_tick * self._tick_length
+            target_tick = math.ceil((now + delay - self._start) / self._tick_length)
+            offset = max(1, target_tick - self._current_tick)
+            wheel_size = len(self._slots)
+            handle = TimerHandle(callback, args, (self._current_tick + offset) % wheel_size, (offset - 1) // wheel_size)
+            self._slots[handle.slot].add(handle)
+            self._pending += 1
+            self._ensure_thread()
+            self._wakeup.notify()
+        return handle
+
+    def cancel(self, handle: TimerHandle) -> bool:
+        """Cancels a pending timer. Returns False if it already fired or was cancelled."""
+        with self._lock:
+            handle.cancel()
+            slot = self._slots[handle.slot]
+            if handle in slot:
+                slot.remove(handle)
+                self._pending -= 1
+                return True
+            return False
+
+    def shutdown(self):
+        """Stops the scheduler thread and drops all pending timers."""
+        with self._lock:
+            self._stopped = True
+            for slot in self._slots:
+                for handle in slot:
+                    handle.cancel()
+                slot.clear()
+            self._pending = 0
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="timeraas-scheduler", daemon=True)
+            self._thread.start()
+
+    def _advance(self) -> list:
+        """Moves the wheel forward by one tick and returns the handles that are due."""
+        self._current_tick += 1
+        slot = self._slots[self._current_tick % len(self._slots)]
+        due = []
+        for handle in slot:
+            if handle.rounds == 0:
+                due.append(handle)
+            else:
+                handle.rounds -= 1
+        for handle in due:
+            slot.remove(handle)
+        self._pending -= len(due)
+        return due
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopped:
+                    self._wakeup.wait()
+                if self._stopped:
+                    return
+                remaining = self._start + (self._current_tick + 1) * self._tick_length - self._clock.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                due = self._advance()
+
+            for handle in due:
+                if handle.cancelled:
+                    continue
+                try:
+                    handle.callback(*handle.args)
+                except Exception as e:
+                    logger.error("Timer callback failed: %s", e)
+
+    def __repr__(self) -> str:
+        return f"TimerScheduler(tick={self._tick_length}, wheel_size={len(self._slots)}, pending={self._pending})"
+
+
+class VirtualScheduler:
+    """Scheduler firing its timers on a VirtualClock, only when time is advanced through it.
+
+    Due timers fire in deadline order on the calling thread, and the clock is
+    set to each deadline before its callback runs, so hours of timers pass
+    in as long as their callbacks take.
+    """
+
+    def __init__(self, clock: VirtualClock = None):
+        self._clock = clock if clock is not None else VirtualClock()
+        self._heap = []  # (due, sequence, handle); cancelled handles are dropped when they come up
+        self._armed = set()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.fired = 0
+
+    @property
+    def clock(self) -> VirtualClock:
+        return self._clock
+
+    @property
+    def pending(self) -> int:
+        """Number of timers that are armed and not yet fired or cancelled."""
+        return len(self._armed)
+
+    def schedule(self, delay: float, callback, *args) -> TimerHandle:
+        """Arms a timer that calls ``callback(*args)`` once the clock is advanced by ``delay`` seconds."""
+        if delay < 0:
+            raise ValueError("Delay must not be negative.")
+        if not callable(callback):
+            raise ValueError("Callback must be a callable function.")
+        handle = TimerHandle(callback, args, 0, 0)
+        with self._lock:
+            heapq.heappush(self._heap, (self._clock.monotonic() + delay, next(self._sequence), handle))
+            self._armed.add(handle)
+        return handle
+
+    def cancel(self, handle: TimerHandle) -> bool:
+        """Cancels a pending timer. Returns False if it already fired or was cancelled."""
+        handle.cancel()
+        with self._lock:
+            if handle in self._armed:
+                self._armed.remove(handle)
+                return True
+            return False
+
+    def next_due(self):
+        """Virtual time of the next armed timer, or None."""
+        with self._lock:
+            while self._heap and self._heap[0][2] not in self._armed:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_until(self, now: float) -> int:
+        """Fires every timer due at or before ``now``, then sets the clock to ``now``. Returns the number fired."""
+        fired = 0
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due, _, handle = heapq.heappop(self._heap)
+                if handle not in self._armed:
+                    continue
+                self._armed.remove(handle)
+            self._clock.set(max(due, self._clock.monotonic()))
+            try:
+                handle.callback(*handle.args)
+            except Exception as e:
+                logger.error("Timer callback failed: %s", e)
+            fired += 1
+        self._clock.set(max(now, self._clock.monotonic()))
+        self.fired += fired
+        return fired
+
+    def advance(self, seconds: float) -> int:
+        """Advances the clock by ``seconds``, firing the timers that become due."""
+        return self.run_until(self._clock.monotonic() + seconds)
+
+    def shutdown(self):
+        """Drops all pending timers."""
+        with self._lock:
+            for handle in self._armed:
+                handle.cancel()
+            self._armed.clear()
+            self._heap.clear()
+
+    def __repr__(self) -> str:
+        return f"VirtualScheduler(now={self._clock.monotonic()}, pending={self.pending})"
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def default_scheduler() -> TimerScheduler:
+    """Returns the process-wide scheduler shared by all WindowManagers."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = TimerScheduler()
+        return _default_scheduler
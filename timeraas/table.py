@@ -0,0 +1,175 @@
+import bisect
+import math
+import sys
+import threading
+import weakref
+from array import array
+
+from timeraas.clock import SYSTEM_CLOCK, Clock
+from timeraas.history import TransitionHistory
+from timeraas.metrics import WINDOW_LOCK_WAIT, TimedLock
+from timeraas.room import Room
+from timeraas.window import WindowStatus
+
+NO_DEADLINE = math.nan
+
+
+class WindowTable:
+    """Struct-of-arrays store holding the state of every window of a registry.
+
+    Window ``i`` is row ``i`` of the columns: its status value in a
+    ``bytearray``, the expired flag in a second ``bytearray``, the timer
+    deadline in an ``array('d')`` (NaN while no timer is armed) and the room id
+    in an ``array('I')``. Window ids are interned once and stored as name ids,
+    and every room keeps its windows in one sorted ``array('Q')`` of
+    ``name id << 32 | index`` entries, so a row costs about 34 bytes with no
+    per-window Python objects. ``Window`` and ``WindowManager`` are views created
+    on demand over a row. Transition histories are only allocated once a window
+    changes status, and the rows share a fixed pool of striped locks instead of
+    owning one each.
+    """
+
+    def __init__(self, scheduler=None, history_size: int = 256, lock_stripes: int = 64, clock: Clock = None):
+        if not isinstance(lock_stripes, int) or lock_stripes <= 0:
+            raise ValueError("Lock stripes must be a positive integer.")
+        self.scheduler = scheduler
+        self.clock = clock if clock is not None else SYSTEM_CLOCK  # Source of deadlines and timestamps
+        self.history_size = history_size
+        self.statuses = bytearray()  # WindowStatus value per window
+        self.expired = bytearray()  # 1 once the armed timer fired, until the window closes
+        self.stages = bytearray()  # Escalation stages fired since the window was opened or tilted
+        self.deadlines = array('d')  # Wall-clock deadline of the armed timer, NaN if none
+        self.room_ids = array('I')
+        self.name_ids = array('I')  # Window id per window as an index into self.names
+        self.names = []  # Distinct interned window ids
+        self.timers = []  # Scheduler handle of the armed timer per window, or None
+        self.rooms = []  # Room per room id
+        self.histories = {}  # Window index -> TransitionHistory, created on the first transition
+        self.listeners = []  # Listeners notified for every window
+        self.window_listeners = {}  # Window index -> listeners of that window only
+        self.backend = None  # Shared state backend status changes are applied through, e.g. SqliteBackend
+        self._room_ids = {}  # Room name -> room id
+        self._room_windows = []  # Per room id: sorted array('Q') of name id << 32 | window index
+        self._name_ids = {}  # Window id -> name id
+        self._locks = [TimedLock(WINDOW_LOCK_WAIT) for _ in range(lock_stripes)]
+        self.views = weakref.WeakValueDictionary()  # Window index -> live WindowManager view
+        self._lock = threading.Lock()  # Only taken when a row or room is added
+
+    def __len__(self) -> int:
+        return len(self.statuses)
+
+    def room_id(self, room: Room) -> int:
+        """Returns the id of the room, registering it on first use."""
+        room_id = self._room_ids.get(room.name)
+        if room_id is None:
+            with self._lock:
+                room_id = self._room_ids.get(room.name)
+                if room_id is None:
+                    room_id = len(self.rooms)
+                    self.rooms.append(room)
+                    self._room_windows.append(array('Q'))
+                    self._room_ids[room.name] = room_id
+        return room_id
+
+    def name(self, index: int) -> str:
+        """Window id of the row."""
+        return self.names[self.name_ids[index]]
+
+    def _lookup(self, room_id: int, name_id: int):
+        windows = self._room_windows[room_id]
+        position = bisect.bisect_left(windows, name_id << 32)
+        if position < len(windows):
+            entry = windows[position]
+            if entry >> 32 == name_id:
+                return entry & 0xFFFFFFFF
+        return None
+
+    def find(self, room_name: str, name: str):
+        """Returns the index of the named window in the named room, or None."""
+        room_id = self._room_ids.get(room_name)
+        name_id = self._name_ids.get(name)
+        if room_id is None or name_id is None:
+            return None
+        index = self._lookup(room_id, name_id)
+        if index is None:
+            # A concurrent insert may have shifted the entry, so confirm the miss under the lock
+            with self._lock:
+                index = self._lookup(room_id, name_id)
+        return index
+
+    def add(self, room: Room, name: str = None) -> int:
+        """Returns the index of the named window, appending a closed row for it if it is new."""
+        index = self.find(room.name, name)
+        if index is not None:
+            return index
+        room_id = self.room_id(room)
+        with self._lock:
+            name_id = self._name_ids.get(name)
+            if name_id is None:
+                name_id = len(self.names)
+                self.names.append(sys.intern(name) if name is not None else None)
+                self._name_ids[name] = name_id
+            index = self._lookup(room_id, name_id)
+            if index is None:
+                index = len(self.statuses)
+                self.expired.append(0)
+                self.stages.append(0)
+                self.deadlines.append(NO_DEADLINE)
+                self.room_ids.append(room_id)
+                self.name_ids.append(name_id)
+                self.timers.append(None)
+                # Appended last: a row only counts once all its columns exist
+                self.statuses.append(WindowStatus.CLOSED.value)
+                entry = name_id << 32 | index
+                windows = self._room_windows[room_id]
+                windows.insert(bisect.bisect_left(windows, entry), entry)
+        return index
+
+    def keys(self) -> list:
+        """Returns (Room, window id, index) for every row."""
+        return [(self.rooms[self.room_ids[index]], self.name(index), index) for index in range(len(self))]
+
+    def lock(self, index: int) -> TimedLock:
+        """Lock guarding the row. Rows share a fixed pool of locks, so never hold two at once."""
+        return self._locks[index % len(self._locks)]
+
+    def history(self, index: int) -> TransitionHistory:
+        history = self.histories.get(index)
+        if history is None:
+            history = self.histories.setdefault(index, TransitionHistory(self.history_size))
+        return history
+
+    def count(self, status: WindowStatus) -> int:
+        """Number of windows with the given status, counted in C over the status column."""
+        return self.statuses.count(status.value)
+
+    def columns(self) -> dict:
+        """Returns NumPy arrays over copies of the columns for vectorized scans over all windows.
+
+        Slicing copies each column, so NumPy never holds a buffer of the live
+        columns and rows can still be appended while the arrays are in use.
+        """
+        import numpy as np  # Imported on first use; numpy dominates the import time of the service
+
+        size = len(self.statuses)  # Rows appended while copying are left out
+        return {
+            "status": np.frombuffer(self.statuses[:size], dtype=np.uint8),
+            "expired": np.frombuffer(self.expired[:size], dtype=np.uint8).astype(bool),
+            "deadline": np.frombuffer(self.deadlines[:size], dtype=np.float64),
+            "room": np.frombuffer(self.room_ids[:size], dtype=np.uint32),
+        }
+
+    def armed(self) -> int:
+        """Number of windows with an armed timer."""
+        import numpy as np
+
+        return int(np.count_nonzero(~np.isnan(np.frombuffer(self.deadlines[:], dtype=np.float64))))
+
+    def overdue(self, now: float) -> "numpy.ndarray":
+        """Indices of windows whose timer deadline is at or before ``now``."""
+        import numpy as np
+
+        return np.flatnonzero(np.frombuffer(self.deadlines[:], dtype=np.float64) <= now)
+
+    def __repr__(self) -> str:
+        return f"WindowTable(windows={len(self)}, rooms={len(self.rooms)})"
@@ -9,28 +9,47 @@ class WindowStatus(Enum):
     CLOSED = 3
 
 
+_STATUSES = {status.value: status for status in WindowStatus}
+
+
 class Window:
-    def __init__(self, location: Room):
-        self._location = location
-        self._status = WindowStatus.CLOSED  # Store enum instance, not string
+    """View of one row of a WindowTable. A Window created on its own gets a private single-row table."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, location: Room, table=None, index: int = None):
+        if table is None:
+            from timeraas.table import WindowTable  # The table module depends on this one
+            table = WindowTable(lock_stripes=1)
+            index = table.add(location)
+        self._table = table
+        self._index = index
+
+    @property
+    def table(self):
+        return self._table
+
+    @property
+    def index(self) -> int:
+        return self._index
 
     @property
     def location(self) -> Room:
         """Read-only access to the room location of the window."""
-        return self._location
+        return self._table.rooms[self._table.room_ids[self._index]]
 
     @property
     def status(self) -> WindowStatus:
-        return self._status
+        return _STATUSES[self._table.statuses[self._index]]
 
     @status.setter
     def status(self, new_status):
         if isinstance(new_status, WindowStatus):
-            self._status = new_status
+            self._table.statuses[self._index] = new_status.value
         elif isinstance(new_status, str):
             # Allow string names for flexibility
             try:
-                self._status = WindowStatus[new_status.upper()]
+                self._table.statuses[self._index] = WindowStatus[new_status.upper()].value
             except KeyError:
                 raise ValueError(f"{new_status} is not a valid WindowStatus.")
         else:
@@ -49,4 +68,4 @@ class Window:
             WindowStatus.TILTED: WindowStatus.OPEN,
             WindowStatus.OPEN: WindowStatus.CLOSED
         }
-        self._status = next_status[self._status]
+        self.status = next_status[self.status]